@@ -0,0 +1,174 @@
+"""
+Ingresos y asistencia por periodo sobre un cubo precalculado.
+
+analitica_diaria guarda, por dia de inscripcion x actividad x instructor x turno x
+equipamiento alquilado, la cantidad de inscripciones y los ingresos. Se mantiene con
+el mismo esquema que resumenes.py: `ajustar` resta (signo -1) o suma (signo +1) el
+aporte de las inscripciones afectadas dentro de la transaccion que las modifica.
+resumenes.ajustar_inscripciones ya lo llama; solo hace falta llamarlo aparte cuando
+cambia algo que no toca resumen_actividad (instructor o turno de una clase, o el
+borrado de una actividad, donde resumen_actividad se borra en cascada).
+Las consultas agrupan el cubo, nunca alumno_clase.
+
+La tabla la crea (y llena) la migracion 3.
+
+Uso: python analitica.py verificar | reconstruir
+"""
+import sys
+from decimal import Decimal
+from database import get_connection
+
+#equipamiento 0 = sin alquiler (la columna es parte de la clave y no puede ser NULL)
+_CELDA = """
+    DATE(ac.fecha_inscripcion), c.id_actividad, c.ci_instructor, c.id_turno, COALESCE(ac.id_equipamiento, 0)
+"""
+_DESDE = """
+    FROM alumno_clase ac
+    JOIN clase c ON ac.id_clase = c.id
+    JOIN actividades a ON c.id_actividad = a.id
+    LEFT JOIN equipamiento e ON ac.id_equipamiento = e.id
+"""
+_VALORES = "COUNT(*), SUM(a.costo + COALESCE(e.costo, 0)), SUM(COALESCE(e.costo, 0))"
+
+PERIODOS = {
+    "dia": "fecha",
+    "semana": "fecha - INTERVAL WEEKDAY(fecha) DAY",      #lunes de la semana
+    "mes": "fecha - INTERVAL (DAYOFMONTH(fecha) - 1) DAY",
+    "temporada": "YEAR(fecha)",                           #la temporada de nieve cae dentro del año
+}
+DIMENSIONES = {
+    "actividad": "id_actividad",
+    "instructor": "ci_instructor",
+    "turno": "id_turno",
+    "equipamiento": "id_equipamiento",
+}
+
+
+def ajustar(cursor, condicion, parametros, signo):
+    """
+    Suma (o resta) al cubo las inscripciones que cumplen `condicion`
+    (alias ac, c, a y e como en resumenes.ajustar_inscripciones).
+    """
+    if signo not in (1, -1):
+        raise ValueError("signo debe ser 1 o -1")
+    cursor.execute(f"""
+        INSERT INTO analitica_diaria
+            (fecha, id_actividad, ci_instructor, id_turno, id_equipamiento,
+             inscripciones, ingresos, ingresos_equipamiento)
+        SELECT {_CELDA}, {signo} * COUNT(*), {signo} * SUM(a.costo + COALESCE(e.costo, 0)),
+               {signo} * SUM(COALESCE(e.costo, 0))
+        {_DESDE}
+        WHERE {condicion}
+        GROUP BY {_CELDA}
+        ON DUPLICATE KEY UPDATE
+            inscripciones = inscripciones + VALUES(inscripciones),
+            ingresos = ingresos + VALUES(ingresos),
+            ingresos_equipamiento = ingresos_equipamiento + VALUES(ingresos_equipamiento)
+    """, parametros)
+
+
+def consultar(cursor, desde, hasta, periodo="dia", dimensiones=(), filtros=None):
+    """
+    Totales por periodo (dia, semana, mes o temporada) y por las `dimensiones` pedidas,
+    para las inscripciones entre `desde` y `hasta` inclusive.
+    `filtros` es {dimension: valor}. Lanza ValueError si algo no es valido.
+    """
+    if periodo not in PERIODOS:
+        raise ValueError(f"periodo invalido, usar {', '.join(PERIODOS)}")
+    invalidas = [d for d in list(dimensiones) + list(filtros or {}) if d not in DIMENSIONES]
+    if invalidas:
+        raise ValueError(f"dimension invalida: {invalidas[0]}, usar {', '.join(DIMENSIONES)}")
+    if desde > hasta:
+        raise ValueError("desde es posterior a hasta")
+
+    columnas = [PERIODOS[periodo]] + [DIMENSIONES[d] for d in dimensiones]
+    condiciones, parametros = ["fecha BETWEEN %s AND %s"], [desde, hasta]
+    for dimension, valor in (filtros or {}).items():
+        condiciones.append(f"{DIMENSIONES[dimension]} = %s")
+        parametros.append(0 if dimension == "equipamiento" and valor is None else valor)
+    agrupar = ", ".join(str(i) for i in range(1, len(columnas) + 1))
+    cursor.execute(f"""
+        SELECT {', '.join(columnas)},
+               SUM(inscripciones), SUM(ingresos), SUM(ingresos_equipamiento)
+        FROM analitica_diaria
+        WHERE {' AND '.join(condiciones)}
+        GROUP BY {agrupar}
+        HAVING SUM(inscripciones) <> 0
+        ORDER BY {agrupar}
+    """, parametros)
+
+    claves = ["periodo", *dimensiones, "inscripciones", "ingresos", "ingresos_equipamiento"]
+    filas = []
+    for fila in cursor.fetchall():
+        datos = dict(zip(claves, fila))
+        if datos.get("equipamiento") == 0:
+            datos["equipamiento"] = None
+        datos["inscripciones"] = int(datos["inscripciones"])
+        datos["ingresos"] = float(datos["ingresos"])
+        datos["ingresos_equipamiento"] = float(datos["ingresos_equipamiento"])
+        filas.append(datos)
+    return filas
+
+
+######################################################################
+#reconstruccion y verificacion
+######################################################################
+
+def _calcular(cursor):
+    cursor.execute(f"SELECT {_CELDA}, {_VALORES} {_DESDE} GROUP BY {_CELDA}")
+    return {tuple(r[:5]): (r[5], Decimal(r[6]), Decimal(r[7])) for r in cursor.fetchall()}
+
+
+def verificar(cursor):
+    """Celdas del cubo que no coinciden con el calculo desde alumno_clase."""
+    esperado = _calcular(cursor)
+    cursor.execute("""
+        SELECT fecha, id_actividad, ci_instructor, id_turno, id_equipamiento,
+               inscripciones, ingresos, ingresos_equipamiento
+        FROM analitica_diaria WHERE inscripciones <> 0
+    """)
+    actual = {tuple(r[:5]): (r[5], Decimal(r[6]), Decimal(r[7])) for r in cursor.fetchall()}
+    vacia = (0, Decimal("0.00"), Decimal("0.00"))
+    return [
+        {"celda": celda, "esperado": esperado.get(celda, vacia), "actual": actual.get(celda, vacia)}
+        for celda in sorted(set(esperado) | set(actual), key=str)
+        if esperado.get(celda, vacia) != actual.get(celda, vacia)
+    ]
+
+
+def reconstruir(cursor):
+    """Recalcula el cubo desde cero (no hace commit). Tambien borra las celdas en cero."""
+    cursor.execute("DELETE FROM analitica_diaria")
+    cursor.execute(f"""
+        INSERT INTO analitica_diaria
+            (fecha, id_actividad, ci_instructor, id_turno, id_equipamiento,
+             inscripciones, ingresos, ingresos_equipamiento)
+        SELECT {_CELDA}, {_VALORES} {_DESDE} GROUP BY {_CELDA}
+    """)
+
+
+def main(argumentos):
+    if len(argumentos) != 1 or argumentos[0] not in ("verificar", "reconstruir"):
+        print(__doc__.strip().splitlines()[-1])
+        return 2
+
+    connection = get_connection()
+    try:
+        with connection.cursor() as cursor:
+            diferencias = verificar(cursor)
+            for d in diferencias[:50]:
+                print(f"celda {d['celda']}: esperado {d['esperado']}, actual {d['actual']}")
+            print(f"{len(diferencias)} diferencias encontradas")
+
+            if argumentos[0] == "reconstruir":
+                reconstruir(cursor)
+                connection.commit()
+                print("cubo de analitica reconstruido")
+                return 0
+            return 1 if diferencias else 0
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
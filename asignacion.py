@@ -0,0 +1,282 @@
+"""
+Asignacion de lugares para inscripciones grupales.
+
+Cada alumno pide una actividad entre varias, en orden de preferencia. Se le busca
+lugar en las clases existentes de esas actividades, respetando la capacidad de cada
+clase y sin chocar con los turnos en los que el alumno ya tiene clase (ni con los que
+se les superponen, ver intervalos.py).
+
+El problema se resuelve como un flujo de costo minimo:
+    origen -> grupo de alumnos -> (actividad, turno) -> destino
+El costo de cada arco grupo -> (actividad, turno) es la posicion de la actividad en
+las preferencias, asi se asigna al maximo de alumnos posible y, entre esas
+asignaciones, la que mejor respeta las preferencias.
+Los alumnos con las mismas preferencias y los mismos turnos posibles forman un solo
+nodo, y las clases de la misma actividad y turno tambien: el grafo queda chico aunque
+sean miles de alumnos. Al final cada grupo se reparte entre las clases de su
+(actividad, turno), llenando primero la que tiene mas lugar.
+"""
+import heapq
+from collections import defaultdict, deque
+import resumenes
+from database import marcadores
+from intervalos import indice_turnos
+
+TAMANO_BLOQUE = 1000    #alumnos por consulta / INSERT
+_INFINITO = float("inf")
+
+
+class FlujoCostoMinimo:
+    """
+    Primal-dual: Dijkstra con potenciales da las distancias y despues se manda un flujo
+    bloqueante (Dinic) por los arcos de costo reducido cero. Como los costos son
+    posiciones de preferencia hay pocas distancias distintas, y por lo tanto pocas fases.
+    """
+
+    def __init__(self, nodos):
+        self._grafo = [[] for _ in range(nodos)]
+
+    def arista(self, desde, hasta, capacidad, costo):
+        """Agrega un arco y devuelve una referencia para consultar su flujo."""
+        self._grafo[desde].append([hasta, capacidad, costo, len(self._grafo[hasta])])
+        self._grafo[hasta].append([desde, 0, -costo, len(self._grafo[desde]) - 1])
+        return desde, len(self._grafo[desde]) - 1
+
+    def flujo(self, arista):
+        desde, i = arista
+        hasta, _, _, reversa = self._grafo[desde][i]
+        return self._grafo[hasta][reversa][1]
+
+    def resolver(self, origen, destino):
+        """Flujo maximo de costo minimo (costos iniciales no negativos). Devuelve (flujo, costo)."""
+        grafo = self._grafo
+        potencial = [0] * len(grafo)
+        flujo = costo = 0
+        while True:
+            distancia = [_INFINITO] * len(grafo)
+            distancia[origen] = 0
+            cola = [(0, origen)]
+            while cola:
+                d, u = heapq.heappop(cola)
+                if d > distancia[u]:
+                    continue
+                for v, capacidad, c, _ in grafo[u]:
+                    if capacidad > 0:
+                        nueva = d + c + potencial[u] - potencial[v]
+                        if nueva < distancia[v]:
+                            distancia[v] = nueva
+                            heapq.heappush(cola, (nueva, v))
+            tope = distancia[destino]
+            if tope == _INFINITO:
+                return flujo, costo
+            #con el tope los costos reducidos siguen sin ser negativos en todo el grafo
+            for v, d in enumerate(distancia):
+                potencial[v] += min(d, tope)
+            mandado = self._bloqueante(origen, destino, potencial)
+            flujo += mandado
+            costo += mandado * (potencial[destino] - potencial[origen])
+
+    def _bloqueante(self, origen, destino, potencial):
+        """Flujo maximo por los arcos de costo reducido cero (Dinic, DFS sin recursion)."""
+        grafo = self._grafo
+        total = 0
+        while True:
+            nivel = [-1] * len(grafo)
+            nivel[origen] = 0
+            cola = deque([origen])
+            while cola:
+                u = cola.popleft()
+                for v, capacidad, c, _ in grafo[u]:
+                    if capacidad > 0 and nivel[v] < 0 and c + potencial[u] - potencial[v] == 0:
+                        nivel[v] = nivel[u] + 1
+                        cola.append(v)
+            if nivel[destino] < 0:
+                return total
+
+            siguiente = [0] * len(grafo)
+            pila, camino = [origen], []     #camino: (u, i) de cada arco de la pila
+            while pila:
+                u = pila[-1]
+                if u == destino:
+                    cuello = min(grafo[a][i][1] for a, i in camino)
+                    corte = None
+                    for k, (a, i) in enumerate(camino):
+                        arco = grafo[a][i]
+                        arco[1] -= cuello
+                        grafo[arco[0]][arco[3]][1] += cuello
+                        if corte is None and arco[1] == 0:
+                            corte = k
+                    total += cuello
+                    #se vuelve al nodo anterior al primer arco saturado
+                    del pila[corte + 1:], camino[corte:]
+                    continue
+                arcos = grafo[u]
+                while siguiente[u] < len(arcos):
+                    v, capacidad, c, _ = arcos[siguiente[u]]
+                    if capacidad > 0 and nivel[v] == nivel[u] + 1 and c + potencial[u] - potencial[v] == 0:
+                        break
+                    siguiente[u] += 1
+                if siguiente[u] < len(arcos):
+                    pila.append(arcos[siguiente[u]][0])
+                    camino.append((u, siguiente[u]))
+                else:
+                    nivel[u] = -1   #sin salida en esta fase
+                    pila.pop()
+                    if camino:
+                        camino.pop()
+
+
+def resolver(preferencias, clases, bloqueados):
+    """
+    preferencias: {ci: [id_actividad, ...]} en orden de preferencia
+    clases: [(id_clase, id_actividad, id_turno, lugares libres)]
+    bloqueados: {ci: turnos que el alumno no puede tomar}
+    Devuelve {ci: (id_clase, posicion de la preferencia, empezando en 1)}.
+    """
+    #(actividad, turno) -> clases con lugar
+    franjas = defaultdict(list)
+    for id_clase, id_actividad, id_turno, lugares in clases:
+        if lugares > 0:
+            franjas[(id_actividad, id_turno)].append([lugares, id_clase])
+    turnos_por_actividad = defaultdict(set)
+    for id_actividad, id_turno in franjas:
+        turnos_por_actividad[id_actividad].add(id_turno)
+
+    #alumnos con las mismas preferencias y los mismos turnos posibles son intercambiables
+    grupos = defaultdict(list)
+    for ci, actividades in sorted(preferencias.items()):
+        actividades = list(dict.fromkeys(actividades))
+        candidatas = set()
+        for id_actividad in actividades:
+            candidatas |= turnos_por_actividad.get(id_actividad, set())
+        posibles = frozenset(candidatas - bloqueados.get(ci, set()))
+        grupos[(tuple(actividades), posibles)].append(ci)
+
+    claves_franjas = sorted(franjas)
+    numero_franja = {f: i for i, f in enumerate(claves_franjas)}
+    claves_grupos = list(grupos)
+    origen, destino = 0, 1
+    primer_grupo = 2
+    primera_franja = primer_grupo + len(claves_grupos)
+    red = FlujoCostoMinimo(primera_franja + len(claves_franjas))
+
+    for i, franja in enumerate(claves_franjas):
+        red.arista(primera_franja + i, destino, sum(l for l, _ in franjas[franja]), 0)
+    arcos = []     #(grupo, franja, posicion de la preferencia, arco)
+    for g, clave in enumerate(claves_grupos):
+        actividades, posibles = clave
+        red.arista(origen, primer_grupo + g, len(grupos[clave]), 0)
+        for posicion, id_actividad in enumerate(actividades, start=1):
+            for id_turno in turnos_por_actividad.get(id_actividad, ()):
+                if id_turno in posibles:
+                    franja = (id_actividad, id_turno)
+                    arco = red.arista(primer_grupo + g, primera_franja + numero_franja[franja],
+                                      len(grupos[clave]), posicion)
+                    arcos.append((g, franja, posicion, arco))
+    red.resolver(origen, destino)
+
+    #repartir cada grupo entre las clases de la franja, la de mas lugar primero
+    colas = {f: [(-lugares, id_clase) for lugares, id_clase in franjas[f]] for f in claves_franjas}
+    for cola in colas.values():
+        heapq.heapify(cola)
+    pendientes = {g: list(reversed(grupos[clave])) for g, clave in enumerate(claves_grupos)}
+    asignados = {}
+    for g, franja, posicion, arco in sorted(arcos, key=lambda a: (a[0], a[2], a[1])):
+        for _ in range(red.flujo(arco)):
+            ci = pendientes[g].pop()
+            lugares, id_clase = heapq.heappop(colas[franja])
+            asignados[ci] = (id_clase, posicion)
+            if lugares + 1 < 0:
+                heapq.heappush(colas[franja], (lugares + 1, id_clase))
+    return asignados
+
+
+######################################################################
+#lectura de la base y aplicacion
+######################################################################
+
+def _bloques(valores):
+    for i in range(0, len(valores), TAMANO_BLOQUE):
+        yield valores[i:i + TAMANO_BLOQUE]
+
+
+def planificar(cursor, preferencias, capacidad, bloquear=False):
+    """
+    Lee clases, ocupacion y turnos ya tomados y devuelve el plan. Con `bloquear` las
+    clases candidatas quedan bloqueadas (FOR UPDATE) hasta el fin de la transaccion,
+    para que nadie ocupe sus lugares entre el calculo y el INSERT.
+    """
+    cis = list(preferencias)
+    actividades = sorted({a for lista in preferencias.values() for a in lista})
+
+    existentes = set()
+    for bloque in _bloques(cis):
+        cursor.execute(f"SELECT ci FROM alumnos WHERE ci IN ({marcadores(bloque)})", bloque)
+        existentes |= {r[0] for r in cursor.fetchall()}
+
+    clases = {}
+    if actividades:
+        cursor.execute(f"""
+            SELECT id, id_actividad, id_turno, ci_instructor FROM clase
+            WHERE id_actividad IN ({marcadores(actividades)}) AND NOT dictada
+            ORDER BY id
+            {"FOR UPDATE" if bloquear else ""}
+        """, actividades)
+        clases = {r[0]: r[1:] for r in cursor.fetchall()}
+    ocupados = defaultdict(int)
+    ids = list(clases)
+    for bloque in _bloques(ids):
+        cursor.execute(f"""
+            SELECT id_clase, COUNT(*) FROM alumno_clase
+            WHERE id_clase IN ({marcadores(bloque)}) GROUP BY id_clase
+        """, bloque)
+        ocupados.update(dict(cursor.fetchall()))
+
+    #turnos que cada alumno ya tiene, extendidos a los que se superponen
+    bloqueados = defaultdict(set)
+    for bloque in _bloques(sorted(existentes)):
+        cursor.execute(f"""
+            SELECT DISTINCT ac.ci_alumno, c.id_turno FROM alumno_clase ac
+            JOIN clase c ON ac.id_clase = c.id
+            WHERE ac.ci_alumno IN ({marcadores(bloque)})
+        """, bloque)
+        for ci, id_turno in cursor.fetchall():
+            bloqueados[ci] |= indice_turnos.superpuestos(cursor, id_turno)
+
+    asignados = resolver(
+        {ci: preferencias[ci] for ci in existentes},
+        [(id_clase, a, t, capacidad - ocupados[id_clase]) for id_clase, (a, t, _) in clases.items()],
+        bloqueados,
+    )
+
+    plan = {"asignaciones": [], "sin_asignar": []}
+    por_preferencia = defaultdict(int)
+    for ci in cis:
+        if ci not in existentes:
+            plan["sin_asignar"].append({"ci": ci, "motivo": "alumno inexistente"})
+        elif ci not in asignados:
+            plan["sin_asignar"].append({"ci": ci, "motivo": "sin lugar en las actividades pedidas"})
+        else:
+            id_clase, posicion = asignados[ci]
+            id_actividad, id_turno, ci_instructor = clases[id_clase]
+            plan["asignaciones"].append({
+                "ci": ci, "id_clase": id_clase, "id_actividad": id_actividad,
+                "id_turno": id_turno, "ci_instructor": ci_instructor, "preferencia": posicion,
+            })
+            por_preferencia[posicion] += 1
+    plan["resumen"] = {
+        "alumnos": len(cis),
+        "asignados": len(plan["asignaciones"]),
+        "sin_asignar": len(plan["sin_asignar"]),
+        "por_preferencia": dict(sorted(por_preferencia.items())),
+    }
+    return plan
+
+
+def aplicar(cursor, plan):
+    """Inserta las asignaciones del plan (sin commit) y suma su aporte a los resumenes."""
+    pares = [(a["id_clase"], a["ci"]) for a in plan["asignaciones"]]
+    for bloque in _bloques(pares):
+        cursor.executemany("INSERT INTO alumno_clase (id_clase, ci_alumno) VALUES (%s, %s)", bloque)
+        condicion = f"(ac.id_clase, ac.ci_alumno) IN ({', '.join(['(%s, %s)'] * len(bloque))})"
+        resumenes.ajustar_inscripciones(cursor, condicion, [v for par in bloque for v in par], 1)
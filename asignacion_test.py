@@ -0,0 +1,74 @@
+import itertools
+import random
+import unittest
+from asignacion import resolver
+
+
+def opciones(ci, actividades, clases, bloqueados):
+    """(id_clase, posicion) que puede tomar el alumno, o None si queda sin lugar."""
+    actividades = list(dict.fromkeys(actividades))
+    resultado = [None]
+    for id_clase, id_actividad, id_turno, _ in clases:
+        if id_actividad in actividades and id_turno not in bloqueados.get(ci, set()):
+            resultado.append((id_clase, actividades.index(id_actividad) + 1))
+    return resultado
+
+
+def fuerza_bruta(preferencias, clases, bloqueados):
+    """(asignados, suma de posiciones) de la mejor asignacion probando todas."""
+    lugares = {id_clase: libres for id_clase, _, _, libres in clases}
+    cis = sorted(preferencias)
+    mejor = (0, 0)
+    for eleccion in itertools.product(*(opciones(ci, preferencias[ci], clases, bloqueados) for ci in cis)):
+        elegidas = [e for e in eleccion if e is not None]
+        ocupados = {}
+        for id_clase, _ in elegidas:
+            ocupados[id_clase] = ocupados.get(id_clase, 0) + 1
+        if any(n > lugares[id_clase] for id_clase, n in ocupados.items()):
+            continue
+        valor = (len(elegidas), -sum(p for _, p in elegidas))
+        mejor = max(mejor, valor)
+    return mejor[0], -mejor[1]
+
+
+def instancia(rnd):
+    actividades, turnos = rnd.randint(1, 3), rnd.randint(1, 3)
+    clases = [(i, rnd.randint(1, actividades), rnd.randint(1, turnos), rnd.randint(0, 2))
+              for i in range(1, rnd.randint(1, 4) + 1)]
+    preferencias = {f"{i}": [rnd.randint(1, actividades) for _ in range(rnd.randint(1, 3))]
+                    for i in range(rnd.randint(1, 5))}
+    bloqueados = {ci: {rnd.randint(1, turnos)} for ci in preferencias if rnd.random() < 0.4}
+    return preferencias, clases, bloqueados
+
+
+class ResolverTest(unittest.TestCase):
+    def test_igual_a_fuerza_bruta(self):
+        rnd = random.Random(7)
+        for _ in range(300):
+            preferencias, clases, bloqueados = instancia(rnd)
+            asignados = resolver(preferencias, clases, bloqueados)
+
+            #cada asignacion es valida y ninguna clase pasa su capacidad
+            por_clase = {c[0]: c for c in clases}
+            ocupados = {}
+            for ci, (id_clase, posicion) in asignados.items():
+                _, id_actividad, id_turno, _ = por_clase[id_clase]
+                self.assertEqual(list(dict.fromkeys(preferencias[ci]))[posicion - 1], id_actividad)
+                self.assertNotIn(id_turno, bloqueados.get(ci, set()))
+                ocupados[id_clase] = ocupados.get(id_clase, 0) + 1
+            for id_clase, n in ocupados.items():
+                self.assertLessEqual(n, por_clase[id_clase][3], (preferencias, clases, bloqueados))
+
+            #y es la mejor: la mayor cantidad de alumnos y, entre esas, la menor suma de posiciones
+            obtenido = (len(asignados), sum(p for _, p in asignados.values()))
+            self.assertEqual(obtenido, fuerza_bruta(preferencias, clases, bloqueados),
+                             (preferencias, clases, bloqueados))
+
+    def test_sin_clases_o_sin_lugar(self):
+        self.assertEqual(resolver({"1": [1]}, [], {}), {})
+        self.assertEqual(resolver({"1": [1]}, [(1, 1, 1, 0)], {}), {})
+        self.assertEqual(resolver({"1": [1, 2]}, [(1, 1, 1, 1), (2, 2, 2, 1)], {"1": {1}}), {"1": (2, 2)})
+
+
+if __name__ == "__main__":
+    unittest.main()
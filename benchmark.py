@@ -0,0 +1,1048 @@
+"""
+Benchmark de la API.
+
+    python benchmark.py sembrar --base obligatorio_bench [--alumnos 10000 ...]
+    python benchmark.py correr --base obligatorio_bench --salida resultados.json [--usuarios 20 --duracion 30]
+                               [--escenario mixto|login_con_reporte|login_con_exportacion] [--consultas consultas.json]
+    python benchmark.py comparar resultados.json baseline.json [--tolerancia 0.2]
+    python benchmark.py serializacion [--filas 10000 100000]
+    python benchmark.py concurrencia --base obligatorio_bench [--inscripciones 400 --clases 10]
+    python benchmark.py inventario --base obligatorio_bench [--inscripciones 200 --clases 10 --stock 25]
+    python benchmark.py asignacion [--alumnos 1000 5000 --clases 300 --actividades 20]
+    python benchmark.py humo --base obligatorio_bench [--consultas consultas.json]
+
+`sembrar` crea (o recrea) una base con una temporada sintetica reproducible.
+`correr` ejecuta una mezcla de llamadas contra `main.app` (en proceso, o contra un
+servidor con --url) y guarda throughput y p50/p95/p99 por endpoint en JSON. Los
+escenarios login_con_* miden /login/ solo y despues con reportes o exportaciones pesadas
+corriendo al mismo tiempo (login_con_reporte ademas ocupa casi todo el pool con
+CONSULTA_PESADA), y terminan con 1 si el p99 de /login/ sube mas que --tolerancia-p99.
+`comparar` termina con codigo 1 si algun endpoint empeoro mas que la tolerancia.
+`concurrencia` dispara inscripciones simultaneas sobre pocas clases nuevas y verifica
+que quede una sola clase por (instructor, actividad, turno), que todas las inscripciones
+esten y que las tablas de resumen sigan cuadrando; termina con 1 si algo falla.
+`inventario` dispara inscripciones simultaneas que alquilan el mismo equipamiento en
+el mismo turno y verifica que se acepten exactamente `stock` y que los contadores de
+inventario.py cuadren con alumno_clase; termina con 1 si se alquilo de mas.
+`serializacion` compara, sin base, la codificacion de un listado de alumnos con
+jsonable_encoder + json contra los mapeadores + orjson de serializacion.py.
+`asignacion` mide, sin base, el solver de asignacion.py sobre una temporada sintetica,
+verifica capacidad, turnos y preferencias, y lo compara con asignar por orden de llegada.
+`humo` llama una vez a cada endpoint en proceso (ver recorrido_humo) y guarda las sentencias
+que ejecutaron para `migraciones.py explicar`; termina con 1 si alguna llamada dio 5xx.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+import mysql.connector
+
+import analitica
+import database
+import inventario
+import metricas
+import migraciones
+import resumenes
+
+ESQUEMA = [
+    """
+    CREATE TABLE actividades (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        descripcion VARCHAR(255) NOT NULL,
+        costo FLOAT(10,2) NOT NULL,
+        emoji VARCHAR(255) NOT NULL DEFAULT ''
+    )
+    """,
+    """
+    CREATE TABLE equipamiento (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        id_actividad INT NOT NULL,
+        descripcion VARCHAR(255) NOT NULL,
+        costo FLOAT(10,2) NOT NULL,
+        FOREIGN KEY (id_actividad) REFERENCES actividades(id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE TABLE instructores (
+        ci VARCHAR(10) PRIMARY KEY,
+        nombre VARCHAR(255) NOT NULL,
+        apellido VARCHAR(255) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE turnos (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        hora_inicio TIME,
+        hora_fin TIME
+    )
+    """,
+    """
+    CREATE TABLE alumnos (
+        ci VARCHAR(10) PRIMARY KEY,
+        nombre VARCHAR(255) NOT NULL,
+        apellido VARCHAR(255) NOT NULL,
+        fecha_nacimiento DATE NOT NULL,
+        telefono VARCHAR(255) NOT NULL,
+        correo VARCHAR(255) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE clase (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        ci_instructor VARCHAR(10) NOT NULL,
+        id_actividad INT NOT NULL,
+        id_turno INT NOT NULL,
+        dictada BOOLEAN NOT NULL DEFAULT FALSE,
+        FOREIGN KEY (ci_instructor) REFERENCES instructores(ci) ON DELETE CASCADE,
+        FOREIGN KEY (id_actividad) REFERENCES actividades(id) ON DELETE CASCADE,
+        FOREIGN KEY (id_turno) REFERENCES turnos(id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE TABLE alumno_clase (
+        id_clase INT NOT NULL,
+        ci_alumno VARCHAR(10) NOT NULL,
+        id_equipamiento INT NULL,
+        PRIMARY KEY (id_clase, ci_alumno),
+        FOREIGN KEY (id_clase) REFERENCES clase(id) ON DELETE CASCADE,
+        FOREIGN KEY (ci_alumno) REFERENCES alumnos(ci) ON DELETE CASCADE,
+        FOREIGN KEY (id_equipamiento) REFERENCES equipamiento(id)
+    )
+    """,
+]
+
+NOMBRES = ["Ana", "Lucía", "Martín", "Sofía", "Joaquín", "Valentina", "Mateo", "Camila",
+           "Santiago", "Florencia", "Agustín", "Micaela", "Nicolás", "Inés", "Tomás", "Julieta"]
+APELLIDOS = ["Rodríguez", "González", "Fernández", "Pérez", "Martínez", "López", "Suárez",
+             "Gómez", "Sosa", "Núñez", "Álvarez", "Castro", "Méndez", "Olivera", "Silva", "Díaz"]
+ACTIVIDADES = [("Ski", 1500), ("Snowboard", 1800), ("Moto de nieve", 3200),
+               ("Raquetas de nieve", 900), ("Trineo", 700), ("Ski de fondo", 1200)]
+
+LOTE = 2000
+
+
+######################################################################
+#siembra
+######################################################################
+
+def _insertar(cursor, query, filas):
+    for i in range(0, len(filas), LOTE):
+        cursor.executemany(query, filas[i:i + LOTE])
+
+
+def sembrar(args):
+    if args.base == database.DB_CONFIG["database"] and not args.forzar:
+        print(f"la base '{args.base}' es la de la aplicacion, usar otra o --forzar")
+        return 2
+
+    rnd = random.Random(args.semilla)
+    config = {k: v for k, v in database.DB_CONFIG.items() if k != "database"}
+    connection = mysql.connector.connect(**config)
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"DROP DATABASE IF EXISTS `{args.base}`")
+        cursor.execute(f"CREATE DATABASE `{args.base}`")
+        cursor.execute(f"USE `{args.base}`")
+        for tabla in ESQUEMA:
+            cursor.execute(tabla)
+        migraciones.subir(cursor)
+
+        _insertar(cursor, "INSERT INTO actividades (descripcion, costo, emoji) VALUES (%s, %s, %s)",
+                  [(d, c, "") for d, c in ACTIVIDADES])
+        ids_actividades = list(range(1, len(ACTIVIDADES) + 1))
+
+        _insertar(cursor, "INSERT INTO equipamiento (id_actividad, descripcion, costo) VALUES (%s, %s, %s)",
+                  [(a, f"Equipo {a}-{n}", rnd.choice([300, 450, 600])) for a in ids_actividades for n in (1, 2)])
+        equipos_por_actividad = {a: [2 * a - 1, 2 * a] for a in ids_actividades}
+
+        instructores = [str(10000000 + i) for i in range(args.instructores)]
+        _insertar(cursor, "INSERT INTO instructores (ci, nombre, apellido) VALUES (%s, %s, %s)",
+                  [(ci, rnd.choice(NOMBRES), rnd.choice(APELLIDOS)) for ci in instructores])
+
+        #turnos de una o dos horas entre las 8 y las 18, algunos solapados
+        turnos = []
+        for i in range(args.turnos):
+            inicio = 8 + (i % 9)
+            turnos.append((f"{inicio:02d}:00:00", f"{inicio + 1 + i % 2:02d}:00:00"))
+        _insertar(cursor, "INSERT INTO turnos (hora_inicio, hora_fin) VALUES (%s, %s)", turnos)
+        ids_turnos = list(range(1, args.turnos + 1))
+
+        alumnos = [str(40000000 + i) for i in range(args.alumnos)]
+        _insertar(cursor, """
+            INSERT INTO alumnos (ci, nombre, apellido, fecha_nacimiento, telefono, correo)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, [(ci, rnd.choice(NOMBRES), rnd.choice(APELLIDOS),
+               date(1960, 1, 1) + timedelta(days=rnd.randrange(20000)),
+               f"09{rnd.randrange(10**7):07d}", f"alumno{ci}@correo.com") for ci in alumnos])
+
+        triples = set()
+        while len(triples) < args.clases:
+            triples.add((rnd.choice(instructores), rnd.choice(ids_actividades), rnd.choice(ids_turnos)))
+        clases = sorted(triples)
+        _insertar(cursor, "INSERT INTO clase (ci_instructor, id_actividad, id_turno, dictada) VALUES (%s, %s, %s, %s)",
+                  [(ci, a, t, False) for ci, a, t in clases])
+
+        #cada alumno a lo sumo en una clase por turno
+        ocupados = set()
+        inscripciones = []
+        intentos = 0
+        while len(inscripciones) < args.inscripciones and intentos < args.inscripciones * 5:
+            intentos += 1
+            id_clase = rnd.randrange(len(clases))
+            _, id_actividad, id_turno = clases[id_clase]
+            ci = rnd.choice(alumnos)
+            if (ci, id_turno) in ocupados:
+                continue
+            ocupados.add((ci, id_turno))
+            equipo = rnd.choice(equipos_por_actividad[id_actividad]) if rnd.random() < 0.3 else None
+            #inscripciones repartidas en una temporada (junio a setiembre)
+            fecha = date(2024, 6, 1) + timedelta(days=rnd.randrange(122))
+            inscripciones.append((id_clase + 1, ci, equipo, fecha))
+        _insertar(cursor, """
+            INSERT INTO alumno_clase (id_clase, ci_alumno, id_equipamiento, fecha_inscripcion)
+            VALUES (%s, %s, %s, %s)
+        """, inscripciones)
+
+        resumenes.reconstruir(cursor)
+        analitica.reconstruir(cursor)
+        inventario.reconstruir(cursor)
+        connection.commit()
+        print(f"base '{args.base}' sembrada: {len(alumnos)} alumnos, {len(instructores)} instructores, "
+              f"{len(turnos)} turnos, {len(clases)} clases, {len(inscripciones)} inscripciones")
+        return 0
+    finally:
+        connection.close()
+
+
+######################################################################
+#carga
+######################################################################
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados) + 0.5) - 1))
+    return ordenados[indice]
+
+
+class Escenario:
+    """Mezcla de llamadas que hace cada usuario virtual."""
+
+    def __init__(self, rnd, alumnos, instructores, actividades, turnos):
+        self.rnd = rnd
+        self.alumnos = alumnos
+        self.instructores = instructores
+        self.actividades = actividades
+        self.turnos = turnos
+
+    def login(self):
+        #uno de cada cinco intentos con una CI que no existe (la rechaza el indice sin ir a la base)
+        if self.rnd.random() < 0.2:
+            return "login inexistente", "POST", "/login/", {"ci": f"x{self.rnd.randrange(10**8):08d}"}
+        return "login", "POST", "/login/", {"ci": self.rnd.choice(self.alumnos)}
+
+    def catalogo(self):
+        ruta = self.rnd.choice(["/actividades/", "/turnos/", "/instructores/", "/equipamientos/"])
+        return "catalogo " + ruta, "GET", ruta, None
+
+    def clases(self):
+        return "clases", "GET", f"/clases/?id_turno={self.rnd.choice(self.turnos)}", None
+
+    def inscripcion(self):
+        return "inscripciones", "POST", "/inscripciones/", {
+            "alumnos": self.rnd.sample(self.alumnos, 20),
+            "id_actividad": self.rnd.choice(self.actividades),
+            "ci_instructor": self.rnd.choice(self.instructores),
+            "id_turno": self.rnd.choice(self.turnos),
+        }
+
+    def reporte(self):
+        ruta = self.rnd.choice(["/reportes/actividades_mas_ingresos/", "/reportes/actividades_mas_alumnos/",
+                                "/reportes/turnos_mas_clases/"])
+        return "reporte " + ruta, "GET", ruta, None
+
+    def bootstrap(self):
+        return "bootstrap", "GET", "/bootstrap/", None
+
+    def analitica(self):
+        por = self.rnd.choice(["dia", "semana", "mes"])
+        return "analitica " + por, "GET", f"/analitica/?desde=2024-06-01&hasta=2024-09-30&periodo={por}&dimensiones=actividad", None
+
+    def busqueda(self):
+        #lo que se va tipeando: dos o tres letras de un apellido, o el comienzo de una CI
+        if self.rnd.random() < 0.3:
+            texto = self.rnd.choice(self.alumnos)[:4]
+        else:
+            texto = self.rnd.choice(APELLIDOS)[:self.rnd.randint(2, 3)]
+        return "buscar", "GET", f"/buscar/?q={texto}", None
+
+    def exportacion(self):
+        return "exportar inscripciones", "GET", "/exportar/inscripciones/?formato=csv", None
+
+    MEZCLAS = {
+        #proporciones de cada tipo de llamada
+        "mixto": {"login": 40, "catalogo": 30, "clases": 10, "inscripcion": 10, "reporte": 10, "analitica": 5, "bootstrap": 5,
+                  "busqueda": 10},
+        "login": {"login": 1},
+        "exportacion": {"exportacion": 1},
+        "reportes": {"reporte": 1, "analitica": 3, "exportacion": 1},
+    }
+
+    def elegir(self, mezcla):
+        pesos = self.MEZCLAS[mezcla]
+        return getattr(self, self.rnd.choices(list(pesos), weights=list(pesos.values()))[0])()
+
+
+async def _usuario(cliente, escenario, mezcla, hasta, muestras):
+    while time.monotonic() < hasta:
+        nombre, metodo, ruta, cuerpo = escenario.elegir(mezcla)
+        inicio = time.perf_counter()
+        try:
+            respuesta = await cliente.request(metodo, ruta, json=cuerpo)
+            estado = respuesta.status_code
+        except Exception:
+            estado = 0
+        muestras.setdefault(nombre, []).append((time.perf_counter() - inicio, estado))
+
+
+def _resumir(muestras, duracion):
+    resultado = {}
+    for nombre, valores in sorted(muestras.items()):
+        tiempos = [t for t, _ in valores]
+        estados = {}
+        for _, estado in valores:
+            estados[str(estado)] = estados.get(str(estado), 0) + 1
+        resultado[nombre] = {
+            "n": len(valores),
+            "rps": round(len(valores) / duracion, 2),
+            "p50_ms": round(percentil(tiempos, 50) * 1000, 3),
+            "p95_ms": round(percentil(tiempos, 95) * 1000, 3),
+            "p99_ms": round(percentil(tiempos, 99) * 1000, 3),
+            "errores": sum(n for e, n in estados.items() if e == "0" or e.startswith("5")),
+            "estados": estados,
+        }
+    return resultado
+
+
+def _datos_semilla():
+    connection = database.get_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT ci FROM alumnos ORDER BY ci LIMIT 5000")
+            alumnos = [r[0] for r in cursor.fetchall()]
+            cursor.execute("SELECT ci FROM instructores")
+            instructores = [r[0] for r in cursor.fetchall()]
+            cursor.execute("SELECT id FROM actividades")
+            actividades = [r[0] for r in cursor.fetchall()]
+            cursor.execute("SELECT id FROM turnos")
+            turnos = [r[0] for r in cursor.fetchall()]
+            return alumnos, instructores, actividades, turnos
+    finally:
+        connection.close()
+
+
+#un reporte caro de verdad: compañeros de clase de cada alumno (autojoin de alumno_clase)
+CONSULTA_PESADA = """
+    SELECT a.ci_alumno, COUNT(DISTINCT b.ci_alumno) AS companeros
+    FROM alumno_clase a
+    JOIN alumno_clase b ON a.id_clase = b.id_clase AND a.ci_alumno <> b.ci_alumno
+    GROUP BY a.ci_alumno
+    ORDER BY companeros DESC
+    LIMIT 10
+"""
+
+
+def _consulta_pesada(hasta, en_proceso, muestras):
+    """
+    Repite CONSULTA_PESADA hasta `hasta`. En proceso usa el pool de la aplicacion, como lo
+    haria un handler de reportes lento: ocupa una conexion y un rato de CPU de la base.
+    """
+    while time.monotonic() < hasta:
+        inicio = time.perf_counter()
+        estado = 200
+        try:
+            connection = database.get_connection() if en_proceso else mysql.connector.connect(**database.DB_CONFIG)
+            try:
+                cursor = connection.cursor()
+                cursor.execute(CONSULTA_PESADA)
+                cursor.fetchall()
+                cursor.close()
+            finally:
+                connection.close()
+        except Exception:
+            estado = 0
+        muestras.setdefault("consulta pesada (sql directo)", []).append((time.perf_counter() - inicio, estado))
+
+
+async def _fase(cliente, datos, grupos, duracion, semilla, pesadas=0, en_proceso=True):
+    """
+    Corre en paralelo los grupos de usuarios [(mezcla, cantidad)] durante `duracion` segundos,
+    mas `pesadas` hilos que repiten CONSULTA_PESADA.
+    """
+    muestras = {}
+    hasta = time.monotonic() + duracion
+    tareas = []
+    for mezcla, cantidad in grupos:
+        for i in range(cantidad):
+            escenario = Escenario(random.Random(f"{semilla}-{mezcla}-{i}"), *datos)
+            tareas.append(_usuario(cliente, escenario, mezcla, hasta, muestras))
+    for _ in range(pesadas):
+        tareas.append(asyncio.to_thread(_consulta_pesada, hasta, en_proceso, muestras))
+    inicio = time.monotonic()
+    await asyncio.gather(*tareas)
+    return _resumir(muestras, time.monotonic() - inicio)
+
+
+#carga pesada de cada escenario login_con_*: (mezcla, usuarios de la API, hilos con CONSULTA_PESADA)
+CARGAS_LOGIN = {
+    "login_con_exportacion": ("exportacion", 2, 0),
+    #casi todo el pool ocupado en consultas de segundos, mas reportes y exportaciones por la API
+    "login_con_reporte": ("reportes", 4, database.POOL_TAMANO - 2),
+}
+
+
+def _p99_login(fases, escenario, tolerancia):
+    """Problemas si el p99 de /login/ con carga supera al de /login/ solo mas la tolerancia."""
+    problemas = []
+    for nombre in ("login", "login inexistente"):
+        solo = fases["login_solo"].get(nombre)
+        con_carga = fases[escenario].get(nombre)
+        if solo is None or con_carga is None:
+            continue
+        limite = solo["p99_ms"] * (1 + tolerancia)
+        print(f"p99 {nombre}: solo {solo['p99_ms']} ms, con carga {con_carga['p99_ms']} ms (maximo {limite:.3f} ms)")
+        if con_carga["p99_ms"] > limite:
+            problemas.append(f"{nombre}: p99 {solo['p99_ms']} -> {con_carga['p99_ms']} ms")
+        if con_carga["errores"] > solo["errores"]:
+            problemas.append(f"{nombre}: errores {solo['errores']} -> {con_carga['errores']}")
+    return problemas
+
+
+async def _correr(args):
+    import httpx
+
+    datos = _datos_semilla()
+    if args.url:
+        cliente = httpx.AsyncClient(base_url=args.url, timeout=60)
+        contexto = None
+    else:
+        from main import app
+        cliente = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+        contexto = app.router.lifespan_context(app)
+        await contexto.__aenter__()
+
+    try:
+        fases = {}
+        if args.escenario == "mixto":
+            fases["mixto"] = await _fase(cliente, datos, [("mixto", args.usuarios)], args.duracion, args.semilla)
+        else:
+            #latencia de /login/ sola y con consultas pesadas corriendo al mismo tiempo
+            fases["login_solo"] = await _fase(cliente, datos, [("login", args.usuarios)], args.duracion, args.semilla)
+            mezcla, usuarios, pesadas = CARGAS_LOGIN[args.escenario]
+            fases[args.escenario] = await _fase(
+                cliente, datos, [("login", args.usuarios), (mezcla, usuarios)], args.duracion, args.semilla,
+                pesadas=pesadas, en_proceso=not args.url)
+        return fases
+    finally:
+        await cliente.aclose()
+        if contexto is not None:
+            await contexto.__aexit__(None, None, None)
+
+
+def correr(args):
+    database.DB_CONFIG["database"] = args.base
+    fases = asyncio.run(_correr(args))
+    resultado = {
+        "meta": {
+            "escenario": args.escenario,
+            "usuarios": args.usuarios,
+            "duracion_seg": args.duracion,
+            "semilla": args.semilla,
+            "tolerancia_p99": args.tolerancia_p99,
+            "destino": args.url or "en proceso",
+            "python": platform.python_version(),
+            "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "fases": fases,
+    }
+    with open(args.salida, "w") as archivo:
+        json.dump(resultado, archivo, indent=2, ensure_ascii=False)
+    if args.consultas and args.url:
+        print("--consultas solo se puede usar en proceso (sin --url)")
+    elif args.consultas:
+        #un ejemplo de cada sentencia que ejecutaron los endpoints, para migraciones.py explicar
+        with open(args.consultas, "w") as archivo:
+            json.dump(metricas.muestras_consultas(), archivo, indent=1, ensure_ascii=False, default=str)
+        print(f"consultas ejecutadas guardadas en {args.consultas}")
+
+    for fase, endpoints in fases.items():
+        print(f"== {fase}")
+        print(f"{'endpoint':45} {'n':>7} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'err':>5}")
+        for nombre, r in endpoints.items():
+            print(f"{nombre:45} {r['n']:>7} {r['rps']:>8} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9} {r['errores']:>5}")
+    print(f"resultados guardados en {args.salida}")
+    if args.escenario in CARGAS_LOGIN:
+        problemas = _p99_login(fases, args.escenario, args.tolerancia_p99)
+        for p in problemas:
+            print("REGRESION", p)
+        return 1 if problemas else 0
+    return 0
+
+
+######################################################################
+#comparacion contra baseline
+######################################################################
+
+def comparar(args):
+    with open(args.resultados) as archivo:
+        actual = json.load(archivo)["fases"]
+    with open(args.baseline) as archivo:
+        base = json.load(archivo)["fases"]
+
+    regresiones = []
+    for fase, endpoints in base.items():
+        for nombre, b in endpoints.items():
+            a = actual.get(fase, {}).get(nombre)
+            if a is None:
+                regresiones.append(f"{fase} / {nombre}: no aparece en los resultados")
+                continue
+            for metrica in ("p95_ms", "p99_ms"):
+                if b[metrica] > 0 and a[metrica] > b[metrica] * (1 + args.tolerancia):
+                    regresiones.append(f"{fase} / {nombre}: {metrica} {b[metrica]} -> {a[metrica]}")
+            if b["rps"] > 0 and a["rps"] < b["rps"] * (1 - args.tolerancia):
+                regresiones.append(f"{fase} / {nombre}: rps {b['rps']} -> {a['rps']}")
+            if a["errores"] > b["errores"]:
+                regresiones.append(f"{fase} / {nombre}: errores {b['errores']} -> {a['errores']}")
+
+    for r in regresiones:
+        print("REGRESION", r)
+    print(f"{len(regresiones)} regresiones (tolerancia {args.tolerancia:.0%})")
+    return 1 if regresiones else 0
+
+
+######################################################################
+#prueba de concurrencia de /inscripciones/
+######################################################################
+
+#filas propias de la prueba, se borran al empezar y al terminar
+#(InstructorCreate pide una CI numerica; las sembradas empiezan en 1 y 4)
+PREFIJO_INSTRUCTOR = "99"
+PREFIJO_ALUMNO = "c"
+
+
+async def _limpiar_concurrencia(cliente, instructores, alumnos):
+    #por la API, para que el servidor actualice resumenes e indices en memoria
+    for ci in instructores:
+        await cliente.delete(f"/instructores/{ci}")
+    for ci in alumnos:
+        await cliente.delete(f"/alumnos/{ci}")
+
+
+async def _preparar_concurrencia(cliente, args, instructores, alumnos):
+    """Instructores y alumnos nuevos: ningun choque de turnos que no sea el que se prueba."""
+    rnd = random.Random(args.semilla)
+    for ci in instructores:
+        respuesta = await cliente.post("/instructores/", json={"ci": ci, "nombre": "Prueba", "apellido": "Concurrencia"})
+        if respuesta.status_code != 200:
+            raise RuntimeError(f"no se pudo crear el instructor de prueba {ci}: {respuesta.text[:500]}")
+    csv_alumnos = "ci,nombre,apellido,fecha_nacimiento,telefono,correo\n" + "".join(
+        f"{ci},Prueba,Concurrencia,2000-01-01,099000000,{ci}@correo.com\n" for ci in alumnos)
+    respuesta = await cliente.post("/alumnos/importar/", files={"archivo": ("alumnos.csv", csv_alumnos.encode())})
+    if respuesta.json().get("insertados") != len(alumnos):
+        raise RuntimeError(f"no se pudieron crear los alumnos de prueba: {respuesta.text[:500]}")
+    actividades = [a["id"] for a in (await cliente.get("/actividades/")).json()]
+    turnos = [t["id"] for t in (await cliente.get("/turnos/")).json()]
+    #un instructor por clase: ninguna clase nueva choca con otra del mismo instructor
+    return [(ci, rnd.choice(actividades), rnd.choice(turnos)) for ci in instructores]
+
+
+def _verificar_concurrencia(clases, inscriptos):
+    problemas = []
+    connection = database.get_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT ci_instructor, id_actividad, id_turno, COUNT(*) FROM clase
+                WHERE ci_instructor LIKE %s GROUP BY ci_instructor, id_actividad, id_turno
+            """, (PREFIJO_INSTRUCTOR + "%",))
+            creadas = {(ci, a, t): n for ci, a, t, n in cursor.fetchall()}
+            for clase in clases:
+                if creadas.get(clase, 0) != 1:
+                    problemas.append(f"clase {clase}: {creadas.get(clase, 0)} filas")
+            cursor.execute("SELECT COUNT(*) FROM alumno_clase WHERE ci_alumno LIKE %s", (PREFIJO_ALUMNO + "%",))
+            (en_base,) = cursor.fetchone()
+            if en_base != inscriptos:
+                problemas.append(f"alumno_clase tiene {en_base} inscripciones, se respondieron {inscriptos} con exito")
+            problemas += [f"resumen {d['tabla']} id={d['id']}" for d in resumenes.verificar(cursor)]
+            problemas += [f"analitica {d['celda']}" for d in analitica.verificar(cursor)]
+    finally:
+        connection.close()
+    return problemas
+
+
+async def _concurrencia(args):
+    import httpx
+
+    if args.url:
+        cliente = httpx.AsyncClient(base_url=args.url, timeout=60)
+        contexto = None
+    else:
+        from main import app
+        cliente = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+        contexto = app.router.lifespan_context(app)
+        await contexto.__aenter__()
+
+    instructores = [f"{PREFIJO_INSTRUCTOR}{i:06d}" for i in range(args.clases)]
+    alumnos = [f"{PREFIJO_ALUMNO}{i:07d}" for i in range(args.inscripciones)]
+
+    async def inscribir(i):
+        ci_instructor, id_actividad, id_turno = clases[i % len(clases)]
+        inicio = time.perf_counter()
+        try:
+            respuesta = await cliente.post("/inscripciones/", json={
+                "alumnos": [alumnos[i]], "id_actividad": id_actividad,
+                "ci_instructor": ci_instructor, "id_turno": id_turno,
+            })
+            estado = respuesta.status_code
+        except Exception:
+            estado = 0
+        return time.perf_counter() - inicio, estado
+
+    try:
+        await _limpiar_concurrencia(cliente, instructores, alumnos)
+        clases = await _preparar_concurrencia(cliente, args, instructores, alumnos)
+        inicio = time.monotonic()
+        resultados = await asyncio.gather(*(inscribir(i) for i in range(len(alumnos))))
+        duracion = time.monotonic() - inicio
+        estados = {}
+        for _, estado in resultados:
+            estados[estado] = estados.get(estado, 0) + 1
+        problemas = _verificar_concurrencia(clases, estados.get(200, 0))
+        reintentos = (await cliente.get("/pool/")).json().get("reintentos_transaccion")
+        await _limpiar_concurrencia(cliente, instructores, alumnos)
+        return resultados, estados, duracion, problemas, reintentos
+    finally:
+        await cliente.aclose()
+        if contexto is not None:
+            await contexto.__aexit__(None, None, None)
+
+
+def concurrencia(args):
+    if args.base == database.DB_CONFIG["database"] and not args.forzar:
+        print(f"la base '{args.base}' es la de la aplicacion, usar otra o --forzar")
+        return 2
+    database.DB_CONFIG["database"] = args.base
+    resultados, estados, duracion, problemas, reintentos = asyncio.run(_concurrencia(args))
+
+    tiempos = [t for t, _ in resultados]
+    print(f"{len(resultados)} inscripciones sobre {args.clases} clases en {duracion:.2f}s: "
+          f"{len(resultados) / duracion:.1f} por segundo, p50 {percentil(tiempos, 50) * 1000:.1f} ms, "
+          f"p99 {percentil(tiempos, 99) * 1000:.1f} ms, estados {estados}, reintentos por deadlock {reintentos}")
+    if estados.get(200, 0) != len(resultados):
+        problemas.append(f"{len(resultados) - estados.get(200, 0)} inscripciones no respondieron 200")
+    for problema in problemas:
+        print("FALLA", problema)
+    print("ok: una clase por (instructor, actividad, turno)" if not problemas else f"{len(problemas)} fallas")
+    return 1 if problemas else 0
+
+
+######################################################################
+#stock de equipamiento bajo concurrencia
+######################################################################
+
+DESCRIPCION_EQUIPAMIENTO = "Prueba inventario"
+
+
+async def _limpiar_equipamiento(cliente):
+    for equipamiento in (await cliente.get("/equipamientos/")).json():
+        if equipamiento["descripcion"] == DESCRIPCION_EQUIPAMIENTO:
+            await cliente.delete(f"/equipamientos/{equipamiento['id']}")
+
+
+def _verificar_inventario(id_equipamiento, id_turno, stock, aceptadas):
+    problemas = []
+    connection = database.get_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM alumno_clase WHERE id_equipamiento = %s", (id_equipamiento,))
+            (en_base,) = cursor.fetchone()
+            cursor.execute("SELECT reservados FROM reservas_equipamiento WHERE id_equipamiento = %s AND id_turno = %s",
+                           (id_equipamiento, id_turno))
+            fila = cursor.fetchone()
+            reservados = fila[0] if fila else 0
+            if en_base > stock:
+                problemas.append(f"se alquilaron {en_base} unidades con stock {stock}")
+            if not en_base == reservados == aceptadas:
+                problemas.append(f"alumno_clase {en_base}, contador {reservados}, respuestas 200 {aceptadas}")
+            problemas += [f"inventario {d['clave']}" for d in inventario.verificar(cursor)]
+            problemas += [f"resumen {d['tabla']} id={d['id']}" for d in resumenes.verificar(cursor)]
+            problemas += [f"analitica {d['celda']}" for d in analitica.verificar(cursor)]
+    finally:
+        connection.close()
+    return problemas
+
+
+async def _inventario(args):
+    import httpx
+
+    if args.url:
+        cliente = httpx.AsyncClient(base_url=args.url, timeout=60)
+        contexto = None
+    else:
+        from main import app
+        cliente = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+        contexto = app.router.lifespan_context(app)
+        await contexto.__aenter__()
+
+    instructores = [f"{PREFIJO_INSTRUCTOR}{i:06d}" for i in range(args.clases)]
+    alumnos = [f"{PREFIJO_ALUMNO}{i:07d}" for i in range(args.inscripciones)]
+
+    async def inscribir(i):
+        ci_instructor, id_actividad, id_turno = clases[i % len(clases)]
+        inicio = time.perf_counter()
+        try:
+            respuesta = await cliente.post("/inscripciones/", json={
+                "alumnos": [alumnos[i]], "id_actividad": id_actividad, "ci_instructor": ci_instructor,
+                "id_turno": id_turno, "id_equipamiento": id_equipamiento,
+            })
+            estado = respuesta.status_code
+        except Exception:
+            estado = 0
+        return time.perf_counter() - inicio, estado
+
+    try:
+        await _limpiar_concurrencia(cliente, instructores, alumnos)
+        await _limpiar_equipamiento(cliente)
+        clases = await _preparar_concurrencia(cliente, args, instructores, alumnos)
+        #todas las clases en la misma actividad y turno: compiten por las mismas unidades
+        _, id_actividad, id_turno = clases[0]
+        clases = [(ci, id_actividad, id_turno) for ci, _, _ in clases]
+        respuesta = await cliente.post("/equipamientos/", json={
+            "id_actividad": id_actividad, "descripcion": DESCRIPCION_EQUIPAMIENTO, "costo": 100, "stock": args.stock,
+        })
+        if respuesta.status_code != 200:
+            raise RuntimeError(f"no se pudo crear el equipamiento de prueba: {respuesta.text[:500]}")
+        id_equipamiento = respuesta.json()["id"]
+
+        inicio = time.monotonic()
+        resultados = await asyncio.gather(*(inscribir(i) for i in range(len(alumnos))))
+        duracion = time.monotonic() - inicio
+        estados = {}
+        for _, estado in resultados:
+            estados[estado] = estados.get(estado, 0) + 1
+        problemas = _verificar_inventario(id_equipamiento, id_turno, args.stock, estados.get(200, 0))
+        libres = next(e["libres"] for e in (await cliente.get(f"/disponibilidad/turnos/{id_turno}/equipamiento/")).json()
+                      if e["id"] == id_equipamiento)
+        if libres != max(args.stock - len(alumnos), 0):
+            problemas.append(f"/disponibilidad/ informa {libres} unidades libres")
+        await _limpiar_concurrencia(cliente, instructores, alumnos)
+        await _limpiar_equipamiento(cliente)
+        return resultados, estados, duracion, problemas
+    finally:
+        await cliente.aclose()
+        if contexto is not None:
+            await contexto.__aexit__(None, None, None)
+
+
+def inventario_concurrente(args):
+    if args.base == database.DB_CONFIG["database"] and not args.forzar:
+        print(f"la base '{args.base}' es la de la aplicacion, usar otra o --forzar")
+        return 2
+    database.DB_CONFIG["database"] = args.base
+    resultados, estados, duracion, problemas = asyncio.run(_inventario(args))
+
+    tiempos = [t for t, _ in resultados]
+    print(f"{len(resultados)} inscripciones con stock {args.stock} en {duracion:.2f}s: "
+          f"p50 {percentil(tiempos, 50) * 1000:.1f} ms, p99 {percentil(tiempos, 99) * 1000:.1f} ms, estados {estados}")
+    esperadas = min(args.stock, len(resultados))
+    if estados.get(200, 0) != esperadas:
+        problemas.append(f"{estados.get(200, 0)} inscripciones aceptadas, se esperaban {esperadas}")
+    if estados.get(400, 0) != len(resultados) - esperadas:
+        problemas.append(f"{estados.get(400, 0)} rechazadas por stock, se esperaban {len(resultados) - esperadas}")
+    for problema in problemas:
+        print("FALLA", problema)
+    print("ok: no se alquilo de mas" if not problemas else f"{len(problemas)} fallas")
+    return 1 if problemas else 0
+
+
+######################################################################
+#recorrido de humo: cada endpoint una vez
+######################################################################
+
+#filas propias del recorrido, se crean y se borran por la API
+CI_INSTRUCTOR_HUMO = 98000001
+ALUMNOS_HUMO = ["h0000001", "h0000002"]
+
+
+def recorrido_humo(cliente, datos):
+    """
+    Llama una vez a cada endpoint con `cliente` (TestClient o httpx.Client), lecturas y un
+    ciclo de escrituras que deshace al terminar. Sirve para capturar las sentencias que
+    ejecutan los handlers (ver metricas.muestras_consultas). Devuelve [(metodo, ruta, estado)]
+    de las llamadas que respondieron 5xx.
+    """
+    alumnos, instructores, actividades, turnos = datos
+    fallas = []
+
+    def llamar(metodo, ruta, cuerpo=None, params=None):
+        respuesta = cliente.request(metodo, ruta, json=cuerpo, params=params)
+        if respuesta.status_code >= 500:
+            fallas.append((metodo, ruta, respuesta.status_code))
+        return respuesta
+
+    for ruta in ["/actividades/", "/turnos/", "/instructores/", "/equipamientos/", "/bootstrap/",
+                 f"/clases/?id_turno={turnos[0]}", f"/clases/?ci_instructor={instructores[0]}",
+                 f"/clases/?id_actividad={actividades[0]}", f"/buscar/?q={APELLIDOS[0][:3]}",
+                 f"/buscar/?q={alumnos[0][:4]}", f"/alumnos/?nombre={NOMBRES[0][:3]}",
+                 "/reportes/actividades_mas_ingresos/", "/reportes/actividades_mas_alumnos/",
+                 "/reportes/turnos_mas_clases/",
+                 f"/disponibilidad/turnos/{turnos[0]}/instructores/",
+                 f"/disponibilidad/instructores/{instructores[0]}/turnos/",
+                 f"/disponibilidad/turnos/{turnos[0]}/equipamiento/",
+                 f"/disponibilidad/turnos/{turnos[0]}/equipamiento/?id_actividad={actividades[0]}"]:
+        llamar("GET", ruta)
+    for periodo in ("dia", "semana", "mes"):
+        llamar("GET", f"/analitica/?desde=2024-06-01&hasta=2024-09-30&periodo={periodo}&dimensiones=actividad")
+    for tabla in ("alumnos", "clases", "inscripciones"):
+        llamar("GET", f"/exportar/{tabla}/?formato=ndjson")
+    pagina = llamar("GET", "/alumnos/", params={"limite": 10})
+    if pagina.status_code == 200 and pagina.json().get("cursor_siguiente"):
+        llamar("GET", "/alumnos/", params={"limite": 10, "cursor": pagina.json()["cursor_siguiente"]})
+    llamar("POST", "/login/", {"ci": alumnos[0]})
+    llamar("POST", "/login/", {"ci": "x0000000"})
+    llamar("POST", "/asignaciones/", {
+        "alumnos": [{"ci": ci, "preferencias": actividades[:2]} for ci in alumnos[:5]],
+        "capacidad": 10, "dry_run": True})
+
+    #escrituras sobre filas propias: no chocan con los turnos de los alumnos sembrados
+    llamar("DELETE", f"/instructores/{CI_INSTRUCTOR_HUMO}")
+    for ci in ALUMNOS_HUMO:
+        llamar("DELETE", f"/alumnos/{ci}")
+    llamar("POST", "/instructores/", {"ci": CI_INSTRUCTOR_HUMO, "nombre": "Prueba", "apellido": "Humo"})
+    for ci in ALUMNOS_HUMO:
+        llamar("POST", "/alumnos/", {"ci": ci, "nombre": "Prueba", "apellido": "Humo", "fecha_nacimiento": "2000-01-01",
+                                     "telefono": "099000000", "correo": f"{ci}@correo.com"})
+    equipamiento = [e for e in llamar("GET", "/equipamientos/").json() if e.get("id_actividad") == actividades[0]]
+    cuerpo = {"alumnos": ALUMNOS_HUMO, "id_actividad": actividades[0], "ci_instructor": str(CI_INSTRUCTOR_HUMO),
+              "id_turno": turnos[0]}
+    if equipamiento:
+        cuerpo["id_equipamiento"] = equipamiento[0]["id"]
+        llamar("PUT", f"/equipamientos/{equipamiento[0]['id']}/stock", {"stock": equipamiento[0].get("stock")})
+    inscripcion = llamar("POST", "/inscripciones/", cuerpo)
+    if inscripcion.status_code == 200:
+        id_clase = inscripcion.json()["id_clase"]
+        llamar("PUT", f"/clases/{id_clase}/alumnos/", {"quitar": ALUMNOS_HUMO[:1]})
+        llamar("PUT", f"/clases/{id_clase}/", {"agregar_alumnos": ALUMNOS_HUMO[:1], "id_turno": turnos[-1]})
+        llamar("GET", f"/clases/?ci_instructor={CI_INSTRUCTOR_HUMO}")
+    for ci in ALUMNOS_HUMO:
+        llamar("DELETE", f"/alumnos/{ci}")
+    llamar("DELETE", f"/instructores/{CI_INSTRUCTOR_HUMO}")
+    return fallas
+
+
+def humo(args):
+    from fastapi.testclient import TestClient
+    from main import app
+
+    database.DB_CONFIG["database"] = args.base
+    with TestClient(app) as cliente:
+        fallas = recorrido_humo(cliente, _datos_semilla())
+    for metodo, ruta, estado in fallas:
+        print(f"FALLA {metodo} {ruta}: {estado}")
+    consultas = metricas.muestras_consultas()
+    with open(args.consultas, "w") as archivo:
+        json.dump(consultas, archivo, indent=1, ensure_ascii=False, default=str)
+    print(f"{len(consultas)} sentencias distintas guardadas en {args.consultas}")
+    return 1 if fallas else 0
+
+
+######################################################################
+#micro-benchmark de serializacion
+######################################################################
+
+def _filas_alumnos(cantidad):
+    return [
+        (f"{i:08d}", f"Nombre{i}", f"Apellido{i}", date(2000, 1, 1) + timedelta(days=i % 7000),
+         f"09{i % 10000000:07d}", f"alumno{i}@correo.com")
+        for i in range(cantidad)
+    ]
+
+
+def serializacion(args):
+    from fastapi.encoders import jsonable_encoder
+    from serializacion import a_json, mapeador
+
+    mapeo = mapeador("ci", "nombre", "apellido", "fecha_nacimiento", "telefono", "correo")
+
+    def actual(filas):
+        items = [{"ci": a[0], "nombre": a[1], "apellido": a[2], "fecha_nacimiento": a[3], "telefono": a[4], "correo": a[5]} for a in filas]
+        return json.dumps(jsonable_encoder(items)).encode()
+
+    def nuevo(filas):
+        return a_json(list(map(mapeo, filas)))
+
+    for cantidad in args.filas:
+        filas = _filas_alumnos(cantidad)
+        if json.loads(actual(filas)) != json.loads(nuevo(filas)):
+            print(f"{cantidad} filas: las salidas no coinciden")
+            return 1
+        tiempos = {}
+        for nombre, funcion in (("jsonable_encoder+json", actual), ("mapeador+orjson", nuevo)):
+            mejor = None
+            for _ in range(args.repeticiones):
+                inicio = time.perf_counter()
+                funcion(filas)
+                transcurrido = time.perf_counter() - inicio
+                mejor = transcurrido if mejor is None else min(mejor, transcurrido)
+            tiempos[nombre] = mejor
+            print(f"{cantidad:>7} filas  {nombre:<22} {mejor * 1000:9.2f} ms")
+        print(f"{cantidad:>7} filas  mejora x{tiempos['jsonable_encoder+json'] / tiempos['mapeador+orjson']:.1f}")
+    return 0
+
+
+######################################################################
+#micro-benchmark del solver de asignaciones
+######################################################################
+
+def _temporada_asignacion(rnd, alumnos, clases, actividades, turnos):
+    lugares = [(i, rnd.randint(1, actividades), rnd.randint(1, turnos), rnd.randint(4, 12))
+               for i in range(1, clases + 1)]
+    preferencias = {f"{i:08d}": rnd.sample(range(1, actividades + 1), min(3, actividades))
+                    for i in range(alumnos)}
+    #la mitad de los alumnos ya tiene una clase en algun turno
+    bloqueados = {ci: {rnd.randint(1, turnos)} for ci in preferencias if rnd.random() < 0.5}
+    return lugares, preferencias, bloqueados
+
+
+def _orden_de_llegada(preferencias, clases, bloqueados):
+    libres = {id_clase: lugares for id_clase, _, _, lugares in clases}
+    asignados = {}
+    for ci, actividades in preferencias.items():
+        for posicion, id_actividad in enumerate(actividades, start=1):
+            clase = next((c for c in clases if c[1] == id_actividad and libres[c[0]] > 0
+                          and c[2] not in bloqueados.get(ci, ())), None)
+            if clase:
+                libres[clase[0]] -= 1
+                asignados[ci] = (clase[0], posicion)
+                break
+    return asignados
+
+
+def asignacion(args):
+    import asignacion as solver
+
+    rnd = random.Random(args.semilla)
+    for cantidad in args.alumnos:
+        clases, preferencias, bloqueados = _temporada_asignacion(
+            rnd, cantidad, args.clases, args.actividades, args.turnos)
+        inicio = time.perf_counter()
+        asignados = solver.resolver(preferencias, clases, bloqueados)
+        transcurrido = time.perf_counter() - inicio
+
+        por_clase = {c[0]: c for c in clases}
+        ocupados = {}
+        for ci, (id_clase, posicion) in asignados.items():
+            _, id_actividad, id_turno, _ = por_clase[id_clase]
+            ocupados[id_clase] = ocupados.get(id_clase, 0) + 1
+            if preferencias[ci][posicion - 1] != id_actividad or id_turno in bloqueados.get(ci, ()):
+                print(f"{cantidad} alumnos: asignacion invalida para {ci}")
+                return 1
+        if any(ocupados[i] > por_clase[i][3] for i in ocupados):
+            print(f"{cantidad} alumnos: se supero la capacidad de una clase")
+            return 1
+
+        llegada = _orden_de_llegada(preferencias, clases, bloqueados)
+        lugares = sum(c[3] for c in clases)
+        primera = sum(1 for _, posicion in asignados.values() if posicion == 1)
+        print(f"{cantidad:>7} alumnos  {len(clases)} clases ({lugares} lugares)  {transcurrido * 1000:9.1f} ms")
+        print(f"{'':>7}          asignados {len(asignados)} (orden de llegada {len(llegada)}), "
+              f"en su primera preferencia {primera}")
+        if len(asignados) < len(llegada):
+            print(f"{cantidad} alumnos: el solver asigna menos que el orden de llegada")
+            return 1
+    return 0
+
+
+def main(argumentos):
+    parser = argparse.ArgumentParser(description="Benchmark de la API")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("sembrar", help="crear una base con una temporada sintetica")
+    p.add_argument("--base", required=True)
+    p.add_argument("--alumnos", type=int, default=10000)
+    p.add_argument("--instructores", type=int, default=50)
+    p.add_argument("--turnos", type=int, default=12)
+    p.add_argument("--clases", type=int, default=300)
+    p.add_argument("--inscripciones", type=int, default=20000)
+    p.add_argument("--semilla", type=int, default=1)
+    p.add_argument("--forzar", action="store_true", help="permitir sembrar la base de la aplicacion")
+    p.set_defaults(funcion=sembrar)
+
+    p = sub.add_parser("correr", help="ejecutar la carga y guardar los resultados")
+    p.add_argument("--base", required=True)
+    p.add_argument("--url", help="servidor a probar; por defecto main.app en proceso")
+    p.add_argument("--escenario", choices=["mixto", *CARGAS_LOGIN], default="mixto")
+    p.add_argument("--tolerancia-p99", type=float, default=0.5,
+                   help="en login_con_*: cuanto puede subir el p99 de /login/ con carga (0.5 = 50%%)")
+    p.add_argument("--usuarios", type=int, default=20)
+    p.add_argument("--duracion", type=float, default=30)
+    p.add_argument("--semilla", type=int, default=1)
+    p.add_argument("--salida", default="resultados_benchmark.json")
+    p.add_argument("--consultas", help="guardar las sentencias ejecutadas (solo en proceso) para migraciones.py explicar")
+    p.set_defaults(funcion=correr)
+
+    p = sub.add_parser("comparar", help="comparar resultados contra un baseline")
+    p.add_argument("resultados")
+    p.add_argument("baseline")
+    p.add_argument("--tolerancia", type=float, default=0.2)
+    p.set_defaults(funcion=comparar)
+
+    p = sub.add_parser("concurrencia", help="inscripciones simultaneas sobre las mismas clases")
+    p.add_argument("--base", required=True)
+    p.add_argument("--url", help="servidor a probar; por defecto main.app en proceso")
+    p.add_argument("--inscripciones", type=int, default=400)
+    p.add_argument("--clases", type=int, default=10)
+    p.add_argument("--semilla", type=int, default=1)
+    p.add_argument("--forzar", action="store_true", help="permitir usar la base de la aplicacion")
+    p.set_defaults(funcion=concurrencia)
+
+    p = sub.add_parser("inventario", help="inscripciones simultaneas que alquilan el mismo equipamiento")
+    p.add_argument("--base", required=True)
+    p.add_argument("--url", help="servidor a probar; por defecto main.app en proceso")
+    p.add_argument("--inscripciones", type=int, default=200)
+    p.add_argument("--clases", type=int, default=10)
+    p.add_argument("--stock", type=int, default=25)
+    p.add_argument("--semilla", type=int, default=1)
+    p.add_argument("--forzar", action="store_true", help="permitir usar la base de la aplicacion")
+    p.set_defaults(funcion=inventario_concurrente)
+
+    p = sub.add_parser("humo", help="llamar una vez a cada endpoint y guardar las sentencias ejecutadas")
+    p.add_argument("--base", required=True)
+    p.add_argument("--consultas", default="consultas.json")
+    p.set_defaults(funcion=humo)
+
+    p = sub.add_parser("serializacion", help="comparar la serializacion de listados")
+    p.add_argument("--filas", type=int, nargs="+", default=[10000, 100000])
+    p.add_argument("--repeticiones", type=int, default=5)
+    p.set_defaults(funcion=serializacion)
+
+    p = sub.add_parser("asignacion", help="medir el solver de asignaciones grupales")
+    p.add_argument("--alumnos", type=int, nargs="+", default=[1000, 5000])
+    p.add_argument("--clases", type=int, default=300)
+    p.add_argument("--actividades", type=int, default=20)
+    p.add_argument("--turnos", type=int, default=12)
+    p.add_argument("--semilla", type=int, default=1)
+    p.set_defaults(funcion=asignacion)
+
+    args = parser.parse_args(argumentos)
+    return args.funcion(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
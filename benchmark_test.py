@@ -0,0 +1,40 @@
+import os
+import unittest
+from unittest import mock
+import benchmark
+import database
+
+#base descartable para las pruebas que necesitan MySQL: se borra y se vuelve a sembrar
+BASE_PRUEBAS = os.environ.get("DB_PRUEBAS")
+
+
+@unittest.skipUnless(BASE_PRUEBAS, "definir DB_PRUEBAS con una base descartable para usar MySQL")
+class InvariantesTest(unittest.TestCase):
+    """Las pruebas de carga de benchmark.py terminan con 1 si encuentran una falla."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.base_anterior = database.DB_CONFIG["database"]
+        with mock.patch("builtins.print"):
+            sembrado = benchmark.main(["sembrar", "--base", BASE_PRUEBAS, "--alumnos", "2000", "--instructores", "20",
+                                       "--clases", "100", "--inscripciones", "3000"])
+        assert sembrado == 0, "no se pudo sembrar la base de pruebas"
+
+    @classmethod
+    def tearDownClass(cls):
+        database.DB_CONFIG["database"] = cls.base_anterior
+
+    def test_una_clase_por_instructor_actividad_y_turno(self):
+        with mock.patch("builtins.print") as salida:
+            resultado = benchmark.main(["concurrencia", "--base", BASE_PRUEBAS, "--inscripciones", "120", "--clases", "4"])
+        self.assertEqual(resultado, 0, salida.call_args_list)
+
+    def test_no_se_alquila_de_mas(self):
+        with mock.patch("builtins.print") as salida:
+            resultado = benchmark.main(["inventario", "--base", BASE_PRUEBAS, "--inscripciones", "60", "--clases", "4",
+                                        "--stock", "7"])
+        self.assertEqual(resultado, 0, salida.call_args_list)
+
+
+if __name__ == "__main__":
+    unittest.main()
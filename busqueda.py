@@ -0,0 +1,339 @@
+"""
+Busqueda por prefijo y por trigramas sobre alumnos e instructores.
+
+Nombre, apellido, CI y correo se pasan a minusculas y sin tildes ("Núñez" -> "nunez")
+y se parten en palabras. Cada palabra distinta se guarda una sola vez:
+  - en una lista ordenada, donde un prefijo es un rango que se encuentra con bisect;
+  - en un indice de trigramas, para encontrar la palabra por un pedazo del medio
+    ("ere" -> "perez") cuando lo buscado tiene 3 letras o mas.
+Las personas se referencian por un numero, asi la memoria crece con la cantidad de
+palabras distintas y de personas, no con cada busqueda.
+
+Cada palabra de la consulta tiene que coincidir con alguna palabra de la persona;
+el puntaje suma 3 por palabra exacta, 2 por prefijo y 1 por pedazo del medio.
+
+Se carga la primera vez que se busca y los altas, cambios y bajas lo mantienen al
+dia. Como los demas indices en memoria, supone un solo proceso.
+
+La memoria esta acotada por MAX_APARICIONES, la cantidad de pares (palabra, persona):
+cada palabra distinta aparece al menos una vez y los trigramas salen de las palabras,
+asi que el tope limita las tres estructuras. Si se pasa, el indice se vacia y queda
+desbordado: /buscar/ sigue andando con buscar_en_base (solo por prefijo, con LIKE sobre
+columnas indexadas, ver la migracion 5). Cada REVISAR_DESBORDE segundos se cuentan las
+personas de la base y, si con las apariciones por persona que habia al desbordar ya
+entrarian, se vuelve a cargar. No se desaloja una parte, porque un indice incompleto
+daria resultados incompletos sin avisar.
+"""
+import bisect
+import heapq
+import itertools
+import os
+import re
+import sys
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from paginacion import escapar_like
+
+LIMITE_RESULTADOS = 50          #tope de `limite` en /buscar/
+MAX_APARICIONES = int(os.environ.get("BUSQUEDA_MAX_APARICIONES", 2_000_000))   #unos 150 bytes cada una
+REVISAR_DESBORDE = 300          #segundos entre intentos de volver a cargar un indice desbordado
+PUNTAJE_EXACTO = 3
+PUNTAJE_PREFIJO = 2
+PUNTAJE_SUBCADENA = 1
+CAMPOS = {
+    "alumnos": ("ci", "nombre", "apellido", "correo"),
+    "instructores": ("ci", "nombre", "apellido"),
+}
+
+
+def normalizar(texto):
+    if texto.isascii():
+        return texto.lower()
+    descompuesto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in descompuesto if not unicodedata.combining(c)).casefold()
+
+
+def palabras(texto):
+    return re.findall(r"[0-9a-z]+", normalizar(texto or ""))
+
+
+def _trigramas(palabra):
+    #las CI se buscan por prefijo: los numeros no van al indice de trigramas
+    if palabra.isdigit():
+        return set()
+    return {palabra[i:i + 3] for i in range(len(palabra) - 2)}
+
+
+class IndiceBusqueda:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._carga = threading.Lock()  #una sola carga a la vez
+        self._cargado = False
+        self._pendientes = None     #cambios que llegan mientras se lee la base
+        self._numeros = {}          #(tipo, ci) -> numero
+        self._personas = {}         #numero -> (tipo, valores de CAMPOS, palabras, orden)
+        self._siguiente = 0
+        self._palabras = []         #palabras distintas, ordenadas
+        self._apariciones = {}      #palabra -> numeros de personas (listas: ocupan menos que sets)
+        self._trigramas = defaultdict(set)  #trigrama -> palabras
+        self._total_apariciones = 0
+        self._desbordado = False    #paso MAX_APARICIONES: vacio hasta que vuelva a entrar
+        self._por_persona = 0.0     #apariciones por persona al desbordar
+        self._revisado = 0.0        #ultimo intento de recargar estando desbordado (monotonic)
+        #estadisticas
+        self._busquedas = 0
+        self._recargas = 0
+        self._desbordes = 0
+
+    ##################################################################
+    #mantenimiento
+    ##################################################################
+
+    def cargar(self, cursor):
+        """
+        Lee las dos tablas si el indice no esta cargado (o fue invalidado). Si esta desbordado
+        lo intenta cada REVISAR_DESBORDE segundos, y solo si la cantidad de personas ya entraria.
+        """
+        with self._carga:
+            if self.cargado():
+                return
+            if self.desbordado():
+                ahora = time.monotonic()
+                if ahora - self._revisado < REVISAR_DESBORDE:
+                    return
+                self._revisado = ahora
+                cursor.execute("SELECT (SELECT COUNT(*) FROM alumnos) + (SELECT COUNT(*) FROM instructores)")
+                personas = cursor.fetchone()[0]
+                if personas * self._por_persona > MAX_APARICIONES:
+                    return
+            self._cargar(cursor)
+
+    def _cargar(self, cursor):
+        with self._lock:
+            self._pendientes = []
+        cursor.execute("SELECT ci, nombre, apellido, correo FROM alumnos")
+        alumnos = cursor.fetchall()
+        cursor.execute("SELECT ci, nombre, apellido FROM instructores")
+        instructores = cursor.fetchall()
+        with self._lock:
+            self._vaciar()
+            self._cargado = True
+            self._desbordado = False
+            for tipo, filas in (("alumnos", alumnos), ("instructores", instructores)):
+                for fila in filas:
+                    if self._desbordado:
+                        break
+                    self._poner(tipo, fila, ordenar=False)
+            self._palabras.sort()
+            #lo que cambio mientras se leia se aplica encima
+            for cambio in self._pendientes:
+                if self._desbordado:
+                    break
+                self._aplicar(*cambio)
+            self._pendientes = None
+            self._recargas += 1
+
+    def _vaciar(self):
+        self._numeros.clear()
+        self._personas.clear()
+        self._palabras.clear()
+        self._apariciones.clear()
+        self._trigramas.clear()
+        self._total_apariciones = 0
+
+    def _desbordar(self):
+        self._por_persona = self._total_apariciones / max(len(self._personas), 1)
+        self._revisado = time.monotonic()
+        self._vaciar()
+        self._cargado = False
+        self._desbordado = True
+        self._desbordes += 1
+
+    def invalidar(self):
+        """Vacia el indice; la proxima busqueda lo vuelve a cargar (tambien si estaba desbordado)."""
+        with self._lock:
+            self._cargado = False
+            self._desbordado = False
+            self._vaciar()
+
+    def agregar(self, tipo, **datos):
+        """Alta o cambio ya confirmado (despues del commit). `datos` trae los CAMPOS del tipo."""
+        self._cambio(tipo, datos, None)
+
+    def quitar(self, tipo, ci):
+        """Baja ya confirmada (despues del commit)."""
+        self._cambio(tipo, None, ci)
+
+    def _cambio(self, tipo, datos, ci):
+        with self._lock:
+            if self._pendientes is not None:
+                self._pendientes.append((tipo, datos, ci))
+            if self._cargado:
+                self._aplicar(tipo, datos, ci)
+
+    def _aplicar(self, tipo, datos, ci):
+        if datos is None:
+            self._sacar(tipo, str(ci))
+        else:
+            self._poner(tipo, [datos.get(campo) for campo in CAMPOS[tipo]])
+
+    def _poner(self, tipo, fila, ordenar=True):
+        """`fila` trae los valores de CAMPOS[tipo] en orden. Sin `ordenar`, hay que ordenar _palabras despues."""
+        valores = tuple(None if v is None else sys.intern(str(v)) for v in fila)
+        ci, nombre, apellido = valores[:3]
+        self._sacar(tipo, ci)
+        numero = self._siguiente
+        self._siguiente += 1
+        propias = tuple({sys.intern(p) for v in valores for p in palabras(v)})
+        self._numeros[(tipo, ci)] = numero
+        #el orden entre puntajes iguales: apellido, nombre, CI
+        self._personas[numero] = (tipo, valores, propias, f"{normalizar(apellido or '')}\0{normalizar(nombre or '')}\0{ci}")
+        for palabra in propias:
+            apariciones = self._apariciones.get(palabra)
+            if apariciones is None:
+                apariciones = self._apariciones[palabra] = []
+                if ordenar:
+                    bisect.insort(self._palabras, palabra)
+                else:
+                    self._palabras.append(palabra)
+                for trigrama in _trigramas(palabra):
+                    self._trigramas[trigrama].add(palabra)
+            apariciones.append(numero)
+        self._total_apariciones += len(propias)
+        if self._total_apariciones > MAX_APARICIONES:
+            self._desbordar()
+
+    def _sacar(self, tipo, ci):
+        numero = self._numeros.pop((tipo, ci), None)
+        if numero is None:
+            return
+        propias = self._personas.pop(numero)[2]
+        self._total_apariciones -= len(propias)
+        for palabra in propias:
+            apariciones = self._apariciones[palabra]
+            apariciones.remove(numero)
+            if not apariciones:
+                #nadie mas la usa: se borra de la lista y de los trigramas
+                del self._apariciones[palabra]
+                del self._palabras[bisect.bisect_left(self._palabras, palabra)]
+                for trigrama in _trigramas(palabra):
+                    self._trigramas[trigrama].discard(palabra)
+                    if not self._trigramas[trigrama]:
+                        del self._trigramas[trigrama]
+
+    ##################################################################
+    #consulta
+    ##################################################################
+
+    def cargado(self):
+        with self._lock:
+            return self._cargado
+
+    def desbordado(self):
+        with self._lock:
+            return self._desbordado
+
+    def _puntajes(self, buscada):
+        """numero -> mejor puntaje de `buscada` contra las palabras de esa persona."""
+        exactas, prefijos = (), []
+        inicio = bisect.bisect_left(self._palabras, buscada)
+        for i in range(inicio, len(self._palabras)):
+            palabra = self._palabras[i]
+            if not palabra.startswith(buscada):
+                break
+            if palabra == buscada:
+                exactas = self._apariciones[palabra]
+            else:
+                prefijos.append(self._apariciones[palabra])
+        puntajes = dict.fromkeys(itertools.chain.from_iterable(prefijos), PUNTAJE_PREFIJO)
+        puntajes.update(dict.fromkeys(exactas, PUNTAJE_EXACTO))
+        trigramas = _trigramas(buscada)
+        if trigramas:
+            #palabras que tienen todos los trigramas y ademas contienen lo buscado
+            candidatas = None
+            for trigrama in sorted(trigramas, key=lambda t: len(self._trigramas.get(t, ()))):
+                conjunto = self._trigramas.get(trigrama)
+                if not conjunto:
+                    return puntajes
+                candidatas = set(conjunto) if candidatas is None else candidatas & conjunto
+                if not candidatas:
+                    return puntajes
+            for palabra in candidatas:
+                if buscada in palabra and not palabra.startswith(buscada):
+                    for numero in self._apariciones[palabra]:
+                        puntajes.setdefault(numero, PUNTAJE_SUBCADENA)
+        return puntajes
+
+    def buscar(self, texto, tipo=None, limite=10):
+        """Las `limite` personas con mejor puntaje, de `tipo` o de los dos."""
+        buscadas = sorted(set(palabras(texto)), key=len, reverse=True)
+        with self._lock:
+            self._busquedas += 1
+            if not buscadas:
+                return []
+            total = None
+            for buscada in buscadas:
+                puntajes = self._puntajes(buscada)
+                if total is None:
+                    total = {n: p for n, p in puntajes.items() if tipo is None or self._personas[n][0] == tipo}
+                else:
+                    total = {n: p + puntajes[n] for n, p in total.items() if n in puntajes}
+                if not total:
+                    return []
+            personas = self._personas
+            mejores = heapq.nsmallest(limite, ((-p, personas[n][3], n) for n, p in total.items()))
+            return [{"tipo": personas[n][0], **dict(zip(CAMPOS[personas[n][0]], personas[n][1])), "puntaje": -p}
+                    for p, _, n in mejores]
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "personas": len(self._personas),
+                "palabras": len(self._palabras),
+                "trigramas": len(self._trigramas),
+                "apariciones": self._total_apariciones,
+                "max_apariciones": MAX_APARICIONES,
+                "desbordado": int(self._desbordado),
+                "desbordes": self._desbordes,
+                "busquedas": self._busquedas,
+                "recargas": self._recargas,
+            }
+
+
+def buscar_en_base(cursor, texto, tipo=None, limite=10):
+    """
+    Lo mismo que IndiceBusqueda.buscar pero con LIKE en la base, para cuando el indice esta
+    desbordado: cada palabra tiene que ser prefijo de algun campo. Solo prefijos, para que
+    cada LIKE use el indice de su columna; no encuentra la segunda palabra de un apellido
+    compuesto ni pedazos del medio.
+    """
+    buscadas = sorted(set(palabras(texto)), key=len, reverse=True)
+    if not buscadas:
+        return []
+    encontrados = []
+    for tipo_persona, campos in CAMPOS.items():
+        if tipo is not None and tipo != tipo_persona:
+            continue
+        condiciones, parametros = [], []
+        for buscada in buscadas:
+            condiciones.append("(" + " OR ".join(f"{campo} LIKE %s" for campo in campos) + ")")
+            parametros += [escapar_like(buscada)] * len(campos)
+        cursor.execute(f"""
+            SELECT {", ".join(campos)} FROM {tipo_persona}
+            WHERE {" AND ".join(condiciones)}
+            ORDER BY apellido, nombre, ci LIMIT %s
+        """, (*parametros, limite))
+        encontrados += [(tipo_persona, fila) for fila in cursor.fetchall()]
+
+    resultados = []
+    for tipo_persona, fila in encontrados:
+        propias = {p for v in fila for p in palabras(None if v is None else str(v))}
+        puntaje = sum(PUNTAJE_EXACTO if buscada in propias else PUNTAJE_PREFIJO for buscada in buscadas)
+        resultados.append({"tipo": tipo_persona, **dict(zip(CAMPOS[tipo_persona], fila)), "puntaje": puntaje})
+    resultados.sort(key=lambda r: (-r["puntaje"], normalizar(r["apellido"] or ""), normalizar(r["nombre"] or ""), str(r["ci"])))
+    return resultados[:limite]
+
+
+indice_busqueda = IndiceBusqueda()
@@ -0,0 +1,79 @@
+import unittest
+from unittest import mock
+import busqueda
+from busqueda import IndiceBusqueda, buscar_en_base
+
+ALUMNOS = [("1", "Ana", "Pérez García", "ana@correo.com"), ("2", "Juan", "López", "juan@correo.com")]
+INSTRUCTORES = [("3", "Pedro", "Díaz")]
+
+
+class CursorFalso:
+    def __init__(self, alumnos=ALUMNOS, instructores=INSTRUCTORES):
+        self.alumnos = alumnos
+        self.instructores = instructores
+        self.consultas = []
+        self._filas = []
+
+    def execute(self, query, parametros=None):
+        self.consultas.append((query, parametros))
+        if "COUNT(*)" in query:
+            self._filas = [(len(self.alumnos) + len(self.instructores),)]
+        elif "FROM alumnos" in query:
+            self._filas = self.alumnos
+        else:
+            self._filas = self.instructores
+
+    def fetchall(self):
+        return self._filas
+
+    def fetchone(self):
+        return self._filas[0]
+
+
+class IndiceBusquedaTest(unittest.TestCase):
+    def test_prefijo_subcadena_y_tildes(self):
+        indice = IndiceBusqueda()
+        indice.cargar(CursorFalso())
+        self.assertEqual([r["ci"] for r in indice.buscar("perez")], ["1"])
+        self.assertEqual([r["puntaje"] for r in indice.buscar("gar")], [busqueda.PUNTAJE_PREFIJO])
+        self.assertEqual([r["ci"] for r in indice.buscar("arci")], ["1"])
+        self.assertEqual([r["ci"] for r in indice.buscar("diaz", tipo="instructores")], ["3"])
+        self.assertEqual(indice.buscar("diaz", tipo="alumnos"), [])
+
+    def test_desborda_y_vuelve_cuando_entra(self):
+        indice = IndiceBusqueda()
+        cursor = CursorFalso()
+        with mock.patch.object(busqueda, "MAX_APARICIONES", 5):
+            indice.cargar(cursor)
+            self.assertFalse(indice.cargado())
+            self.assertTrue(indice.desbordado())
+            self.assertEqual(indice.estadisticas()["apariciones"], 0)
+
+            #antes de REVISAR_DESBORDE no se vuelve a leer la base
+            cursor.consultas.clear()
+            indice.cargar(cursor)
+            self.assertEqual(cursor.consultas, [])
+
+            #pasado el plazo se cuenta, y con las mismas personas sigue sin entrar
+            with mock.patch.object(busqueda.time, "monotonic", return_value=busqueda.time.monotonic() + 1000):
+                indice.cargar(cursor)
+            self.assertEqual(len(cursor.consultas), 1)
+            self.assertTrue(indice.desbordado())
+
+        #con mas lugar (o menos personas) se vuelve a cargar
+        with mock.patch.object(busqueda.time, "monotonic", return_value=busqueda.time.monotonic() + 2000):
+            indice.cargar(cursor)
+        self.assertTrue(indice.cargado())
+        self.assertFalse(indice.desbordado())
+        self.assertEqual([r["ci"] for r in indice.buscar("juan")], ["2"])
+
+    def test_en_base_solo_por_prefijo(self):
+        cursor = CursorFalso(alumnos=ALUMNOS[:1])
+        resultados = buscar_en_base(cursor, "Perez an", "alumnos", 5)
+        self.assertEqual([(r["ci"], r["puntaje"]) for r in resultados], [("1", busqueda.PUNTAJE_EXACTO + busqueda.PUNTAJE_PREFIJO)])
+        query, parametros = cursor.consultas[0]
+        self.assertTrue(all(p.endswith("%") and not p.startswith("%") for p in parametros[:-1]))
+
+
+if __name__ == "__main__":
+    unittest.main()
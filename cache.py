@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import OrderedDict
+
+#parametros del cache de catalogos
+CACHE_MAX_ENTRADAS = 32             #cantidad maxima de listados guardados
+CACHE_MAX_BYTES = 8 * 1024 * 1024   #tamaño total de lo guardado
+CACHE_MAX_BYTES_ENTRADA = 1024 * 1024   #listados mas grandes no se guardan
+CACHE_TTL = 300             #segundos, por si se escapa alguna invalidacion
+
+
+class CacheCatalogo:
+    """
+    Cache de lectura para las tablas de referencia (actividades, turnos, instructores,
+    equipamiento). Guarda la respuesta ya codificada en JSON (bytes), asi un acierto no
+    consulta la base ni vuelve a serializar. Los GET leen a traves del cache y los
+    POST/PUT/DELETE invalidan las tablas que modifican.
+    """
+
+    def __init__(self, max_entradas=CACHE_MAX_ENTRADAS, max_bytes=CACHE_MAX_BYTES,
+                 max_bytes_entrada=CACHE_MAX_BYTES_ENTRADA, ttl=CACHE_TTL):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.max_bytes_entrada = max_bytes_entrada
+        self.ttl = ttl
+        self._entradas = OrderedDict()   #clave -> (expira, tablas, valor)
+        self._bytes = 0
+        self._generaciones = {}          #tabla -> cantidad de invalidaciones
+        self._lock = threading.Lock()
+        #estadisticas
+        self._aciertos = 0
+        self._fallos = 0
+        self._invalidaciones = 0
+        self._expiradas = 0
+        self._desalojadas = 0
+
+    def obtener(self, clave, cargar, tablas=None):
+        """
+        Devuelve el valor guardado para `clave` o lo carga con `cargar()`.
+        `tablas` son las tablas de las que depende el valor (por defecto la clave).
+        """
+        tablas = tuple(tablas or (clave,))
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                if entrada[0] > time.monotonic():
+                    self._entradas.move_to_end(clave)
+                    self._aciertos += 1
+                    return entrada[2]
+                self._quitar(clave)
+                self._expiradas += 1
+            self._fallos += 1
+            generacion = self._generacion(tablas)
+
+        #se carga fuera del lock para no bloquear a los demas listados
+        valor = cargar()
+
+        with self._lock:
+            #si hubo una escritura mientras se cargaba, el valor puede estar viejo
+            if generacion == self._generacion(tablas) and len(valor) <= self.max_bytes_entrada:
+                if clave in self._entradas:
+                    self._quitar(clave)
+                self._entradas[clave] = (time.monotonic() + self.ttl, tablas, valor)
+                self._bytes += len(valor)
+                while len(self._entradas) > self.max_entradas or self._bytes > self.max_bytes:
+                    self._quitar(next(iter(self._entradas)))
+                    self._desalojadas += 1
+        return valor
+
+    def invalidar(self, *tablas):
+        with self._lock:
+            for tabla in tablas:
+                self._generaciones[tabla] = self._generaciones.get(tabla, 0) + 1
+            for clave in [c for c, e in self._entradas.items() if set(e[1]) & set(tablas)]:
+                self._quitar(clave)
+            self._invalidaciones += 1
+
+    def _quitar(self, clave):
+        self._bytes -= len(self._entradas.pop(clave)[2])
+
+    def _generacion(self, tablas):
+        return tuple(self._generaciones.get(t, 0) for t in tablas)
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self._aciertos + self._fallos
+            return {
+                "entradas": len(self._entradas),
+                "max_entradas": self.max_entradas,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "aciertos": self._aciertos,
+                "fallos": self._fallos,
+                "tasa_aciertos": round(self._aciertos / consultas, 4) if consultas else 0.0,
+                "invalidaciones": self._invalidaciones,
+                "expiradas": self._expiradas,
+                "desalojadas": self._desalojadas,
+            }
+
+
+cache_catalogo = CacheCatalogo()
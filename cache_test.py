@@ -0,0 +1,79 @@
+import threading
+import unittest
+from unittest import mock
+from cache import CacheCatalogo
+
+
+class CacheCatalogoTest(unittest.TestCase):
+    def test_acierto_no_vuelve_a_cargar(self):
+        cache = CacheCatalogo()
+        cargas = []
+        cargar = lambda: cargas.append(1) or b"[1]"
+        self.assertEqual(cache.obtener("turnos", cargar), b"[1]")
+        self.assertEqual(cache.obtener("turnos", cargar), b"[1]")
+        self.assertEqual(len(cargas), 1)
+        self.assertEqual((cache.estadisticas()["aciertos"], cache.estadisticas()["fallos"]), (1, 1))
+
+    def test_invalidar_quita_lo_que_depende_de_la_tabla(self):
+        cache = CacheCatalogo()
+        cache.obtener("turnos", lambda: b"t")
+        cache.obtener("bootstrap", lambda: b"b", tablas=("turnos", "actividades"))
+        cache.obtener("actividades", lambda: b"a")
+        cache.invalidar("turnos")
+        self.assertEqual(cache.obtener("turnos", lambda: b"t2"), b"t2")
+        self.assertEqual(cache.obtener("bootstrap", lambda: b"b2", tablas=("turnos", "actividades")), b"b2")
+        self.assertEqual(cache.obtener("actividades", lambda: b"a2"), b"a")
+
+    def test_escritura_durante_la_carga_no_guarda_el_valor_viejo(self):
+        cache = CacheCatalogo()
+
+        def cargar():
+            cache.invalidar("turnos")   #un POST que entra mientras se consulta
+            return b"viejo"
+
+        self.assertEqual(cache.obtener("turnos", cargar), b"viejo")
+        self.assertEqual(cache.obtener("turnos", lambda: b"nuevo"), b"nuevo")
+
+    def test_expira(self):
+        cache = CacheCatalogo(ttl=10)
+        with mock.patch("cache.time.monotonic", return_value=100):
+            cache.obtener("turnos", lambda: b"t")
+        with mock.patch("cache.time.monotonic", return_value=111):
+            self.assertEqual(cache.obtener("turnos", lambda: b"t2"), b"t2")
+        self.assertEqual(cache.estadisticas()["expiradas"], 1)
+
+    def test_limites_de_entradas_y_bytes(self):
+        cache = CacheCatalogo(max_entradas=2, max_bytes=10, max_bytes_entrada=6)
+        cache.obtener("a", lambda: b"1234")
+        cache.obtener("b", lambda: b"1234")
+        cache.obtener("a", lambda: b"x")        #"a" pasa a ser la mas usada
+        cache.obtener("c", lambda: b"1234")     #desaloja "b"
+        self.assertEqual(cache.obtener("a", lambda: b"x"), b"1234")
+        self.assertEqual(cache.obtener("b", lambda: b"nuevo"), b"nuevo")
+        cache.obtener("grande", lambda: b"1234567")
+        estadisticas = cache.estadisticas()
+        self.assertLessEqual(estadisticas["entradas"], 2)
+        self.assertLessEqual(estadisticas["bytes"], 10)
+        self.assertEqual(cache.obtener("grande", lambda: b"otro"), b"otro")
+
+    def test_bytes_cuadran_con_hilos(self):
+        cache = CacheCatalogo(max_entradas=5, max_bytes=40)
+
+        def trabajar(n):
+            for i in range(200):
+                clave = f"k{(n + i) % 8}"
+                cache.obtener(clave, lambda: b"x" * (i % 9 + 1))
+                if i % 7 == 0:
+                    cache.invalidar(clave)
+
+        hilos = [threading.Thread(target=trabajar, args=(n,)) for n in range(4)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(cache._bytes, sum(len(e[2]) for e in cache._entradas.values()))
+        self.assertLessEqual(cache._bytes, 40)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import time
+import unittest
+from unittest import mock
+import database
+from database import EnrutadorLecturas, Error, PoolAgotadoError, PoolConexiones, _Entrada, _Replica
+
+
+class PoolFalso(PoolConexiones):
+    """Pool que no abre conexiones reales; `caido` simula un servidor que no responde."""
+
+    def __init__(self, tamano=5, caido=False):
+        super().__init__({}, tamano=tamano, timeout=5)
+        self.caido = caido
+
+    def _abrir(self):
+        if self.caido:
+            with self._condicion:
+                self._abiertas -= 1
+            raise Error(msg="sin conexion")
+        return _Entrada(object())
+
+    def _sana(self, entrada):
+        return True
+
+
+class EnrutadorLecturasTest(unittest.TestCase):
+    def test_replica_saturada_pasa_enseguida_al_primario(self):
+        replica = PoolFalso(tamano=1)
+        replica.obtener()
+        primario = PoolFalso()
+        enrutador = EnrutadorLecturas(primario, [_Replica("r", replica)])
+        inicio = time.monotonic()
+        enrutador.obtener()
+        self.assertLess(time.monotonic() - inicio, 1)
+        self.assertEqual(enrutador.estadisticas()["lecturas_primario"], 1)
+        self.assertEqual(enrutador.estadisticas()["r0_expulsiones"], 0)
+
+    def test_replica_caida_queda_fuera(self):
+        enrutador = EnrutadorLecturas(PoolFalso(), [_Replica("r", PoolFalso(caido=True))])
+        with mock.patch("builtins.print"):
+            enrutador.obtener()
+        self.assertEqual(enrutador.estadisticas()["r0_expulsiones"], 1)
+        self.assertEqual(enrutador.estadisticas()["r0_disponible"], 0)
+
+    def test_compartida_despues_de_escribir_lee_del_primario(self):
+        enrutador = EnrutadorLecturas(PoolFalso(), [_Replica("r", PoolFalso())])
+        enrutador.obtener(compartida=True)
+        enrutador.escritura()
+        enrutador.obtener(compartida=True)
+        enrutador.obtener()
+        datos = enrutador.estadisticas()
+        self.assertEqual((datos["r0_lecturas"], datos["lecturas_primario"]), (2, 1))
+
+    def test_timeout_propio(self):
+        pool = PoolFalso(tamano=1)
+        pool.obtener()
+        inicio = time.monotonic()
+        with self.assertRaises(PoolAgotadoError):
+            pool.obtener(timeout=0.01)
+        self.assertLess(time.monotonic() - inicio, 1)
+
+
+class ConfigurarReplicasTest(unittest.TestCase):
+    def test_toma_los_cambios_de_db_config(self):
+        anteriores = list(database.lecturas.replicas)
+        try:
+            with mock.patch.dict(database.DB_CONFIG, {"database": "otra"}):
+                database.configurar_replicas("replica1:3307, mysql://u:c@replica2/bench")
+                uno, dos = (r.pool.config() for r in database.lecturas.replicas)
+            self.assertEqual((uno["host"], uno["port"], uno["database"]), ("replica1", 3307, "otra"))
+            self.assertEqual((dos["host"], dos["user"], dos["database"]), ("replica2", "u", "bench"))
+        finally:
+            database.lecturas.configurar(anteriores)
+
+
+if __name__ == "__main__":
+    unittest.main()
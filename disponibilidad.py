@@ -0,0 +1,173 @@
+"""
+Disponibilidad de instructores por turno con mapas de bits.
+
+Cada turno tiene un bit. Por instructor se guarda `ocupado` (los turnos en los que
+tiene clase) y `bloqueado` (esos mas los que se superponen con alguno, ver
+intervalos.py). Que un instructor este libre en un turno es mirar un bit, y los
+turnos libres de un instructor son los bits en cero de `bloqueado`.
+
+Los datos salen de `clase` y se cargan la primera vez que se usan. Al crear o mover
+una clase se reserva el lugar en memoria antes del commit (reservar), y despues se
+confirma o se cancela; asi dos inscripciones simultaneas no pueden tomar al mismo
+instructor en turnos que se pisan. Los cambios de instructores, turnos o borrados en
+cascada invalidan todo y se vuelve a cargar.
+Como los demas indices en memoria, supone un solo proceso.
+"""
+import threading
+from collections import Counter
+from intervalos import IndiceIntervalos, a_segundos
+
+
+def _hora(segundos):
+    return None if segundos is None else f"{segundos // 3600:02d}:{segundos % 3600 // 60:02d}:{segundos % 60:02d}"
+
+
+class _Estado:
+    def __init__(self, turnos, instructores, clases):
+        self.turnos = turnos                                        #id -> (inicio, fin) en segundos
+        self.bits = {id_turno: i for i, id_turno in enumerate(sorted(turnos))}
+        self.todos = (1 << len(self.bits)) - 1
+        self.instructores = instructores                            #ci -> (nombre, apellido)
+        completos = [(t, a, b) for t, (a, b) in turnos.items() if a is not None and b is not None]
+        indice = IndiceIntervalos(completos)
+        self.superpuestos = {}                                      #bit -> mascara de los que se pisan
+        for id_turno, bit in self.bits.items():
+            inicio, fin = turnos[id_turno]
+            mascara = 1 << bit
+            if inicio is not None and fin is not None:
+                for otro in indice.superpuestos(inicio, fin):
+                    mascara |= 1 << self.bits[otro]
+            self.superpuestos[bit] = mascara
+        self.clases = {ci: Counter() for ci in instructores}        #ci -> turno -> cantidad de clases
+        self.bloqueado = {ci: 0 for ci in instructores}
+        for ci, id_turno in clases:
+            self.sumar(ci, id_turno, 1)
+
+    def sumar(self, ci, id_turno, delta):
+        if ci not in self.clases or id_turno not in self.bits:
+            return
+        self.clases[ci][id_turno] += delta
+        if self.clases[ci][id_turno] <= 0:
+            del self.clases[ci][id_turno]
+        bloqueado = 0
+        for turno in self.clases[ci]:
+            bloqueado |= self.superpuestos[self.bits[turno]]
+        self.bloqueado[ci] = bloqueado
+
+    def libre(self, ci, id_turno):
+        return not (self.bloqueado.get(ci, 0) >> self.bits[id_turno]) & 1
+
+
+class Reserva:
+    """Cambios en memoria de una transaccion que todavia no hizo commit."""
+
+    def __init__(self, deltas):
+        self.deltas = deltas    #[(ci, id_turno, +1/-1)]
+
+
+class Disponibilidad:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._estado = None
+        self._generacion = 0            #cambia con cada reserva o invalidacion
+        self._pendientes = Counter()    #(ci, id_turno) -> delta de reservas sin confirmar
+
+    def invalidar(self):
+        with self._lock:
+            self._estado = None
+            self._generacion += 1
+
+    def _cargar(self, cursor):
+        with self._lock:
+            generacion = self._generacion
+        cursor.execute("SELECT id, hora_inicio, hora_fin FROM turnos")
+        turnos = {r[0]: (a_segundos(r[1]), a_segundos(r[2])) for r in cursor.fetchall()}
+        cursor.execute("SELECT ci, nombre, apellido FROM instructores")
+        instructores = {r[0]: (r[1], r[2]) for r in cursor.fetchall()}
+        cursor.execute("SELECT ci_instructor, id_turno FROM clase")
+        estado = _Estado(turnos, instructores, cursor.fetchall())
+        with self._lock:
+            #las reservas en curso no estan en la base todavia
+            for (ci, id_turno), delta in self._pendientes.items():
+                estado.sumar(ci, id_turno, delta)
+            #si algo cambio mientras se leia, se usa esta vez pero no se guarda
+            if generacion == self._generacion:
+                self._estado = estado
+        return estado
+
+    def cargar(self, cursor):
+        """Lee el estado si no esta cargado. Conviene hacerlo fuera de una transaccion que ya escribio."""
+        self._actual(cursor)
+
+    def _actual(self, cursor):
+        with self._lock:
+            estado = self._estado
+        return estado if estado is not None else self._cargar(cursor)
+
+    def instructores_libres(self, cursor, id_turno):
+        estado = self._actual(cursor)
+        with self._lock:
+            if id_turno not in estado.bits:
+                return None
+            return [{"ci": ci, "nombre": nombre, "apellido": apellido}
+                    for ci, (nombre, apellido) in sorted(estado.instructores.items())
+                    if estado.libre(ci, id_turno)]
+
+    def turnos_libres(self, cursor, ci):
+        estado = self._actual(cursor)
+        with self._lock:
+            if ci not in estado.instructores:
+                return None
+            libres = ~estado.bloqueado[ci] & estado.todos
+            return [{"id": id_turno, "hora_inicio": _hora(estado.turnos[id_turno][0]),
+                     "hora_fin": _hora(estado.turnos[id_turno][1])}
+                    for id_turno, bit in sorted(estado.bits.items()) if (libres >> bit) & 1]
+
+    def reservar(self, cursor, ci, id_turno, anterior=None):
+        """
+        Toma al instructor `ci` en `id_turno` si esta libre. `anterior` es el (ci, id_turno)
+        que deja la clase cuando se mueve. Devuelve la Reserva, o None si se superpone
+        con otra clase suya. Hay que llamar a confirmar() despues del commit o a cancelar().
+        Si el estado no esta cargado se lee con `cursor`: hay que reservar antes de escribir
+        en `clase`, si no la carga ve la fila sin confirmar como una clase mas.
+        """
+        estado = self._actual(cursor)
+        with self._lock:
+            deltas = [(*anterior, -1)] if anterior else []
+            for ci_delta, turno_delta, delta in deltas:
+                estado.sumar(ci_delta, turno_delta, delta)
+            #un turno o instructor que no esta cargado lo rechaza la base (clave foranea)
+            if ci in estado.instructores and id_turno in estado.bits and not estado.libre(ci, id_turno):
+                for ci_delta, turno_delta, delta in deltas:
+                    estado.sumar(ci_delta, turno_delta, -delta)
+                return None
+            estado.sumar(ci, id_turno, 1)
+            deltas.append((ci, id_turno, 1))
+            for ci_delta, turno_delta, delta in deltas:
+                self._pendientes[(ci_delta, turno_delta)] += delta
+            self._generacion += 1
+            return Reserva(deltas)
+
+    def confirmar(self, reserva):
+        """Despues del commit: la reserva ya esta en la base."""
+        self._soltar(reserva, revertir=False)
+
+    def cancelar(self, reserva):
+        """Si no se hizo commit: deshace la reserva en memoria."""
+        self._soltar(reserva, revertir=True)
+
+    def _soltar(self, reserva, revertir):
+        if reserva is None:
+            return
+        with self._lock:
+            for ci, id_turno, delta in reserva.deltas:
+                self._pendientes[(ci, id_turno)] -= delta
+                if not self._pendientes[(ci, id_turno)]:
+                    del self._pendientes[(ci, id_turno)]
+                if revertir and self._estado is not None:
+                    self._estado.sumar(ci, id_turno, -delta)
+            reserva.deltas = []
+            self._generacion += 1
+
+
+disponibilidad = Disponibilidad()
@@ -0,0 +1,154 @@
+"""
+Cambios de clases e inscripciones en tiempo real (Server-Sent Events).
+
+Los endpoints que cambian una clase o su lista de alumnos publican, despues del
+commit, un evento con lo que cambio. Cada cliente de /eventos/clases/ se suscribe con
+filtros (clase, instructor, turno) y recibe solo los eventos que le tocan, sin
+consultar la base: en vez de pedir /clases/ cada pocos segundos, se pide una vez y
+despues se aplican los cambios.
+
+Los ultimos HISTORIAL eventos quedan en memoria para retomar desde Last-Event-ID al
+reconectar. Si el id ya no esta (o es de antes de un reinicio), o si el cliente no
+lee y se le llena el buffer, se le manda un evento `reset`: tiene que volver a pedir
+/clases/ y seguir desde ahi.
+Como los demas indices en memoria, supone un solo proceso.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from serializacion import a_json
+
+HISTORIAL = 1000        #eventos que se guardan para retomar
+BUFFER_CLIENTE = 256    #eventos sin leer por cliente antes de mandarle un reset
+LATIDO = 15             #segundos entre comentarios para mantener viva la conexion
+REINTENTO_MS = 3000     #cuanto espera el navegador para reconectar
+
+
+class _Evento:
+    def __init__(self, numero, tipo, claves, trama):
+        self.numero = numero
+        self.tipo = tipo
+        self.claves = claves    #{"clase": {...}, "instructor": {...}, "turno": {...}} como texto
+        self.trama = trama      #bytes listos para mandar
+
+
+class Suscripcion:
+    def __init__(self, loop, filtros):
+        self.filtros = filtros  #{"clase": "12", ...}, solo los pedidos
+        self.cola = deque()
+        self.desbordada = False
+        self._loop = loop
+        self._aviso = asyncio.Event()
+
+    def acepta(self, evento):
+        return all(valor in evento.claves.get(clave, ()) for clave, valor in self.filtros.items())
+
+    def entregar(self, evento):
+        """Lo llaman los hilos que publican, con el lock del bus tomado."""
+        if len(self.cola) >= BUFFER_CLIENTE:
+            self.desbordada = True
+            self.cola.clear()
+        else:
+            self.cola.append(evento)
+        try:
+            self._loop.call_soon_threadsafe(self._aviso.set)
+        except RuntimeError:
+            pass    #el loop ya se cerro
+
+
+class BusEventos:
+    def __init__(self):
+        self._epoca = format(time.time_ns(), "x")
+        self._lock = threading.Lock()
+        self._numero = 0
+        self._historial = deque(maxlen=HISTORIAL)
+        self._suscripciones = set()
+        #estadisticas
+        self._publicados = 0
+        self._entregados = 0
+        self._resets = 0
+
+    def _id(self, numero):
+        return f"{self._epoca}-{numero}"
+
+    def publicar(self, tipo, datos, clases=(), instructores=(), turnos=()):
+        """Despues del commit: avisa a los suscriptores cuyos filtros coinciden."""
+        claves = {
+            "clase": {str(c) for c in clases},
+            "instructor": {str(i) for i in instructores},
+            "turno": {str(t) for t in turnos},
+        }
+        with self._lock:
+            self._numero += 1
+            trama = (f"id: {self._id(self._numero)}\nevent: {tipo}\ndata: ".encode()
+                     + a_json(datos) + b"\n\n")
+            evento = _Evento(self._numero, tipo, claves, trama)
+            self._historial.append(evento)
+            self._publicados += 1
+            for suscripcion in self._suscripciones:
+                if suscripcion.acepta(evento):
+                    suscripcion.entregar(evento)
+                    self._entregados += 1
+
+    def _reset(self, numero):
+        self._resets += 1
+        return f"id: {self._id(numero)}\nevent: reset\ndata: {{}}\n\n".encode()
+
+    async def suscribir(self, filtros, ultimo_id=None):
+        """
+        Stream SSE de un cliente. `ultimo_id` es el Last-Event-ID del navegador; los
+        eventos posteriores que sigan en el historial se mandan primero.
+        Se registra al empezar a iterar y se da de baja cuando el cliente se desconecta.
+        """
+        filtros = {clave: str(valor) for clave, valor in filtros.items() if valor is not None}
+        suscripcion = Suscripcion(asyncio.get_running_loop(), filtros)
+        inicio = [f"retry: {REINTENTO_MS}\n\n".encode()]
+        with self._lock:
+            if ultimo_id is not None:
+                epoca, _, numero = ultimo_id.rpartition("-")
+                desde = int(numero) if epoca == self._epoca and numero.isdigit() else None
+                primero = self._historial[0].numero if self._historial else self._numero + 1
+                if desde is None or desde > self._numero or desde + 1 < primero:
+                    inicio.append(self._reset(self._numero))
+                else:
+                    inicio += [e.trama for e in self._historial if e.numero > desde and suscripcion.acepta(e)]
+            self._suscripciones.add(suscripcion)
+        try:
+            for trama in inicio:
+                yield trama
+            while True:
+                try:
+                    await asyncio.wait_for(suscripcion._aviso.wait(), LATIDO)
+                except asyncio.TimeoutError:
+                    yield b": latido\n\n"
+                    continue
+                suscripcion._aviso.clear()
+                with self._lock:
+                    eventos = list(suscripcion.cola)
+                    suscripcion.cola.clear()
+                    reset = None
+                    if suscripcion.desbordada:
+                        #lo que quedo en la cola es posterior al reset: se manda despues
+                        suscripcion.desbordada = False
+                        reset = self._reset(eventos[0].numero - 1 if eventos else self._numero)
+                if reset:
+                    yield reset
+                for evento in eventos:
+                    yield evento.trama
+        finally:
+            with self._lock:
+                self._suscripciones.discard(suscripcion)
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "suscriptores": len(self._suscripciones),
+                "publicados": self._publicados,
+                "entregados": self._entregados,
+                "resets": self._resets,
+                "historial": len(self._historial),
+            }
+
+
+bus_eventos = BusEventos()
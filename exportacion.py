@@ -0,0 +1,161 @@
+"""
+Descargas completas en CSV o NDJSON, leidas con un cursor sin buffer.
+
+Cada descarga ocupa una conexion del pool de lecturas hasta que termina, y una descarga
+lenta puede durar minutos; por eso no se dejan correr mas de EXPORTACIONES_SIMULTANEAS a
+la vez (menos que POOL_TAMANO, asi siempre quedan conexiones para el resto de la API).
+`exportar` lanza ExportacionesOcupadas si no hay lugar.
+"""
+import csv
+import io
+import json
+import os
+import threading
+import zlib
+from mysql.connector import Error
+from database import get_connection_lectura
+
+TAMANO_LOTE = 1000      #filas que se leen y se envian por vez
+EXPORTACIONES_SIMULTANEAS = int(os.environ.get("EXPORTACIONES_SIMULTANEAS", 3))
+FORMATOS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def leer_en_lotes(query, parametros=()):
+    """
+    Lee el resultado con un cursor sin buffer (las filas quedan en el servidor)
+    y lo devuelve de a TAMANO_LOTE filas, asi la memoria no depende del tamaño de la tabla.
+    """
+    connection = get_connection_lectura()
+    cursor = connection.cursor(buffered=False)
+    try:
+        cursor.execute(query, parametros)
+        while True:
+            filas = cursor.fetchmany(TAMANO_LOTE)
+            if not filas:
+                break
+            yield filas
+    finally:
+        try:
+            cursor.close()
+        except Error:
+            #si el cliente corto la descarga quedan filas sin leer; el pool las descarta
+            pass
+        connection.close()
+
+
+def _a_texto(valor):
+    if valor is None:
+        return None
+    if isinstance(valor, (int, float, str, bool)):
+        return valor
+    #fechas, horas (timedelta) y decimales
+    return str(valor)
+
+
+def como_csv(columnas, lotes):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(columnas)
+    #la cabecera sale antes de ejecutar la consulta
+    yield buffer.getvalue().encode()
+    for filas in lotes:
+        buffer.seek(0)
+        buffer.truncate()
+        escritor.writerows(filas)
+        yield buffer.getvalue().encode()
+
+
+def como_ndjson(columnas, lotes):
+    #NDJSON no tiene cabecera: para que el cliente reciba algo antes de ejecutar la consulta
+    #(como con la del CSV) sale un espacio, que queda delante de la primera fila y JSON lo admite
+    yield b" "
+    for filas in lotes:
+        yield "".join(
+            json.dumps(dict(zip(columnas, map(_a_texto, fila))), ensure_ascii=False) + "\n"
+            for fila in filas
+        ).encode()
+
+
+def comprimir(bloques):
+    """Comprime en gzip a medida que se generan los bloques."""
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for bloque in bloques:
+        comprimido = compresor.compress(bloque)
+        if comprimido:
+            yield comprimido
+    yield compresor.flush()
+
+
+class ExportacionesOcupadas(Exception):
+    """Ya hay EXPORTACIONES_SIMULTANEAS descargas en curso."""
+
+
+_lugares = threading.BoundedSemaphore(EXPORTACIONES_SIMULTANEAS)
+_estadisticas_lock = threading.Lock()
+_activas = 0
+_rechazadas = 0
+
+
+def _ocupar():
+    global _activas, _rechazadas
+    libre = _lugares.acquire(blocking=False)
+    with _estadisticas_lock:
+        if libre:
+            _activas += 1
+        else:
+            _rechazadas += 1
+    return libre
+
+
+def _liberar():
+    global _activas
+    with _estadisticas_lock:
+        _activas -= 1
+    _lugares.release()
+
+
+class _Descarga:
+    """
+    Itera los bloques y devuelve el lugar al terminar, con error, o cuando se descarta sin
+    terminar (el cliente corto). No es un generador porque el finally de un generador que
+    nunca arranco no se ejecuta.
+    """
+
+    def __init__(self, bloques):
+        self._bloques = bloques
+        self._liberada = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._bloques)
+        except BaseException:
+            self._soltar()
+            raise
+
+    def _soltar(self):
+        if not self._liberada:
+            self._liberada = True
+            _liberar()
+
+    def __del__(self):
+        self._soltar()
+
+
+def exportar(columnas, query, formato, gzip=False):
+    """Iterador de bytes con el resultado de `query` en el formato pedido. Puede lanzar ExportacionesOcupadas."""
+    if not _ocupar():
+        raise ExportacionesOcupadas()
+    lotes = leer_en_lotes(query)
+    bloques = como_csv(columnas, lotes) if formato == "csv" else como_ndjson(columnas, lotes)
+    return _Descarga(comprimir(bloques) if gzip else bloques)
+
+
+def estadisticas():
+    with _estadisticas_lock:
+        return {"activas": _activas, "maximo": EXPORTACIONES_SIMULTANEAS, "rechazadas": _rechazadas}
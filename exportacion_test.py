@@ -0,0 +1,40 @@
+import json
+import unittest
+from datetime import date
+import exportacion
+
+
+class Lotes:
+    """Lotes de filas que recuerdan si ya se empezo a leer (si se ejecuto la consulta)."""
+
+    def __init__(self, lotes):
+        self.lotes = lotes
+        self.leidos = False
+
+    def __iter__(self):
+        self.leidos = True
+        return iter(self.lotes)
+
+
+class FormatosTest(unittest.TestCase):
+    def test_el_primer_bloque_sale_antes_de_la_consulta(self):
+        for como in (exportacion.como_csv, exportacion.como_ndjson):
+            lotes = Lotes([[("1", "Ana")]])
+            bloques = como(["ci", "nombre"], lotes)
+            self.assertTrue(next(bloques))
+            self.assertFalse(lotes.leidos, como.__name__)
+
+    def test_ndjson_linea_por_fila(self):
+        lotes = Lotes([[("1", "Ana", date(2000, 1, 2))], [("2", "Ñandú", None)]])
+        texto = b"".join(exportacion.como_ndjson(["ci", "nombre", "fecha"], lotes)).decode()
+        filas = [json.loads(linea) for linea in texto.splitlines()]
+        self.assertEqual(filas, [{"ci": "1", "nombre": "Ana", "fecha": "2000-01-02"},
+                                 {"ci": "2", "nombre": "Ñandú", "fecha": None}])
+
+    def test_csv(self):
+        texto = b"".join(exportacion.como_csv(["ci", "nombre"], Lotes([[("1", "Ana, María")]]))).decode()
+        self.assertEqual(texto.splitlines(), ["ci,nombre", '1,"Ana, María"'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,206 @@
+import csv
+import io
+import json
+import re
+from mysql.connector import Error
+from pydantic import ValidationError
+from database import ERRORES_REINTENTABLES, get_connection, marcadores
+from indice_alumnos import indice_alumnos
+from busqueda import indice_busqueda
+from schemas import Alumno
+
+TAMANO_BLOQUE = 1000    #filas que se validan, consultan e insertan juntas
+MAX_ERRORES = 1000      #errores detallados en la respuesta (el total se cuenta igual)
+SOBRANTES = "__sobrantes__"     #clave donde DictReader deja las columnas de mas
+#largo de las columnas VARCHAR de `alumnos`: lo que no entra se rechaza antes de ir a la base
+LARGOS = {"ci": 10, "nombre": 255, "apellido": 255, "telefono": 255, "correo": 255}
+INSERTAR_ALUMNO = """
+    INSERT INTO alumnos (ci, nombre, apellido, fecha_nacimiento, telefono, correo)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+
+#con surrogateescape cada byte que no es UTF-8 queda como un caracter entre U+DC80 y U+DCFF
+_BYTES_INVALIDOS = re.compile("[\udc80-\udcff]")
+
+
+def _utf8_invalido(datos):
+    return any(isinstance(v, str) and not v.isascii() and _BYTES_INVALIDOS.search(v)
+               for par in datos.items() for v in par)
+
+
+def leer_filas(archivo, formato):
+    """
+    Recorre el archivo sin cargarlo entero. Devuelve (numero de fila, datos, error).
+    En CSV la fila 1 es la cabecera. Una fila con texto que no es UTF-8 o con mas columnas
+    que la cabecera es un error de esa fila, no de toda la importacion.
+    """
+    texto = io.TextIOWrapper(archivo, encoding="utf-8-sig", errors="surrogateescape", newline="")
+    if formato == "csv":
+        for numero, fila in enumerate(csv.DictReader(texto, restkey=SOBRANTES), start=2):
+            if SOBRANTES in fila:
+                yield numero, {}, f"la fila tiene {len(fila[SOBRANTES])} columnas mas que la cabecera"
+            elif _utf8_invalido(fila):
+                yield numero, {}, "texto que no es UTF-8 valido"
+            else:
+                yield numero, fila, None
+        return
+    for numero, linea in enumerate(texto, start=1):
+        if not linea.strip():
+            continue
+        try:
+            datos = json.loads(linea)
+        except ValueError as e:
+            yield numero, {}, f"JSON invalido: {e}"
+            continue
+        if not isinstance(datos, dict):
+            yield numero, {}, "se esperaba un objeto JSON por linea"
+            continue
+        if _utf8_invalido(datos):
+            yield numero, {}, "texto que no es UTF-8 valido"
+            continue
+        yield numero, datos, None
+
+
+def _bloques(filas, tamano):
+    bloque = []
+    for fila in filas:
+        bloque.append(fila)
+        if len(bloque) == tamano:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+
+def _largos_excedidos(alumno):
+    return "; ".join(f"{campo}: mas de {largo} caracteres" for campo, largo in LARGOS.items()
+                     if len(getattr(alumno, campo)) > largo)
+
+
+def _valores(alumno):
+    return (alumno.ci, alumno.nombre, alumno.apellido, alumno.fecha_nacimiento, alumno.telefono, alumno.correo)
+
+
+def _insertar_de_a_una(cursor, nuevos, informe):
+    """
+    Despues de que fallo el INSERT del bloque: inserta fila por fila para que el error
+    quede en la fila que lo tiene. En MySQL una sentencia que falla se deshace sola y la
+    transaccion sigue. Devuelve las que se insertaron (falta el commit).
+    """
+    insertados = []
+    for i, (numero, alumno) in enumerate(nuevos):
+        try:
+            cursor.execute(INSERTAR_ALUMNO, _valores(alumno))
+        except Error as e:
+            if e.errno in ERRORES_REINTENTABLES:
+                #deadlock o espera de lock: se perdio toda la transaccion, no solo esta fila
+                raise
+            informe.error(numero, alumno.ci, f"Error al insertar: {e}")
+            continue
+        insertados.append((numero, alumno))
+    return insertados
+
+
+def _mensaje_validacion(error):
+    return "; ".join(f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in error.errors())
+
+
+class Informe:
+    def __init__(self, dry_run):
+        self.dry_run = dry_run
+        self.filas = 0
+        self.insertados = 0
+        self.errores = []
+        self.total_errores = 0
+
+    def error(self, numero, ci, mensaje):
+        self.total_errores += 1
+        if len(self.errores) < MAX_ERRORES:
+            self.errores.append({"fila": numero, "ci": ci, "error": mensaje})
+
+    def respuesta(self):
+        return {
+            "message": "Simulacion de importacion terminada" if self.dry_run else "Importacion terminada",
+            "dry_run": self.dry_run,
+            "filas": self.filas,
+            "insertados": self.insertados,
+            "con_error": self.total_errores,
+            "errores": self.errores,
+            "errores_truncados": self.total_errores > len(self.errores),
+        }
+
+
+def importar_alumnos(archivo, formato, dry_run=False):
+    """
+    Importa alumnos por bloques: valida contra schemas.Alumno y el largo de las columnas,
+    descarta CIs repetidas en el archivo o ya existentes (una consulta por bloque) e inserta
+    cada bloque con un INSERT de varias filas en su propia transaccion. Si aun asi el bloque
+    falla, se reintenta fila por fila y el error queda solo en las filas que lo tienen.
+    Con dry_run hace todas las validaciones pero no inserta nada.
+    """
+    informe = Informe(dry_run)
+    vistas = set()
+    connection = get_connection()
+    try:
+        with connection.cursor() as cursor:
+            for bloque in _bloques(leer_filas(archivo, formato), TAMANO_BLOQUE):
+                validos = []
+                for numero, datos, error in bloque:
+                    informe.filas += 1
+                    if error:
+                        informe.error(numero, None, error)
+                        continue
+                    try:
+                        alumno = Alumno(**datos)
+                    except ValidationError as e:
+                        informe.error(numero, datos.get("ci"), _mensaje_validacion(e))
+                        continue
+                    excedidos = _largos_excedidos(alumno)
+                    if excedidos:
+                        informe.error(numero, alumno.ci, excedidos)
+                        continue
+                    if alumno.ci in vistas:
+                        informe.error(numero, alumno.ci, "CI repetida en el archivo")
+                        continue
+                    vistas.add(alumno.ci)
+                    validos.append((numero, alumno))
+
+                if not validos:
+                    continue
+                cis = [a.ci for _, a in validos]
+                cursor.execute(f"SELECT ci FROM alumnos WHERE ci IN ({marcadores(cis)})", cis)
+                existentes = {r[0] for r in cursor.fetchall()}
+                nuevos = []
+                for numero, alumno in validos:
+                    if alumno.ci in existentes:
+                        informe.error(numero, alumno.ci, "Alumno con esta CI ya existe")
+                    else:
+                        nuevos.append((numero, alumno))
+
+                if not nuevos:
+                    continue
+                if dry_run:
+                    informe.insertados += len(nuevos)
+                    continue
+                try:
+                    try:
+                        cursor.executemany(INSERTAR_ALUMNO, [_valores(a) for _, a in nuevos])
+                    except Error as e:
+                        if e.errno in ERRORES_REINTENTABLES:
+                            raise
+                        #alguna fila que las validaciones no vieron (p. ej. una CI insertada recien por otro)
+                        connection.rollback()
+                        nuevos = _insertar_de_a_una(cursor, nuevos, informe)
+                    connection.commit()
+                    indice_alumnos.agregar(*(a.ci for _, a in nuevos))
+                    for _, a in nuevos:
+                        indice_busqueda.agregar("alumnos", ci=a.ci, nombre=a.nombre, apellido=a.apellido, correo=a.correo)
+                    informe.insertados += len(nuevos)
+                except Error as e:
+                    connection.rollback()
+                    for numero, alumno in nuevos:
+                        informe.error(numero, alumno.ci, f"Error al insertar el bloque: {e}")
+            return informe.respuesta()
+    finally:
+        connection.close()
@@ -0,0 +1,204 @@
+"""
+Indice en memoria de las CI de alumnos para /login/.
+
+Un filtro de Bloom con todas las CI descarta sin ir a la base las que seguro no
+existen, y un LRU guarda las CI ya confirmadas para no volver a consultarlas.
+Solo los "tal vez" del filtro que no estan en el LRU llegan a la base.
+create/delete/importar mantienen el indice al dia; el filtro no puede borrar, asi
+que se reconstruye cuando se acumulan bajas, cuando se llena o cuando vence el TTL.
+La reconstruccion corre en un hilo aparte con su propia conexion y cambia el filtro de
+una vez al terminar; mientras tanto los logins que no estan en el LRU se confirman en la
+base, sin esperar a la recarga.
+Como el cache de catalogos, supone un solo proceso: un alta hecha por otro proceso
+no se ve aca hasta la proxima reconstruccion.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from database import get_connection
+
+TASA_FALSOS_POSITIVOS = 0.01
+CAPACIDAD_MINIMA = 10000        #CIs que entran en el filtro antes de reconstruirlo
+LRU_MAX = 20000                 #CIs confirmadas que se recuerdan
+INDICE_TTL = 600                #segundos, por si hubo altas fuera de este proceso
+MAX_BAJAS = 0.1                 #fraccion de bajas que dispara una reconstruccion
+REINTENTO_RECONSTRUCCION = 10   #segundos de espera despues de una reconstruccion fallida
+log = logging.getLogger("indice_alumnos")
+
+
+class FiltroBloom:
+    """Filtro de Bloom con doble hashing sobre un blake2b de 128 bits."""
+
+    def __init__(self, capacidad, tasa=TASA_FALSOS_POSITIVOS):
+        self.capacidad = capacidad
+        self.bits = max(8, int(-capacidad * math.log(tasa) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacidad * math.log(2)))
+        self._arreglo = bytearray((self.bits + 7) // 8)
+
+    def _posiciones(self, valor):
+        digest = hashlib.blake2b(valor.encode(), digest_size=16).digest()
+        a = int.from_bytes(digest[:8], "little")
+        b = int.from_bytes(digest[8:], "little") | 1
+        return [(a + i * b) % self.bits for i in range(self.hashes)]
+
+    def agregar(self, valor):
+        for p in self._posiciones(valor):
+            self._arreglo[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, valor):
+        return all(self._arreglo[p >> 3] & (1 << (p & 7)) for p in self._posiciones(valor))
+
+
+class IndiceAlumnos:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._carga = threading.Lock()  #una sola reconstruccion a la vez
+        self._filtro = None
+        self._cargado = 0.0
+        self._cantidad = 0          #CIs agregadas al filtro
+        self._bajas = 0             #CIs borradas desde la ultima carga
+        self._bajas_totales = 0
+        self._pendientes = None     #altas que llegan mientras se lee la tabla
+        self._reconstruyendo = False
+        self._reintentar_desde = 0.0
+        self._confirmados = OrderedDict()
+        #estadisticas
+        self._consultas = 0
+        self._descartados = 0
+        self._aciertos_lru = 0
+        self._consultas_db = 0
+        self._falsos_positivos = 0
+        self._reconstrucciones = 0
+        self._reconstrucciones_fallidas = 0
+
+    def cargar(self, cursor):
+        with self._carga:
+            self._cargar(cursor)
+
+    def _cargar(self, cursor):
+        with self._lock:
+            self._pendientes = []
+        cursor.execute("SELECT ci FROM alumnos")
+        cis = [r[0] for r in cursor.fetchall()]
+        filtro = FiltroBloom(max(CAPACIDAD_MINIMA, 2 * len(cis)))
+        for ci in cis:
+            filtro.agregar(ci)
+        with self._lock:
+            for ci in self._pendientes:
+                filtro.agregar(ci)
+            self._filtro = filtro
+            self._cantidad = len(cis) + len(self._pendientes)
+            self._pendientes = None
+            self._bajas = 0
+            self._cargado = time.monotonic()
+            self._reconstrucciones += 1
+
+    def _vencido(self):
+        return (self._filtro is None
+                or time.monotonic() - self._cargado > INDICE_TTL
+                or self._cantidad > self._filtro.capacidad
+                or self._bajas > self._filtro.capacidad * MAX_BAJAS)
+
+    def buscar(self, ci):
+        """
+        True si la CI ya esta confirmada, False si seguro no existe, None si hay que consultar.
+        Con el filtro vencido solo responde el LRU (las bajas lo limpian) y pide la reconstruccion.
+        """
+        with self._lock:
+            self._consultas += 1
+            if ci in self._confirmados:
+                self._confirmados.move_to_end(ci)
+                self._aciertos_lru += 1
+                return True
+            vencido = self._vencido()
+            if not vencido and ci not in self._filtro:
+                self._descartados += 1
+                return False
+        if vencido:
+            self.reconstruir_en_segundo_plano()
+        return None
+
+    def reconstruir_en_segundo_plano(self):
+        """Arranca la reconstruccion en otro hilo, salvo que ya haya una o la ultima haya fallado hace poco."""
+        with self._lock:
+            if self._reconstruyendo or time.monotonic() < self._reintentar_desde:
+                return
+            self._reconstruyendo = True
+        threading.Thread(target=self._reconstruir, name="indice_alumnos", daemon=True).start()
+
+    def _reconstruir(self):
+        try:
+            connection = get_connection()
+            try:
+                with connection.cursor() as cursor:
+                    self.cargar(cursor)
+            finally:
+                connection.close()
+        except Exception:
+            log.exception("no se pudo reconstruir el indice de alumnos")
+            with self._lock:
+                self._reconstrucciones_fallidas += 1
+                self._reintentar_desde = time.monotonic() + REINTENTO_RECONSTRUCCION
+        finally:
+            with self._lock:
+                self._reconstruyendo = False
+
+    def confirmar(self, cursor, ci):
+        """Resuelve en la base lo que buscar() no pudo. Nunca espera a una reconstruccion."""
+        with self._lock:
+            bajas = self._bajas_totales
+        cursor.execute("SELECT ci FROM alumnos WHERE ci = %s", (ci,))
+        existe = cursor.fetchone() is not None
+        with self._lock:
+            self._consultas_db += 1
+            #si hubo una baja mientras se consultaba, puede ser esta CI: no se recuerda
+            if not existe:
+                self._falsos_positivos += 1
+            elif bajas == self._bajas_totales:
+                self._recordar(ci)
+        return existe
+
+    def _recordar(self, ci):
+        self._confirmados[ci] = True
+        self._confirmados.move_to_end(ci)
+        while len(self._confirmados) > LRU_MAX:
+            self._confirmados.popitem(last=False)
+
+    def agregar(self, *cis):
+        """Altas ya confirmadas (despues del commit)."""
+        with self._lock:
+            for ci in cis:
+                if self._filtro is not None:
+                    self._filtro.agregar(ci)
+                    self._cantidad += 1
+                if self._pendientes is not None:
+                    self._pendientes.append(ci)
+
+    def quitar(self, ci):
+        """Baja ya confirmada (despues del commit)."""
+        with self._lock:
+            self._confirmados.pop(ci, None)
+            self._bajas += 1
+            self._bajas_totales += 1
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "consultas": self._consultas,
+                "descartados_sin_db": self._descartados,
+                "aciertos_lru": self._aciertos_lru,
+                "consultas_db": self._consultas_db,
+                "falsos_positivos": self._falsos_positivos,
+                "db_evitada": round(1 - self._consultas_db / self._consultas, 4) if self._consultas else 0.0,
+                "cis_en_filtro": self._cantidad,
+                "lru_entradas": len(self._confirmados),
+                "reconstrucciones": self._reconstrucciones,
+                "reconstrucciones_fallidas": self._reconstrucciones_fallidas,
+                "reconstruyendo": int(self._reconstruyendo),
+            }
+
+
+indice_alumnos = IndiceAlumnos()
@@ -0,0 +1,108 @@
+import threading
+import unittest
+from unittest import mock
+import indice_alumnos
+from indice_alumnos import FiltroBloom, IndiceAlumnos
+
+
+class CursorFalso:
+    """Tabla alumnos en memoria; la lectura completa espera a `liberar` si se pide."""
+
+    def __init__(self, cis, liberar=None):
+        self.cis = cis
+        self.liberar = liberar
+        self._filas = []
+
+    def execute(self, query, parametros=None):
+        if parametros:
+            self._filas = [(parametros[0],)] if parametros[0] in self.cis else []
+        else:
+            if self.liberar is not None:
+                self.liberar.wait(5)
+            self._filas = [(ci,) for ci in self.cis]
+
+    def fetchall(self):
+        return self._filas
+
+    def fetchone(self):
+        return self._filas[0] if self._filas else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+class ConexionFalsa:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self):
+        return self._cursor
+
+    def close(self):
+        pass
+
+
+class FiltroBloomTest(unittest.TestCase):
+    def test_sin_falsos_negativos_y_tasa_acotada(self):
+        filtro = FiltroBloom(5000)
+        presentes = [f"{i:08d}" for i in range(5000)]
+        for ci in presentes:
+            filtro.agregar(ci)
+        self.assertTrue(all(ci in filtro for ci in presentes))
+        falsos = sum(f"x{i:07d}" in filtro for i in range(20000))
+        self.assertLess(falsos / 20000, 0.02)
+
+
+class IndiceAlumnosTest(unittest.TestCase):
+    def test_descarta_y_confirma(self):
+        indice = IndiceAlumnos()
+        cursor = CursorFalso({"1", "2"})
+        indice.cargar(cursor)
+        self.assertFalse(indice.buscar("9"))
+        self.assertIsNone(indice.buscar("1"))
+        self.assertTrue(indice.confirmar(cursor, "1"))
+        self.assertTrue(indice.buscar("1"))
+        indice.quitar("1")
+        self.assertIsNone(indice.buscar("1"))
+
+    def test_ttl_vencido_no_frena_el_login(self):
+        indice = IndiceAlumnos()
+        indice.cargar(CursorFalso({"1"}))
+        liberar = threading.Event()
+        #alta hecha por otro proceso: el filtro viejo no la tiene
+        fondo = CursorFalso({"1", "2"}, liberar=liberar)
+        vencido = indice_alumnos.time.monotonic() + indice_alumnos.INDICE_TTL + 1
+        with mock.patch.object(indice_alumnos, "get_connection", return_value=ConexionFalsa(fondo)), \
+                mock.patch.object(indice_alumnos.time, "monotonic", return_value=vencido):
+            #la reconstruccion queda trabada en la lectura, y el login igual responde desde la base
+            self.assertIsNone(indice.buscar("2"))
+            self.assertTrue(indice.confirmar(CursorFalso({"1", "2"}), "2"))
+            self.assertEqual(indice.estadisticas()["reconstruyendo"], 1)
+            liberar.set()
+            for hilo in threading.enumerate():
+                if hilo.name == "indice_alumnos":
+                    hilo.join(5)
+        self.assertEqual(indice.estadisticas()["reconstrucciones"], 2)
+        self.assertEqual(indice.estadisticas()["reconstruyendo"], 0)
+        self.assertTrue(indice.buscar("2"))     #quedo confirmada en el LRU
+        self.assertFalse(indice.buscar("3"))
+
+    def test_falla_de_la_reconstruccion(self):
+        indice = IndiceAlumnos()
+        with mock.patch.object(indice_alumnos, "get_connection", side_effect=RuntimeError("sin base")), \
+                self.assertLogs("indice_alumnos"):
+            self.assertIsNone(indice.buscar("1"))
+            for hilo in threading.enumerate():
+                if hilo.name == "indice_alumnos":
+                    hilo.join(5)
+        self.assertEqual(indice.estadisticas()["reconstrucciones_fallidas"], 1)
+        #no se reintenta enseguida
+        indice.reconstruir_en_segundo_plano()
+        self.assertEqual(indice.estadisticas()["reconstruyendo"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+"""
+Indice de intervalos sobre los horarios de los turnos.
+
+Dos turnos distintos pueden superponerse (09:00-11:00 y 10:00-12:00). El indice
+responde que turnos se superponen con uno dado en O(log n + k) y se reconstruye
+cuando cambian los turnos (ver indice_turnos.invalidar()).
+"""
+import threading
+from datetime import time, timedelta
+from database import marcadores
+
+
+def a_segundos(hora):
+    """Hora de un turno en segundos desde las 00:00 (TIME de MySQL, time, 'HH:MM[:SS]' o segundos)."""
+    if hora is None:
+        return None
+    if isinstance(hora, timedelta):
+        return int(hora.total_seconds())
+    if isinstance(hora, time):
+        return hora.hour * 3600 + hora.minute * 60 + hora.second
+    if isinstance(hora, str):
+        partes = [int(p) for p in hora.split(":")]
+        partes += [0] * (3 - len(partes))
+        return partes[0] * 3600 + partes[1] * 60 + partes[2]
+    return int(hora)
+
+
+class IndiceIntervalos:
+    """
+    Arbol de intervalos estatico: los intervalos ordenados por inicio forman un arbol
+    binario balanceado implicito (la raiz de cada rango es su elemento del medio) y cada
+    nodo guarda el mayor fin de su subarbol para podar la busqueda.
+    Los intervalos son semiabiertos [inicio, fin): uno que termina a las 11 no choca
+    con otro que empieza a las 11.
+    """
+
+    def __init__(self, intervalos):
+        intervalos = sorted(intervalos, key=lambda i: (i[1], i[2]))
+        self._ids = [i[0] for i in intervalos]
+        self._inicios = [i[1] for i in intervalos]
+        self._fines = [i[2] for i in intervalos]
+        self._fin_maximo = [0] * len(intervalos)
+        self._armar(0, len(intervalos))
+
+    def _armar(self, desde, hasta):
+        if desde >= hasta:
+            return -1
+        medio = (desde + hasta) // 2
+        maximo = self._fines[medio]
+        for hijo in (self._armar(desde, medio), self._armar(medio + 1, hasta)):
+            if hijo >= 0:
+                maximo = max(maximo, self._fin_maximo[hijo])
+        self._fin_maximo[medio] = maximo
+        return medio
+
+    def superpuestos(self, inicio, fin):
+        """Ids de los intervalos que se superponen con [inicio, fin)."""
+        encontrados = []
+        self._buscar(0, len(self._ids), inicio, fin, encontrados)
+        return encontrados
+
+    def _buscar(self, desde, hasta, inicio, fin, encontrados):
+        if desde >= hasta:
+            return
+        medio = (desde + hasta) // 2
+        #ningun intervalo del subarbol termina despues de `inicio`
+        if self._fin_maximo[medio] <= inicio:
+            return
+        self._buscar(desde, medio, inicio, fin, encontrados)
+        if self._inicios[medio] < fin:
+            if self._fines[medio] > inicio:
+                encontrados.append(self._ids[medio])
+            #a la derecha los inicios son mayores: solo hace falta seguir si este empezo antes de `fin`
+            self._buscar(medio + 1, hasta, inicio, fin, encontrados)
+
+
+class IndiceTurnos:
+    """
+    Indice de los turnos de la base, con los superpuestos de cada turno ya resueltos.
+    Cada consulta trabaja sobre una foto (horarios, indice): si otra peticion invalida
+    en el medio, la consulta termina con la foto que tenia y la proxima recarga.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._foto = None           #(id -> (inicio, fin) en segundos, IndiceIntervalos)
+        self._version = 0           #cambia con cada invalidar(): una carga vieja no se guarda
+        self._superpuestos = {}     #id -> frozenset de ids (incluye al propio turno)
+
+    def invalidar(self):
+        with self._lock:
+            self._foto = None
+            self._version += 1
+            self._superpuestos = {}
+
+    def _cargar(self, cursor, version):
+        cursor.execute("SELECT id, hora_inicio, hora_fin FROM turnos")
+        horarios = {r[0]: (a_segundos(r[1]), a_segundos(r[2])) for r in cursor.fetchall()}
+        completos = [(i, a, b) for i, (a, b) in horarios.items() if a is not None and b is not None]
+        foto = (horarios, IndiceIntervalos(completos))
+        with self._lock:
+            if self._version == version:
+                self._foto = foto
+        return foto
+
+    def superpuestos(self, cursor, id_turno):
+        """Turnos que se superponen con `id_turno`, incluido el mismo (solo el si no existe)."""
+        with self._lock:
+            resultado = self._superpuestos.get(id_turno)
+            foto, version = self._foto, self._version
+        if resultado is not None:
+            return resultado
+        if foto is None:
+            foto = self._cargar(cursor, version)
+
+        horarios, indice = foto
+        horario = horarios.get(id_turno)
+        if horario is None or None in horario:
+            #tambien se guarda que no existe: los turnos nuevos invalidan el indice
+            resultado = frozenset([id_turno])
+        else:
+            resultado = frozenset(indice.superpuestos(*horario)) | {id_turno}
+        with self._lock:
+            if self._version == version:
+                self._superpuestos[id_turno] = resultado
+        return resultado
+
+
+indice_turnos = IndiceTurnos()
+
+
+def alumnos_en_conflicto(cursor, alumnos, id_turno, excluir_clase=None):
+    """
+    CIs de `alumnos` que ya estan en alguna clase de un turno superpuesto con `id_turno`,
+    resuelto con una sola consulta para todo el grupo.
+    """
+    if not alumnos:
+        return set()
+    turnos = sorted(indice_turnos.superpuestos(cursor, id_turno))
+    query = f"""
+        SELECT DISTINCT ac.ci_alumno FROM alumno_clase ac
+        JOIN clase c ON ac.id_clase = c.id
+        WHERE c.id_turno IN ({marcadores(turnos)}) AND ac.ci_alumno IN ({marcadores(alumnos)})
+    """
+    parametros = [*turnos, *alumnos]
+    if excluir_clase is not None:
+        query += " AND ac.id_clase <> %s"
+        parametros.append(excluir_clase)
+    cursor.execute(query, parametros)
+    return {r[0] for r in cursor.fetchall()}
@@ -0,0 +1,81 @@
+import random
+import unittest
+from intervalos import IndiceIntervalos, IndiceTurnos, a_segundos
+
+
+def superpuestos_a_mano(intervalos, inicio, fin):
+    return sorted(i for i, a, b in intervalos if a < fin and b > inicio)
+
+
+class CursorFalso:
+    """Devuelve siempre `filas` y cuenta las consultas; `al_leer` corre despues de cada SELECT."""
+
+    def __init__(self, filas, al_leer=None):
+        self.filas = filas
+        self.al_leer = al_leer
+        self.consultas = 0
+
+    def execute(self, query, parametros=None):
+        self.consultas += 1
+
+    def fetchall(self):
+        if self.al_leer is not None:
+            self.al_leer()
+        return self.filas
+
+
+class IndiceIntervalosTest(unittest.TestCase):
+    def test_contra_recorrido_completo(self):
+        rnd = random.Random(11)
+        for _ in range(300):
+            intervalos = []
+            for i in range(rnd.randint(0, 40)):
+                inicio = rnd.randint(0, 100)
+                intervalos.append((i, inicio, inicio + rnd.randint(1, 30)))
+            indice = IndiceIntervalos(intervalos)
+            for _ in range(20):
+                inicio = rnd.randint(-5, 130)
+                fin = inicio + rnd.randint(1, 40)
+                self.assertEqual(sorted(indice.superpuestos(inicio, fin)),
+                                 superpuestos_a_mano(intervalos, inicio, fin))
+
+    def test_semiabiertos(self):
+        indice = IndiceIntervalos([(1, 9, 11), (2, 11, 13)])
+        self.assertEqual(indice.superpuestos(11, 12), [2])
+        self.assertEqual(indice.superpuestos(7, 9), [])
+
+    def test_a_segundos(self):
+        self.assertEqual(a_segundos("09:30"), 9 * 3600 + 30 * 60)
+        self.assertEqual(a_segundos(None), None)
+
+
+class IndiceTurnosTest(unittest.TestCase):
+    FILAS = [(1, "09:00", "11:00"), (2, "10:00", "12:00"), (3, "11:00", "13:00")]
+
+    def test_superpuestos(self):
+        indice = IndiceTurnos()
+        cursor = CursorFalso(self.FILAS)
+        self.assertEqual(indice.superpuestos(cursor, 2), {1, 2, 3})
+        self.assertEqual(indice.superpuestos(cursor, 1), {1, 2})
+        self.assertEqual(cursor.consultas, 1)
+
+    def test_turno_inexistente_no_recarga(self):
+        indice = IndiceTurnos()
+        cursor = CursorFalso(self.FILAS)
+        for _ in range(3):
+            self.assertEqual(indice.superpuestos(cursor, 99), {99})
+        self.assertEqual(cursor.consultas, 1)
+
+    def test_invalidar_durante_la_carga(self):
+        indice = IndiceTurnos()
+        cursor = CursorFalso(self.FILAS, al_leer=indice.invalidar)
+        #la consulta en curso termina con lo que leyo...
+        self.assertEqual(indice.superpuestos(cursor, 3), {2, 3})
+        #...pero no queda guardado: la siguiente vuelve a leer
+        cursor.al_leer = None
+        indice.superpuestos(cursor, 3)
+        self.assertEqual(cursor.consultas, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
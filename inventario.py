@@ -0,0 +1,191 @@
+"""
+Stock de equipamiento y unidades alquiladas por turno.
+
+equipamiento.stock es la cantidad de unidades que se pueden alquilar en cada turno
+(NULL = sin limite). reservas_equipamiento lleva, por equipamiento y turno, cuantas
+estan alquiladas, y se mantiene con el mismo esquema que resumenes.py: `ajustar`
+resta (signo -1) o suma (signo +1) lo alquilado por las inscripciones afectadas
+dentro de la transaccion que las modifica. resumenes.ajustar_inscripciones ya lo
+llama; solo hace falta llamarlo aparte cuando una clase cambia de turno.
+
+Al sumar se controla el stock sobre el contador ya actualizado. El UPSERT bloquea la
+fila del contador hasta el commit, asi dos inscripciones simultaneas del mismo
+equipamiento y turno se ordenan y la segunda ve lo que sumo la primera: no se puede
+alquilar de mas. Si no alcanza se lanza SinStock y el llamador deshace la transaccion.
+La disponibilidad de un turno sale de los contadores, sin recorrer alumno_clase.
+
+Las tablas las crea la migracion 4.
+
+Uso: python inventario.py verificar | reconstruir
+"""
+import sys
+from database import get_connection
+
+
+class SinStock(Exception):
+    def __init__(self, faltantes):
+        self.faltantes = faltantes  #[{"id_equipamiento", "id_turno", "stock", "reservados"}]
+        super().__init__("no hay stock suficiente de equipamiento")
+
+
+def ajustar(cursor, condicion, parametros, signo):
+    """
+    Suma (o resta) a reservas_equipamiento el equipamiento alquilado por las inscripciones
+    que cumplen `condicion` (alias ac y c). Con signo +1 lanza SinStock si algun contador
+    queda por encima del stock.
+    """
+    if signo not in (1, -1):
+        raise ValueError("signo debe ser 1 o -1")
+    cursor.execute(f"""
+        SELECT ac.id_equipamiento, c.id_turno, COUNT(*)
+        FROM alumno_clase ac
+        JOIN clase c ON ac.id_clase = c.id
+        WHERE ({condicion}) AND ac.id_equipamiento IS NOT NULL
+        GROUP BY ac.id_equipamiento, c.id_turno
+        ORDER BY ac.id_equipamiento, c.id_turno
+    """, parametros)
+    alquilados = cursor.fetchall()
+    if not alquilados:
+        return
+    #siempre en el mismo orden, para no cruzar bloqueos con otra transaccion
+    cursor.executemany("""
+        INSERT INTO reservas_equipamiento (id_equipamiento, id_turno, reservados)
+        VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE reservados = reservados + VALUES(reservados)
+    """, [(id_equipamiento, id_turno, signo * n) for id_equipamiento, id_turno, n in alquilados])
+    if signo < 0:
+        return
+
+    #lectura con bloqueo: el stock vigente, y nadie lo baja hasta el commit
+    claves = [v for id_equipamiento, id_turno, _ in alquilados for v in (id_equipamiento, id_turno)]
+    cursor.execute(f"""
+        SELECT re.id_equipamiento, re.id_turno, e.stock, re.reservados
+        FROM reservas_equipamiento re
+        JOIN equipamiento e ON re.id_equipamiento = e.id
+        WHERE (re.id_equipamiento, re.id_turno) IN ({', '.join(['(%s, %s)'] * len(alquilados))})
+        LOCK IN SHARE MODE
+    """, claves)
+    faltantes = [
+        {"id_equipamiento": id_equipamiento, "id_turno": id_turno, "stock": stock, "reservados": reservados}
+        for id_equipamiento, id_turno, stock, reservados in cursor.fetchall()
+        if stock is not None and reservados > stock
+    ]
+    if faltantes:
+        raise SinStock(faltantes)
+
+
+def disponibles(cursor, id_turno, id_actividad=None):
+    """Unidades libres de cada equipamiento en `id_turno` (libres None = sin limite); None si el turno no existe."""
+    cursor.execute("SELECT id FROM turnos WHERE id = %s", (id_turno,))
+    if cursor.fetchone() is None:
+        return None
+    condicion, parametros = "", [id_turno]
+    if id_actividad is not None:
+        condicion = "WHERE e.id_actividad = %s"
+        parametros.append(id_actividad)
+    cursor.execute(f"""
+        SELECT e.id, e.id_actividad, e.descripcion, e.stock, COALESCE(re.reservados, 0)
+        FROM equipamiento e
+        LEFT JOIN reservas_equipamiento re ON re.id_equipamiento = e.id AND re.id_turno = %s
+        {condicion}
+        ORDER BY e.id
+    """, parametros)
+    return [
+        {"id": id_equipamiento, "id_actividad": actividad, "descripcion": descripcion, "stock": stock,
+         "reservados": reservados, "libres": None if stock is None else max(stock - reservados, 0)}
+        for id_equipamiento, actividad, descripcion, stock, reservados in cursor.fetchall()
+    ]
+
+
+def cambiar_stock(cursor, id_equipamiento, stock):
+    """
+    Fija el stock (None = sin limite). Devuelve los turnos que ya tienen alquiladas mas
+    unidades que el stock nuevo; si hay alguno no cambia nada.
+    """
+    cursor.execute("SELECT id FROM equipamiento WHERE id = %s FOR UPDATE", (id_equipamiento,))
+    if cursor.fetchone() is None:
+        return None
+    if stock is not None:
+        cursor.execute("""
+            SELECT id_turno, reservados FROM reservas_equipamiento
+            WHERE id_equipamiento = %s AND reservados > %s
+            FOR UPDATE
+        """, (id_equipamiento, stock))
+        excedidos = [{"id_turno": t, "reservados": r} for t, r in cursor.fetchall()]
+        if excedidos:
+            return excedidos
+    cursor.execute("UPDATE equipamiento SET stock = %s WHERE id = %s", (stock, id_equipamiento))
+    return []
+
+
+######################################################################
+#reconstruccion y verificacion
+######################################################################
+
+def _calcular(cursor):
+    cursor.execute("""
+        SELECT ac.id_equipamiento, c.id_turno, COUNT(*)
+        FROM alumno_clase ac
+        JOIN clase c ON ac.id_clase = c.id
+        WHERE ac.id_equipamiento IS NOT NULL
+        GROUP BY ac.id_equipamiento, c.id_turno
+    """)
+    return {(r[0], r[1]): r[2] for r in cursor.fetchall()}
+
+
+def verificar(cursor):
+    """Contadores que no coinciden con alumno_clase, y turnos con mas alquilado que stock."""
+    esperado = _calcular(cursor)
+    cursor.execute("SELECT id_equipamiento, id_turno, reservados FROM reservas_equipamiento WHERE reservados <> 0")
+    actual = {(r[0], r[1]): r[2] for r in cursor.fetchall()}
+    diferencias = [
+        {"clave": clave, "esperado": esperado.get(clave, 0), "actual": actual.get(clave, 0)}
+        for clave in sorted(set(esperado) | set(actual))
+        if esperado.get(clave, 0) != actual.get(clave, 0)
+    ]
+    cursor.execute("SELECT id, stock FROM equipamiento WHERE stock IS NOT NULL")
+    stock = dict(cursor.fetchall())
+    diferencias += [
+        {"clave": clave, "esperado": f"<= {stock[clave[0]]}", "actual": n}
+        for clave, n in sorted(esperado.items())
+        if clave[0] in stock and n > stock[clave[0]]
+    ]
+    return diferencias
+
+
+def reconstruir(cursor):
+    """Recalcula los contadores desde cero (no hace commit). No toca el stock."""
+    alquilados = _calcular(cursor)
+    cursor.execute("DELETE FROM reservas_equipamiento")
+    if alquilados:
+        cursor.executemany(
+            "INSERT INTO reservas_equipamiento (id_equipamiento, id_turno, reservados) VALUES (%s, %s, %s)",
+            [(*clave, n) for clave, n in alquilados.items()],
+        )
+
+
+def main(argumentos):
+    if len(argumentos) != 1 or argumentos[0] not in ("verificar", "reconstruir"):
+        print(__doc__.strip().splitlines()[-1])
+        return 2
+
+    connection = get_connection()
+    try:
+        with connection.cursor() as cursor:
+            diferencias = verificar(cursor)
+            for d in diferencias:
+                print(f"equipamiento, turno {d['clave']}: esperado {d['esperado']}, actual {d['actual']}")
+            print(f"{len(diferencias)} diferencias encontradas")
+
+            if argumentos[0] == "reconstruir":
+                reconstruir(cursor)
+                connection.commit()
+                print("contadores de equipamiento reconstruidos")
+                return 0
+            return 1 if diferencias else 0
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,82 @@
+import unittest
+import inventario
+from inventario import SinStock
+
+
+class CursorInventario:
+    """
+    Lo que ajustar necesita de MySQL: el alquiler de las inscripciones afectadas (`alquilados`),
+    el UPSERT de reservas_equipamiento y la lectura del stock con los contadores ya sumados.
+    """
+
+    def __init__(self, stock, reservas=None):
+        self.stock = stock                  #id_equipamiento -> stock (None = sin limite)
+        self.reservas = dict(reservas or {})  #(id_equipamiento, id_turno) -> reservados
+        self.alquilados = []
+        self._filas = []
+
+    def execute(self, query, parametros=None):
+        if "FROM alumno_clase" in query:
+            self._filas = self.alquilados
+        elif "FROM reservas_equipamiento re" in query:
+            claves = list(zip(parametros[::2], parametros[1::2]))
+            self._filas = [(e, t, self.stock[e], self.reservas[(e, t)]) for e, t in claves]
+        else:
+            raise AssertionError(f"consulta inesperada: {query}")
+
+    def executemany(self, query, filas):
+        for id_equipamiento, id_turno, n in filas:
+            self.reservas[(id_equipamiento, id_turno)] = self.reservas.get((id_equipamiento, id_turno), 0) + n
+
+    def fetchall(self):
+        return self._filas
+
+
+def inscribir(cursor, alquilados):
+    """Una inscripcion en su transaccion: si no hay stock se deshace (como hace main.py)."""
+    antes = dict(cursor.reservas)
+    cursor.alquilados = alquilados
+    try:
+        inventario.ajustar(cursor, "ac.id_clase = %s", (1,), 1)
+        return True
+    except SinStock:
+        cursor.reservas = antes
+        return False
+
+
+class AjustarTest(unittest.TestCase):
+    def test_nunca_alquila_de_mas(self):
+        cursor = CursorInventario({7: 3, 8: None})
+        aceptadas = [inscribir(cursor, [(7, 1, 1)]) for _ in range(10)]
+        self.assertEqual(aceptadas.count(True), 3)
+        self.assertEqual(cursor.reservas[(7, 1)], 3)
+        #otro turno tiene su propio stock, y sin limite se acepta siempre
+        self.assertTrue(inscribir(cursor, [(7, 2, 3)]))
+        self.assertTrue(all(inscribir(cursor, [(8, 1, 5)]) for _ in range(10)))
+
+    def test_sin_stock_informa_lo_que_falta(self):
+        cursor = CursorInventario({7: 2, 9: 5}, {(7, 1): 1})
+        cursor.alquilados = [(7, 1, 2), (9, 1, 1)]
+        with self.assertRaises(SinStock) as contexto:
+            inventario.ajustar(cursor, "ac.id_clase = %s", (1,), 1)
+        self.assertEqual(contexto.exception.faltantes,
+                         [{"id_equipamiento": 7, "id_turno": 1, "stock": 2, "reservados": 3}])
+
+    def test_restar_libera_sin_controlar(self):
+        cursor = CursorInventario({7: 1}, {(7, 1): 1})
+        cursor.alquilados = [(7, 1, 1)]
+        inventario.ajustar(cursor, "ac.ci_alumno = %s", ("1",), -1)
+        self.assertEqual(cursor.reservas[(7, 1)], 0)
+        self.assertTrue(inscribir(cursor, [(7, 1, 1)]))
+        self.assertFalse(inscribir(cursor, [(7, 1, 1)]))
+
+    def test_sin_equipamiento_no_toca_nada(self):
+        cursor = CursorInventario({})
+        inventario.ajustar(cursor, "ac.id_clase = %s", (1,), 1)
+        self.assertEqual(cursor.reservas, {})
+        with self.assertRaises(ValueError):
+            inventario.ajustar(cursor, "ac.id_clase = %s", (1,), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
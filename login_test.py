@@ -0,0 +1,55 @@
+import unittest
+from unittest import mock
+from fastapi.testclient import TestClient
+import main
+from indice_alumnos import IndiceAlumnos
+
+
+class CursorFalso:
+    def __init__(self, cis):
+        self.cis = cis
+        self._fila = None
+
+    def execute(self, query, parametros=None):
+        self._fila = (parametros[0],) if parametros and parametros[0] in self.cis else None
+
+    def fetchone(self):
+        return self._fila
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+class ConexionFalsa:
+    def __init__(self, cis):
+        self.cis = cis
+
+    def cursor(self):
+        return CursorFalso(self.cis)
+
+    def close(self):
+        pass
+
+
+class LoginTest(unittest.TestCase):
+    def test_no_usa_el_pool_general(self):
+        indice = IndiceAlumnos()
+        indice.reconstruir_en_segundo_plano = lambda: None
+        #el pool general agotado (reportes o exportaciones largas) no afecta al login
+        with mock.patch.object(main, "indice_alumnos", indice), \
+                mock.patch.object(main, "_cargar_indices", lambda: None), \
+                mock.patch.object(main, "get_connection", side_effect=AssertionError("pool general")), \
+                mock.patch.object(main, "get_connection_login", return_value=ConexionFalsa({"1"})), \
+                TestClient(main.app) as cliente:
+            self.assertEqual(cliente.post("/login/", json={"ci": "1"}).status_code, 200)
+            self.assertEqual(cliente.post("/login/", json={"ci": "2"}).status_code, 404)
+            self.assertEqual(main.limitador_login.total_tokens, main.POOL_LOGIN_TAMANO)
+            hilos = cliente.portal.call(lambda: main.to_thread.current_default_thread_limiter().total_tokens)
+            self.assertGreater(hilos, main.pool.tamano)
+
+
+if __name__ == "__main__":
+    unittest.main()
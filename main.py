@@ -1,17 +1,76 @@
-from fastapi import FastAPI, HTTPException, Depends
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Depends, File, Query, Request, UploadFile
+from anyio import CapacityLimiter, to_thread
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 import pymysql
-from typing import List
+import os
+import time
+import gzip
+from typing import List, Optional
 import datetime
 from pydantic import BaseModel
-from database import get_connection
-from schemas import Clase, Alumno, Login, AlumnoClase, EquipamientoCreate, InstructorCreate
-from datetime import datetime
+from database import (get_connection, get_connection_lectura, get_connection_login, estadisticas_pool,
+                      estadisticas_replicas, fijar_primario, soltar_primario, contar_escrituras, soltar_escrituras,
+                      marcadores, pool, pool_login, lecturas, reintentar_transaccion, LECTURA_FIJAR_PRIMARIO,
+                      configurar_replicas, POOL_LOGIN_TAMANO, Error, ERROR_CLAVE_DUPLICADA)
+from cache import cache_catalogo
+from serializacion import RespuestaJSON, a_json, filas_a_json, mapeador
+from versiones import versiones
+from indice_alumnos import indice_alumnos
+from disponibilidad import disponibilidad
+from eventos import bus_eventos
+from busqueda import LIMITE_RESULTADOS, buscar_en_base, indice_busqueda
+import analitica
+import asignacion
+import exportacion
+import importacion
+import inventario
+import resumenes
+import metricas
+import intervalos
+from paginacion import LIMITE_POR_DEFECTO, acotar_limite, armar_pagina, decodificar_cursor, escapar_like
+from schemas import Clase, Alumno, Login, AlumnoClase, EquipamientoCreate, EquipamientoStock, InstructorCreate, PedidoAsignacion
+from datetime import date, datetime
 
 
 now = datetime.now()
 
-app = FastAPI()
+HILOS_POR_CONEXION = 4
+limitador_login = None  #hilos propios de /login/, se crea en lifespan (necesita el event loop)
+
+@asynccontextmanager
+async def lifespan(app):
+    # Los endpoints que usan la base son `def` y FastAPI los corre en su pool de hilos,
+    # asi una consulta lenta no frena el event loop. Hay mas hilos que conexiones: muchos
+    # handlers responden desde los caches sin pedir conexion, y los que la piden esperan en
+    # el pool (con POOL_TIMEOUT) y no en la cola de hilos.
+    # /login/ no usa estos hilos ni este pool: tiene los suyos (ver login).
+    global limitador_login
+    configurar_replicas(os.environ.get("DB_REPLICAS", ""))
+    to_thread.current_default_thread_limiter().total_tokens = HILOS_POR_CONEXION * pool.tamano
+    limitador_login = CapacityLimiter(POOL_LOGIN_TAMANO)
+    await to_thread.run_sync(_cargar_indices)
+    yield
+    pool.cerrar_todas()
+    pool_login.cerrar_todas()
+    lecturas.cerrar_todas()
+
+def _cargar_indices():
+    # si la base no responde al arrancar, los indices se cargan en el primer login o busqueda
+    try:
+        connection = get_connection()
+    except Exception:
+        return
+    try:
+        with connection.cursor() as cursor:
+            indice_alumnos.cargar(cursor)
+            indice_busqueda.cargar(cursor)
+            disponibilidad.cargar(cursor)
+    finally:
+        connection.close()
+
+app = FastAPI(lifespan=lifespan)
 
 def get_db():
     db = SessionLocal()
@@ -26,8 +85,112 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  
     allow_headers=["*"], 
+    expose_headers=["ETag"],
 )
 
+@app.middleware("http")
+async def medir_peticion(request: Request, call_next):
+    """
+    Registra por peticion el tiempo total, la cantidad de consultas, el tiempo en la base
+    y las filas leidas (ver metricas.py).
+    """
+    registro, token = metricas.iniciar_peticion(request.url.path)
+    inicio = time.perf_counter()
+    estado = 500
+    try:
+        respuesta = await call_next(request)
+        estado = respuesta.status_code
+        return respuesta
+    finally:
+        # la plantilla de la ruta (/clases/{id_clase}/) y no la url, para no multiplicar series
+        registro.ruta = getattr(request.scope.get("route"), "path", "desconocida")
+        metricas.terminar_peticion(token, registro, request.method, registro.ruta, estado,
+                                   time.perf_counter() - inicio)
+
+COOKIE_PRIMARIO = "leer_primario"
+
+@app.middleware("http")
+async def fijar_lecturas(request: Request, call_next):
+    """
+    Leer lo propio: si la peticion hizo commit de algo el cliente recibe una cookie que por
+    LECTURA_FIJAR_PRIMARIO segundos manda sus lecturas al primario y no a una replica atrasada.
+    Un POST que no escribe (login, asignaciones con dry_run) no la recibe.
+    """
+    try:
+        fijado = float(request.cookies.get(COOKIE_PRIMARIO, 0)) > time.time()
+    except ValueError:
+        fijado = False
+    token = fijar_primario(fijado)
+    escrituras, token_escrituras = contar_escrituras()
+    try:
+        respuesta = await call_next(request)
+    finally:
+        soltar_escrituras(token_escrituras)
+        soltar_primario(token)
+    if escrituras.confirmadas:
+        respuesta.set_cookie(COOKIE_PRIMARIO, str(time.time() + LECTURA_FIJAR_PRIMARIO),
+                             max_age=LECTURA_FIJAR_PRIMARIO, httponly=True, samesite="lax")
+    return respuesta
+
+metricas.registrar_colector("db_pool", estadisticas_pool)
+metricas.registrar_colector("db_replicas", estadisticas_replicas)
+metricas.registrar_colector("cache_catalogo", cache_catalogo.estadisticas)
+metricas.registrar_colector("etag", versiones.estadisticas)
+metricas.registrar_colector("login", indice_alumnos.estadisticas)
+metricas.registrar_colector("eventos", bus_eventos.estadisticas)
+metricas.registrar_colector("busqueda", indice_busqueda.estadisticas)
+metricas.registrar_colector("exportaciones", exportacion.estadisticas)
+
+
+def tablas_modificadas(*tablas):
+    """
+    Despues del commit de una escritura: invalida el cache de catalogos y cambia la
+    version (y con ella el ETag) de los listados que dependen de `tablas`.
+    """
+    lecturas.escritura()
+    versiones.incrementar(*tablas)
+    cache_catalogo.invalidar(*tablas)
+
+
+def clases_afectadas(cursor, condicion, parametros):
+    """(id, instructor, turno) de las clases que se van a borrar en cascada, para avisarlo."""
+    cursor.execute(f"SELECT id, ci_instructor, id_turno FROM clase WHERE {condicion}", parametros)
+    return cursor.fetchall()
+
+
+def publicar_clases_eliminadas(clases):
+    if clases:
+        bus_eventos.publicar(
+            "clases_eliminadas", {"clases": [c[0] for c in clases]},
+            clases=[c[0] for c in clases], instructores={c[1] for c in clases}, turnos={c[2] for c in clases},
+        )
+
+
+def respuesta_condicional(request, etag, generar, cabeceras=None):
+    """
+    304 sin consultar la base si el cliente ya tiene `etag`; si no, el JSON de `generar()`.
+    no-cache obliga al navegador a revalidar siempre, pero le deja reusar lo que tiene.
+    """
+    cabeceras = {"ETag": etag, "Cache-Control": "private, no-cache", **(cabeceras or {})}
+    if versiones.coincide(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=cabeceras)
+    return RespuestaJSON(generar(), headers=cabeceras)
+
+
+def leer_compartido(leer):
+    """
+    Cargador para cache_catalogo: abre una conexion de lectura y corre `leer(cursor)`.
+    Los catalogos se leen con compartida=True porque quedan guardados para todos.
+    """
+    def cargar():
+        connection = get_connection_lectura(compartida=True)
+        try:
+            with connection.cursor() as cursor:
+                return leer(cursor)
+        finally:
+            connection.close()
+    return cargar
+
 ######################################################################
 #                         Login-Register                             #
 ######################################################################
@@ -37,36 +200,65 @@ async def root():
     return {"message": "Bienvenido a la API de la Escuela de Deportes de Nieve"}
 
 
-@app.post("/login/")
-async def login(request : dict):
-    print("hola")
-    ci = request.ci
-    connection = get_connection()
+@app.get("/pool/")
+async def estado_pool():
+    """
+    Estadisticas del pool de conexiones (en uso, libres, tiempos de espera).
+    """
+    return estadisticas_pool()
+
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Metricas en formato Prometheus.
+    """
+    return PlainTextResponse(metricas.exponer(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/cache/")
+async def estado_cache():
+    """
+    Estadisticas del cache de catalogos (aciertos, fallos, invalidaciones).
+    """
+    return cache_catalogo.estadisticas()
+
+
+def _confirmar_login(ci):
+    connection = get_connection_login()
     try:
         with connection.cursor() as cursor:
-            cursor.execute("SELECT ci FROM alumnos WHERE ci = %s", (ci,))
-            result = cursor.fetchone()
-            if not result:
-                raise HTTPException(status_code=404, detail="Usuario no encontrado")
-            
-            return {"message": "Inicio de sesión exitoso"}
+            return indice_alumnos.confirmar(cursor, ci)
     finally:
         connection.close()
 
+@app.post("/login/")
+async def login(datos: Login):
+    """
+    Las CI que el indice en memoria descarta o ya confirmo no consultan la base
+    (ver indice_alumnos.py); eso se resuelve en el event loop, sin hilos. Las demas se
+    confirman en hilos y conexiones reservados para el login, asi un reporte o una
+    exportacion que ocupen el pool no lo hacen esperar.
+    """
+    existe = indice_alumnos.buscar(datos.ci)
+    if existe is None:
+        existe = await to_thread.run_sync(_confirmar_login, datos.ci, limiter=limitador_login)
+    if not existe:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    return {"message": "Inicio de sesión exitoso"}
+
         
+def _leer_instructores(cursor):
+    cursor.execute("SELECT ci, nombre FROM instructores")
+    return a_json(cursor.fetchall())
+
 @app.get("/instructores/")
-async def get_instructores():
-    connection = get_connection()
-    try:
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT ci, nombre FROM instructores")
-            instructores = cursor.fetchall()
-            return instructores
-    finally:
-        connection.close()
+def get_instructores(request: Request):
+    etag = versiones.etag(("instructores",))
+    return respuesta_condicional(request, etag, lambda: cache_catalogo.obtener("instructores", leer_compartido(_leer_instructores)))
         
 @app.post("/instructores/")
-async def create_instructor(instructor: InstructorCreate):
+def create_instructor(instructor: InstructorCreate):
     connection = get_connection()
     try:
         with connection.cursor() as cursor:
@@ -81,29 +273,44 @@ async def create_instructor(instructor: InstructorCreate):
                 (instructor.ci, instructor.nombre, instructor.apellido)
             )
             connection.commit()
+            tablas_modificadas("instructores")
+            disponibilidad.invalidar()
+            indice_busqueda.agregar("instructores", ci=instructor.ci, nombre=instructor.nombre, apellido=instructor.apellido)
             return {"message": "Instructor creado exitosamente"}
     finally:
         connection.close()
 
 @app.put("/instructores/{ci}")
-async def update_instructor(ci: str, instructor: InstructorCreate):
+def update_instructor(ci: str, instructor: InstructorCreate):
     connection = get_connection()
     try:
         with connection.cursor() as cursor:
             cursor.execute("UPDATE instructores SET nombre = %s, apellido = %s WHERE ci = %s",
                            (instructor.nombre, instructor.apellido, ci))
             connection.commit()
+            tablas_modificadas("instructores")
+            disponibilidad.invalidar()
+            if cursor.rowcount:
+                indice_busqueda.agregar("instructores", ci=ci, nombre=instructor.nombre, apellido=instructor.apellido)
             return {"message": "Instructor actualizado exitosamente"}
     finally:
         connection.close()
 
 @app.delete("/instructores/{ci}")
-async def delete_instructor(ci: str):
+def delete_instructor(ci: str):
     connection = get_connection()
     try:
         with connection.cursor() as cursor:
+            # descontar de los resumenes las clases que se borran en cascada
+            borradas = clases_afectadas(cursor, "ci_instructor = %s", (ci,))
+            resumenes.ajustar_inscripciones(cursor, "c.ci_instructor = %s", (ci,), -1)
+            resumenes.ajustar_clases(cursor, "c.ci_instructor = %s", (ci,), -1)
             cursor.execute("DELETE FROM instructores WHERE ci = %s", (ci,))
             connection.commit()
+            tablas_modificadas("instructores", "clase")
+            disponibilidad.invalidar()
+            indice_busqueda.quitar("instructores", ci)
+            publicar_clases_eliminadas(borradas)
             return {"message": "Instructor eliminado exitosamente"}
     finally:
         connection.close()
@@ -111,124 +318,209 @@ async def delete_instructor(ci: str):
 ######################################################################
 #ABM turnos
 ######################################################################
+MAPEO_TURNO = mapeador("id", "hora_inicio", "hora_fin")
+
+def _leer_turnos(cursor):
+    # Convertir  segundos a formato HH:MM:SS
+    cursor.execute("""
+        SELECT id, 
+               SEC_TO_TIME(hora_inicio) AS hora_inicio, 
+               SEC_TO_TIME(hora_fin) AS hora_fin
+        FROM turnos
+    """)
+    return filas_a_json(MAPEO_TURNO, cursor.fetchall())
+
 @app.get("/turnos/")
-async def get_turnos():  
-    connection = get_connection()
-    try:
-        with connection.cursor() as cursor:
-            # Convertir  segundos a formato HH:MM:SS
-            cursor.execute("""
-                SELECT id, 
-                       SEC_TO_TIME(hora_inicio) AS hora_inicio, 
-                       SEC_TO_TIME(hora_fin) AS hora_fin
-                FROM turnos
-            """)
-            turnos = cursor.fetchall()
-            return [{"id": turno[0], "hora_inicio": turno[1], "hora_fin": turno[2]} for turno in turnos]
-    finally:
-        connection.close()
+def get_turnos(request: Request):
+    etag = versiones.etag(("turnos",))
+    return respuesta_condicional(request, etag, lambda: cache_catalogo.obtener("turnos", leer_compartido(_leer_turnos)))
         
 @app.post("/turnos/")
-async def create_turno(turno: dict):
+def create_turno(turno: dict):
     connection = get_connection()
     try:
         with connection.cursor() as cursor:
             cursor.execute("INSERT INTO turnos (hora_inicio, hora_fin) VALUES (%s, %s)",
                            (turno["hora_inicio"], turno["hora_fin"]))
             connection.commit()
+            tablas_modificadas("turnos")
+            intervalos.indice_turnos.invalidar()
+            disponibilidad.invalidar()
             return {"message": "Turno creado exitosamente"}
     finally:
         connection.close()
 
 @app.put("/turnos/{id}")
-async def update_turno(id: int, turno: dict):
+def update_turno(id: int, turno: dict):
     connection = get_connection()
     try:
         with connection.cursor() as cursor:
             cursor.execute("UPDATE turnos SET hora_inicio = %s, hora_fin = %s WHERE id = %s",
                            (turno["hora_inicio"], turno["hora_fin"], id))
             connection.commit()
+            tablas_modificadas("turnos")
+            intervalos.indice_turnos.invalidar()
+            disponibilidad.invalidar()
             return {"message": "Turno actualizado exitosamente"}
     finally:
         connection.close()
 
 @app.delete("/turnos/{id}")
-async def delete_turno(id: int):
+def delete_turno(id: int):
+    def borrar(cursor):
+        # descontar de los resumenes las clases que se borran en cascada
+        borradas = clases_afectadas(cursor, "id_turno = %s", (id,))
+        resumenes.ajustar_inscripciones(cursor, "c.id_turno = %s", (id,), -1)
+        resumenes.ajustar_clases(cursor, "c.id_turno = %s", (id,), -1)
+        cursor.execute("DELETE FROM turnos WHERE id = %s", (id,))
+        return borradas
+
     connection = get_connection()
     try:
-        with connection.cursor() as cursor:
-            cursor.execute("DELETE FROM turnos WHERE id = %s", (id,))
-            connection.commit()
-            return {"message": "Turno eliminado exitosamente"}
+        borradas = reintentar_transaccion(connection, borrar)
+        tablas_modificadas("turnos", "clase")
+        intervalos.indice_turnos.invalidar()
+        disponibilidad.invalidar()
+        publicar_clases_eliminadas(borradas)
+        return {"message": "Turno eliminado exitosamente"}
     finally:
         connection.close()
 
 ######################################################################
 #ABM actividades
 ######################################################################
+MAPEO_ACTIVIDAD = mapeador("id", "descripcion", "costo")
+
+def _leer_actividades(cursor):
+    cursor.execute("SELECT id, descripcion, costo FROM actividades")
+    return filas_a_json(MAPEO_ACTIVIDAD, cursor.fetchall())
 
 @app.get("/actividades/")
-async def get_actividades():
-    connection = get_connection()
-    try:
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT * FROM actividades")
-            actividades = cursor.fetchall()
-            return [{"id": a[0], "descripcion": a[1], "costo": float(a[2])} for a in actividades]
-    finally:
-        connection.close()
+def get_actividades(request: Request):
+    etag = versiones.etag(("actividades",))
+    return respuesta_condicional(request, etag, lambda: cache_catalogo.obtener("actividades", leer_compartido(_leer_actividades)))
 
 @app.post("/actividades/")
-async def create_actividad(actividad: dict):
+def create_actividad(actividad: dict):
     connection = get_connection()
     try:
         with connection.cursor() as cursor:
             cursor.execute("INSERT INTO actividades (descripcion, costo) VALUES (%s, %s)",
                            (actividad["descripcion"], actividad["costo"]))
             connection.commit()
+            tablas_modificadas("actividades")
             return {"message": "Actividad creada exitosamente"}
     finally:
         connection.close()
 
 @app.put("/actividades/{id}")
-async def update_actividad(id: int, actividad: dict):
+def update_actividad(id: int, actividad: dict):
+    def actualizar(cursor):
+        # el costo cambia los ingresos de todas las inscripciones de la actividad
+        resumenes.ajustar_inscripciones(cursor, "c.id_actividad = %s", (id,), -1)
+        cursor.execute("UPDATE actividades SET descripcion = %s, costo = %s WHERE id = %s",
+                       (actividad["descripcion"], actividad["costo"], id))
+        # al volver a sumar se controla el stock del equipamiento alquilado (ver inventario.py)
+        try:
+            resumenes.ajustar_inscripciones(cursor, "c.id_actividad = %s", (id,), 1)
+        except inventario.SinStock as e:
+            rechazar_sin_stock(connection, e)
+
     connection = get_connection()
     try:
-        with connection.cursor() as cursor:
-            cursor.execute("UPDATE actividades SET descripcion = %s, costo = %s WHERE id = %s",
-                           (actividad["descripcion"], actividad["costo"], id))
-            connection.commit()
-            return {"message": "Actividad actualizada exitosamente"}
+        reintentar_transaccion(connection, actualizar)
+        tablas_modificadas("actividades")
+        return {"message": "Actividad actualizada exitosamente"}
     finally:
         connection.close()
 
 @app.delete("/actividades/{id}")
-async def delete_actividad(id: int):
+def delete_actividad(id: int):
+    def borrar(cursor):
+        # resumen_actividad se borra en cascada, falta descontar los turnos y el cubo de analitica
+        borradas = clases_afectadas(cursor, "id_actividad = %s", (id,))
+        resumenes.ajustar_clases(cursor, "c.id_actividad = %s", (id,), -1)
+        analitica.ajustar(cursor, "c.id_actividad = %s", (id,), -1)
+        inventario.ajustar(cursor, "c.id_actividad = %s", (id,), -1)
+        cursor.execute("DELETE FROM actividades WHERE id = %s", (id,))
+        return borradas
+
     connection = get_connection()
     try:
-        with connection.cursor() as cursor:
-            cursor.execute("DELETE FROM actividades WHERE id = %s", (id,))
-            connection.commit()
-            return {"message": "Actividad eliminada exitosamente"}
+        borradas = reintentar_transaccion(connection, borrar)
+        tablas_modificadas("actividades", "equipamiento", "clase")
+        disponibilidad.invalidar()
+        publicar_clases_eliminadas(borradas)
+        return {"message": "Actividad eliminada exitosamente"}
     finally:
         connection.close()
         
 ######################################################################
 #ABM alumnos
 ######################################################################
+MAPEO_ALUMNO = mapeador("ci", "nombre", "apellido", "fecha_nacimiento", "telefono", "correo")
+
 @app.get("/alumnos/")
-async def get_alumnos():
-    connection = get_connection()
+def get_alumnos(
+    nombre: Optional[str] = None,
+    token: Optional[str] = Query(None, alias="cursor"),
+    limite: int = LIMITE_POR_DEFECTO,
+):
+    """
+    Lista paginada de alumnos ordenada por CI. `nombre` filtra por prefijo del nombre
+    y `cursor` es el `cursor_siguiente` de la pagina anterior.
+    """
+    limite = acotar_limite(limite)
+    condiciones, parametros = [], []
+    despues_de = decodificar_cursor(token, str)
+    if despues_de is not None:
+        condiciones.append("ci > %s")
+        parametros.append(despues_de)
+    if nombre:
+        condiciones.append("nombre LIKE %s")
+        parametros.append(escapar_like(nombre))
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+
+    connection = get_connection_lectura()
     try:
         with connection.cursor() as cursor:
-            cursor.execute("SELECT * FROM alumnos")
-            alumnos = cursor.fetchall()
-            return [{"ci": a[0], "nombre": a[1], "apellido": a[2], "fecha_nacimiento": a[3], "telefono": a[4], "correo": a[5]} for a in alumnos]
+            cursor.execute(f"""
+                SELECT ci, nombre, apellido, fecha_nacimiento, telefono, correo
+                FROM alumnos
+                {where}
+                ORDER BY ci
+                LIMIT %s
+            """, (*parametros, limite + 1))
+            items = list(map(MAPEO_ALUMNO, cursor.fetchall()))
+            return RespuestaJSON(a_json(armar_pagina(items, limite, "ci")))
     finally:
         connection.close()
 
+@app.get("/buscar/")
+def buscar(q: str, tipo: Optional[str] = None, limite: int = 10):
+    """
+    Busqueda para autocompletar alumnos e instructores por nombre, apellido, prefijo
+    de CI o correo, sin distinguir tildes ni mayusculas (ver busqueda.py).
+    `tipo` es alumnos o instructores; sin `tipo` busca en los dos.
+    """
+    if tipo is not None and tipo not in ("alumnos", "instructores"):
+        raise HTTPException(status_code=400, detail="Tipo invalido, usar alumnos o instructores")
+    limite = max(1, min(limite, LIMITE_RESULTADOS))
+    if not indice_busqueda.cargado():
+        connection = get_connection()
+        try:
+            with connection.cursor() as cursor:
+                indice_busqueda.cargar(cursor)
+                if not indice_busqueda.cargado():
+                    #el indice paso su tope de memoria: se busca en la base
+                    return RespuestaJSON(a_json(buscar_en_base(cursor, q, tipo, limite)))
+        finally:
+            connection.close()
+    resultados = indice_busqueda.buscar(q, tipo, limite)
+    return RespuestaJSON(a_json(resultados))
+
 @app.post("/alumnos/")
-async def create_alumno(alumno: Alumno):
+def create_alumno(alumno: Alumno):
     connection = get_connection()
     try:
         with connection.cursor() as cursor:
@@ -246,111 +538,240 @@ async def create_alumno(alumno: Alumno):
                 (alumno.ci, alumno.nombre, alumno.apellido, alumno.correo, alumno.telefono, alumno.fecha_nacimiento),
             )
             connection.commit()
+            indice_alumnos.agregar(alumno.ci)
+            indice_busqueda.agregar("alumnos", ci=alumno.ci, nombre=alumno.nombre, apellido=alumno.apellido, correo=alumno.correo)
             return {"message": "Alumno creado exitosamente"}
     finally:
         connection.close()
 
 @app.post("/alumnos/")
-async def create_alumno(alumno: Alumno):
+def create_alumno(alumno: Alumno):
     connection = get_connection()
     try:
         with connection.cursor() as cursor:
             cursor.execute("INSERT INTO alumnos (ci, nombre, apellido, fecha_nacimiento, telefono, correo) VALUES (%s, %s, %s, %s, %s, %s)",
                            (alumno.ci, alumno.nombre, alumno.apellido, alumno.fecha_nacimiento, alumno.telefono, alumno.correo))
             connection.commit()
+            indice_alumnos.agregar(alumno.ci)
+            indice_busqueda.agregar("alumnos", ci=alumno.ci, nombre=alumno.nombre, apellido=alumno.apellido, correo=alumno.correo)
             return {"message": "Alumno creado exitosamente"}
     finally:
         connection.close()
 
 
+@app.post("/alumnos/importar/")
+def importar_alumnos(archivo: UploadFile = File(...), formato: Optional[str] = None, dry_run: bool = False):
+    """
+    Alta masiva de alumnos desde un archivo CSV (con cabecera) o NDJSON.
+    Devuelve cuantos se insertaron y el error de cada fila rechazada.
+    """
+    if formato is None:
+        formato = "ndjson" if (archivo.filename or "").lower().endswith((".ndjson", ".jsonl")) else "csv"
+    if formato not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="Formato invalido, usar csv o ndjson")
+    return importacion.importar_alumnos(archivo.file, formato, dry_run)
+
+
 @app.put("/alumnos/{ci}")
-async def update_alumno(ci: str, alumno: Alumno):
+def update_alumno(ci: str, alumno: Alumno):
     connection = get_connection()
     try:
         with connection.cursor() as cursor:
             cursor.execute("UPDATE alumnos SET nombre = %s, apellido = %s, fecha_nacimiento = %s, telefono = %s, correo = %s WHERE ci = %s",
                            (alumno.nombre, alumno.apellido, alumno.fecha_nacimiento, alumno.telefono, alumno.correo, ci))
             connection.commit()
+            if cursor.rowcount:
+                indice_busqueda.agregar("alumnos", ci=ci, nombre=alumno.nombre, apellido=alumno.apellido, correo=alumno.correo)
             return {"message": "Alumno actualizado exitosamente"}
     finally:
         connection.close()
 
 @app.delete("/alumnos/{ci}")
-async def delete_alumno(ci: str):
+def delete_alumno(ci: str):
     connection = get_connection()
     try:
         with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT c.id, c.ci_instructor, c.id_turno FROM alumno_clase ac
+                JOIN clase c ON ac.id_clase = c.id WHERE ac.ci_alumno = %s
+            """, (ci,))
+            clases = cursor.fetchall()
+            resumenes.ajustar_inscripciones(cursor, "ac.ci_alumno = %s", (ci,), -1)
             cursor.execute("DELETE FROM alumnos WHERE ci = %s", (ci,))
             connection.commit()
+            indice_alumnos.quitar(ci)
+            indice_busqueda.quitar("alumnos", ci)
+            if clases:
+                bus_eventos.publicar(
+                    "alumno_eliminado", {"ci": ci, "clases": [c[0] for c in clases]},
+                    clases=[c[0] for c in clases], instructores={c[1] for c in clases}, turnos={c[2] for c in clases},
+                )
             return {"message": "Alumno eliminado exitosamente"}
     finally:
         connection.close()
 
 ######################################################################
 
+def rechazar_conflictos(connection, alumnos, en_conflicto):
+    """
+    Si hay alumnos con otra clase en un turno superpuesto, deshace la transaccion
+    y responde 400 con todas las CI en conflicto.
+    """
+    if en_conflicto:
+        connection.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "message": "Hay alumnos ya inscritos en otra clase en un turno que se superpone.",
+                "alumnos_en_conflicto": [ci for ci in alumnos if ci in en_conflicto],
+            },
+        )
+
+def rechazar_sin_stock(connection, error):
+    """Deshace la transaccion y responde 400 con el equipamiento y turno que no alcanzan."""
+    connection.rollback()
+    raise HTTPException(
+        status_code=400,
+        detail={"message": "Sin stock de equipamiento en ese turno.", "faltantes": error.faltantes},
+    )
+
 @app.post("/inscripciones/")
-async def inscripciones(data: dict):
+def inscripciones(data: dict):
     """
-    Verifica si la clase existe, y si no, la crea. Luego inscribe a los alumnos en la clase existente.
+    Busca o crea la clase e inscribe a los alumnos, todo en una sola transaccion.
+    La clase se resuelve con un solo INSERT ... ON DUPLICATE KEY UPDATE sobre la clave unica
+    (instructor, actividad, turno): dos inscripciones simultaneas no pueden crearla dos veces.
+    Si algun alumno ya tiene clase en un turno superpuesto no se inscribe ninguno y se
+    devuelven todas las CI en conflicto. Una clase nueva no puede superponerse con otra del
+    mismo instructor (ver disponibilidad.py). Si no queda stock del equipamiento en el
+    turno tampoco se inscribe ninguno (ver inventario.py). Si MySQL aborta por deadlock se reintenta.
     """
-    connection = get_connection()
-    try:
-        with connection.cursor() as cursor:
-            # Extraer datos
-            alumnos = data["alumnos"]  # Lista de alumnos (ci)
-            id_actividad = data["id_actividad"]
-            ci_instructor = data["ci_instructor"]
-            id_turno = data["id_turno"]
-            id_equipamiento = data.get("id_equipamiento")  # Puede ser None
-
-            # Validar si ya existe una clase con el mismo instructor, actividad y turno
-            query_clase_existente = """
-                SELECT id FROM clase
-                WHERE ci_instructor = %s AND id_actividad = %s AND id_turno = %s
+    alumnos = _cis(data, "alumnos")  # Lista de alumnos (ci como texto, igual que en la base), sin repetidos
+    id_actividad = data["id_actividad"]
+    ci_instructor = str(data["ci_instructor"])
+    id_turno = data["id_turno"]
+    id_equipamiento = data.get("id_equipamiento")  # Puede ser None
+    reservas = []
+
+    def inscribir(cursor):
+        # en un reintento lo reservado por el intento anterior ya no vale
+        while reservas:
+            disponibilidad.cancelar(reservas.pop())
+
+        # el instructor no puede tener otra clase en un turno que se superpone. Se reserva antes
+        # de escribir: si la disponibilidad no esta cargada se lee de `clase` con este cursor,
+        # y no tiene que ver la clase que esta transaccion todavia no confirmo
+        reserva = disponibilidad.reservar(cursor, ci_instructor, id_turno)
+        if reserva is not None:
+            reservas.append(reserva)
+
+        # LAST_INSERT_ID(id) hace que lastrowid sea el id de la clase tambien cuando ya existia;
+        # rowcount es 1 si se inserto y 0 si ya estaba
+        cursor.execute("""
+            INSERT INTO clase (ci_instructor, id_actividad, id_turno, dictada)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)
+        """, (ci_instructor, id_actividad, id_turno, False))
+        clase_id = cursor.lastrowid
+        creada = cursor.rowcount == 1
+
+        if creada:
+            if reserva is None:
+                raise HTTPException(status_code=400, detail="El instructor ya tiene una clase en un turno que se superpone.")
+            resumenes.ajustar_clases(cursor, "c.id = %s", (clase_id,), 1)
+        elif reserva is not None:
+            # la clase ya existia: no ocupa al instructor de nuevo
+            disponibilidad.cancelar(reservas.pop())
+
+        if alumnos:
+            # Validar de una vez que ningun alumno este inscrito en otra clase en un turno superpuesto
+            en_conflicto = intervalos.alumnos_en_conflicto(cursor, alumnos, id_turno)
+            rechazar_conflictos(connection, alumnos, en_conflicto)
+
+            # Inscribir a todo el grupo en un solo INSERT
+            query_inscribir_alumnos = """
+                INSERT INTO alumno_clase (id_clase, ci_alumno, id_equipamiento)
+                VALUES (%s, %s, %s)
             """
-            cursor.execute(query_clase_existente, (ci_instructor, id_actividad, id_turno))
-            clase_existente = cursor.fetchone()
-
-            if not clase_existente:
-                # Crear la clas
-                query_crear_clase = """
-                    INSERT INTO clase (ci_instructor, id_actividad, id_turno, dictada)
-                    VALUES (%s, %s, %s, %s)
-                """
-                cursor.execute(query_crear_clase, (ci_instructor, id_actividad, id_turno, False))
-                connection.commit()
-                clase_id = cursor.lastrowid
-            else:
-                # Usar la clase existente
-                clase_id = clase_existente[0]
-
-            # Inscribir a los alumnos en la clase existente
-            for ci_alumno in alumnos:
-                # Validar si el alumno ya está inscrito en otra clase en este turno
-                query_alumno_turno = """
-                    SELECT * FROM alumno_clase ac
-                    JOIN clase c ON ac.id_clase = c.id
-                    WHERE ac.ci_alumno = %s AND c.id_turno = %s
-                """
-                cursor.execute(query_alumno_turno, (ci_alumno, id_turno))
-                if cursor.fetchone():
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"El alumno con CI {ci_alumno} ya está inscrito en otra clase en este turno."
-                    )
-
-                # Inscribir al alumno
-                query_inscribir_alumno = """
-                    INSERT INTO alumno_clase (id_clase, ci_alumno, id_equipamiento)
-                    VALUES (%s, %s, %s)
-                """
-                cursor.execute(
-                    query_inscribir_alumno,
-                    (clase_id, ci_alumno, id_equipamiento if id_equipamiento else None), #equip opcional
+            cursor.executemany(
+                query_inscribir_alumnos,
+                [(clase_id, ci_alumno, id_equipamiento if id_equipamiento else None) for ci_alumno in alumnos], #equip opcional
+            )
+            try:
+                resumenes.ajustar_inscripciones(
+                    cursor, f"ac.id_clase = %s AND ac.ci_alumno IN ({marcadores(alumnos)})", (clase_id, *alumnos), 1
                 )
-                connection.commit()
+            except inventario.SinStock as e:
+                rechazar_sin_stock(connection, e)
+        return clase_id, creada
+
+    connection = get_connection()
+    try:
+        clase_id, creada = reintentar_transaccion(connection, inscribir)
+        for reserva in reservas:
+            disponibilidad.confirmar(reserva)
+        if creada:
+            tablas_modificadas("clase")
+        bus_eventos.publicar(
+            "inscripcion",
+            {"id_clase": clase_id, "ci_instructor": ci_instructor, "id_actividad": id_actividad,
+             "id_turno": id_turno, "clase_nueva": creada, "agregados": alumnos},
+            clases=[clase_id], instructores=[ci_instructor], turnos=[id_turno],
+        )
+        return {"message": "Alumnos inscritos exitosamente en la clase", "id_clase": clase_id}
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+    finally:
+        for reserva in reservas:
+            disponibilidad.cancelar(reserva)  #no hace nada si ya se confirmo
+        connection.close()
 
-            return {"message": "Alumnos inscritos exitosamente en la clase", "id_clase": clase_id}
+@app.post("/asignaciones/")
+def asignaciones(pedido: PedidoAsignacion):
+    """
+    Reparte un grupo de alumnos entre las clases existentes segun sus preferencias de
+    actividad, sin pasar `capacidad` alumnos por clase ni chocar con turnos que ya tienen
+    (ver asignacion.py). Con dry_run (por defecto) solo devuelve el plan; sin dry_run lo
+    inscribe todo en una transaccion, con las clases candidatas bloqueadas mientras se calcula.
+    """
+    if pedido.capacidad < 1:
+        raise HTTPException(status_code=400, detail="La capacidad debe ser al menos 1.")
+    preferencias = {}
+    for alumno in pedido.alumnos:
+        preferencias.setdefault(alumno.ci, alumno.preferencias)  #si una CI se repite vale la primera
+
+    if pedido.dry_run:
+        connection = get_connection_lectura()
+        try:
+            with connection.cursor() as cursor:
+                plan = asignacion.planificar(cursor, preferencias, pedido.capacidad)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+        finally:
+            connection.close()
+        return RespuestaJSON(a_json({"dry_run": True, **plan}))
+
+    def asignar(cursor):
+        plan = asignacion.planificar(cursor, preferencias, pedido.capacidad, bloquear=True)
+        asignacion.aplicar(cursor, plan)
+        return plan
+
+    connection = get_connection()
+    try:
+        plan = reintentar_transaccion(connection, asignar)
+        por_clase = {}
+        for a in plan["asignaciones"]:
+            por_clase.setdefault(a["id_clase"], (a, []))[1].append(a["ci"])
+        for id_clase, (a, agregados) in por_clase.items():
+            bus_eventos.publicar(
+                "inscripcion",
+                {"id_clase": id_clase, "ci_instructor": a["ci_instructor"], "id_actividad": a["id_actividad"],
+                 "id_turno": a["id_turno"], "clase_nueva": False, "agregados": agregados},
+                clases=[id_clase], instructores=[a["ci_instructor"]], turnos=[a["id_turno"]],
+            )
+        return RespuestaJSON(a_json({"dry_run": False, **plan}))
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -359,7 +780,7 @@ async def inscripciones(data: dict):
         connection.close()
 
 @app.post("/equipamientos/")
-async def crear_equipamiento(equipamiento: EquipamientoCreate):
+def crear_equipamiento(equipamiento: EquipamientoCreate):
     """
     Crea un nuevo registro en la tabla `equipamiento`.
     Valida que `id_actividad` exista en la tabla `actividades`.
@@ -376,12 +797,13 @@ async def crear_equipamiento(equipamiento: EquipamientoCreate):
             # Ins nuevo equipamiento
             cursor.execute(
                 """
-                INSERT INTO equipamiento (id_actividad, descripcion, costo)
-                VALUES (%s, %s, %s)
+                INSERT INTO equipamiento (id_actividad, descripcion, costo, stock)
+                VALUES (%s, %s, %s, %s)
                 """,
-                (equipamiento.id_actividad, equipamiento.descripcion, equipamiento.costo),
+                (equipamiento.id_actividad, equipamiento.descripcion, equipamiento.costo, equipamiento.stock),
             )
             connection.commit()
+            tablas_modificadas("equipamiento")
 
             # Obtener el ID generado automáticamente
             nuevo_id = cursor.lastrowid
@@ -390,15 +812,43 @@ async def crear_equipamiento(equipamiento: EquipamientoCreate):
                 "id": nuevo_id,
                 "id_actividad": equipamiento.id_actividad,
                 "descripcion": equipamiento.descripcion,
-                "costo": equipamiento.costo
+                "costo": equipamiento.costo,
+                "stock": equipamiento.stock
             }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al crear el equipamiento: {str(e)}")
     finally:
         connection.close()
+
+@app.put("/equipamientos/{equipamiento_id}/stock")
+def cambiar_stock_equipamiento(equipamiento_id: int, pedido: EquipamientoStock):
+    """
+    Cambia las unidades que se pueden alquilar por turno (null = sin limite).
+    No se puede bajar por debajo de lo que ya esta alquilado en algun turno.
+    """
+    if pedido.stock is not None and pedido.stock < 0:
+        raise HTTPException(status_code=400, detail="El stock no puede ser negativo.")
+    connection = get_connection()
+    try:
+        excedidos = reintentar_transaccion(
+            connection, lambda cursor: inventario.cambiar_stock(cursor, equipamiento_id, pedido.stock)
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al cambiar el stock: {str(e)}")
+    finally:
+        connection.close()
+    if excedidos is None:
+        raise HTTPException(status_code=404, detail="Equipamiento no encontrado")
+    if excedidos:
+        raise HTTPException(
+            status_code=400,
+            detail={"message": "Hay turnos con mas unidades alquiladas que el stock pedido.", "turnos": excedidos},
+        )
+    tablas_modificadas("equipamiento")
+    return {"message": "Stock actualizado", "id": equipamiento_id, "stock": pedido.stock}
         
 @app.delete("/equipamientos/{equipamiento_id}")
-async def eliminar_equipamiento(equipamiento_id: int):
+def eliminar_equipamiento(equipamiento_id: int):
     """
     Elimina un registro de la tabla `equipamiento` por su ID.
     """
@@ -414,6 +864,7 @@ async def eliminar_equipamiento(equipamiento_id: int):
             # Eliminar el equipamiento
             cursor.execute("DELETE FROM equipamiento WHERE id = %s", (equipamiento_id,))
             connection.commit()
+            tablas_modificadas("equipamiento")
 
             return {
                 "message": "Equipamiento eliminado exitosamente",
@@ -427,181 +878,333 @@ async def eliminar_equipamiento(equipamiento_id: int):
 
 
         
+MAPEO_CLASE = mapeador("id", "ci_instructor", "id_actividad", "id_turno", "dictada")
+
 @app.get("/clases/")
-async def obtener_clases():
-    connection = get_connection()
-    try:
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT * FROM clase")
-            clases = cursor.fetchall()
-            return [{"id": c[0], "ci_instructor": c[1], "id_actividad": c[2], "id_turno": c[3], "dictada": c[4]} for c in clases]
-    finally:
-        connection.close()
+def obtener_clases(
+    request: Request,
+    id_actividad: Optional[int] = None,
+    id_turno: Optional[int] = None,
+    ci_instructor: Optional[str] = None,
+    dictada: Optional[bool] = None,
+    token: Optional[str] = Query(None, alias="cursor"),
+    limite: int = LIMITE_POR_DEFECTO,
+):
+    """
+    Lista paginada de clases ordenada por id, con filtros opcionales.
+    `cursor` es el `cursor_siguiente` de la pagina anterior.
+    """
+    limite = acotar_limite(limite)
+    etag = versiones.etag(("clase",), id_actividad, id_turno, ci_instructor, dictada, token, limite)
+    condiciones, parametros = [], []
+    despues_de = decodificar_cursor(token, int)
+    if despues_de is not None:
+        condiciones.append("id > %s")
+        parametros.append(despues_de)
+    for columna, valor in (("id_actividad", id_actividad), ("id_turno", id_turno),
+                           ("ci_instructor", ci_instructor), ("dictada", dictada)):
+        if valor is not None:
+            condiciones.append(f"{columna} = %s")
+            parametros.append(valor)
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+
+    def leer():
+        connection = get_connection_lectura(compartida=True)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"""
+                    SELECT id, ci_instructor, id_actividad, id_turno, dictada
+                    FROM clase
+                    {where}
+                    ORDER BY id
+                    LIMIT %s
+                """, (*parametros, limite + 1))
+                items = list(map(MAPEO_CLASE, cursor.fetchall()))
+                return a_json(armar_pagina(items, limite, "id"))
+        finally:
+            connection.close()
+
+    return respuesta_condicional(request, etag, leer)
+
+MAPEO_EQUIPAMIENTO = mapeador("id", "id_actividad", "descripcion", "costo", "stock")
+
+def _leer_equipamiento(cursor):
+    cursor.execute("SELECT id, id_actividad, descripcion, costo, stock FROM equipamiento")
+    return filas_a_json(MAPEO_EQUIPAMIENTO, cursor.fetchall())
+
 @app.get("/equipamientos/")
-async def obtener_equipamientos():
-    connection = get_connection()
-    try:
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT * FROM equipamiento")
-            equipamientos = cursor.fetchall()
-            return [{"id": e[0], "id_actividad": e[1], "descripcion": e[2], "costo": float(e[3])} for e in equipamientos]
-    finally:
-        connection.close()
+def obtener_equipamientos(request: Request):
+    etag = versiones.etag(("equipamiento",))
+    return respuesta_condicional(request, etag, lambda: cache_catalogo.obtener("equipamiento", leer_compartido(_leer_equipamiento)))
            
         
 #########MODIFICAR CLASES##########
 
+def _cis(data, clave):
+    #las CI son texto en la base; sin repetidos y en el orden pedido
+    return list(dict.fromkeys(str(ci) for ci in data.get(clave) or []))
+
+def _clase_modificable(cursor, id_clase):
+    """(turno, instructor) de la clase. 404 si no existe, 400 si esta en su horario activo."""
+    cursor.execute("""
+        SELECT t.hora_inicio, t.hora_fin, c.id_turno, c.ci_instructor
+        FROM clase c
+        JOIN turnos t ON c.id_turno = t.id
+        WHERE c.id = %s
+    """, (id_clase,))
+    horario = cursor.fetchone()
+    if not horario:
+        raise HTTPException(status_code=404, detail="Clase no encontrada.")
+
+    hora_inicio, hora_fin, id_turno, ci_instructor = horario
+    now = intervalos.a_segundos(datetime.now().time())
+    if intervalos.a_segundos(hora_inicio) <= now <= intervalos.a_segundos(hora_fin):
+        raise HTTPException(
+            status_code=400,
+            detail="No se puede modificar la clase durante su horario activo."
+        )
+    return id_turno, ci_instructor
+
+def cambiar_alumnos(connection, cursor, id_clase, id_turno, agregar, quitar, revalidar=False):
+    """
+    Aplica a la lista de la clase la diferencia con lo pedido, dentro de la transaccion:
+    entran los de `agregar` que no estan y salen los de `quitar` que estan. Se valida todo
+    junto antes de escribir (que los alumnos existan y que ninguno quede en otra clase de un
+    turno superpuesto con `id_turno`; con `revalidar` tambien los que se quedan, para cuando
+    la clase cambia de turno) y se escribe con un DELETE y un INSERT de varias filas.
+    Devuelve (agregados, quitados).
+    """
+    en_ambas = set(agregar) & set(quitar)
+    if en_ambas:
+        raise HTTPException(
+            status_code=400,
+            detail={"message": "Hay alumnos para agregar y quitar a la vez.",
+                    "alumnos": [ci for ci in agregar if ci in en_ambas]},
+        )
+
+    #la lista actual queda bloqueada: dos cambios simultaneos de la misma clase se ordenan
+    cursor.execute("SELECT ci_alumno FROM alumno_clase WHERE id_clase = %s FOR UPDATE", (id_clase,))
+    actuales = {r[0] for r in cursor.fetchall()}
+    agregados = [ci for ci in agregar if ci not in actuales]
+    quitados = [ci for ci in quitar if ci in actuales]
+
+    if agregados:
+        cursor.execute(f"SELECT ci FROM alumnos WHERE ci IN ({marcadores(agregados)})", agregados)
+        existentes = {r[0] for r in cursor.fetchall()}
+        inexistentes = [ci for ci in agregados if ci not in existentes]
+        if inexistentes:
+            raise HTTPException(status_code=404, detail={"message": "Alumnos no encontrados.", "alumnos": inexistentes})
+
+    a_validar = agregados
+    if revalidar:
+        salen = set(quitados)
+        a_validar = agregados + sorted(ci for ci in actuales if ci not in salen)
+    en_conflicto = intervalos.alumnos_en_conflicto(cursor, a_validar, id_turno, excluir_clase=id_clase)
+    rechazar_conflictos(connection, a_validar, en_conflicto)
+
+    if quitados:
+        resumenes.ajustar_inscripciones(
+            cursor, f"ac.id_clase = %s AND ac.ci_alumno IN ({marcadores(quitados)})", (id_clase, *quitados), -1
+        )
+        cursor.execute(
+            f"DELETE FROM alumno_clase WHERE id_clase = %s AND ci_alumno IN ({marcadores(quitados)})",
+            (id_clase, *quitados),
+        )
+    if agregados:
+        cursor.executemany(
+            "INSERT INTO alumno_clase (id_clase, ci_alumno) VALUES (%s, %s)",
+            [(id_clase, ci) for ci in agregados],
+        )
+        resumenes.ajustar_inscripciones(
+            cursor, f"ac.id_clase = %s AND ac.ci_alumno IN ({marcadores(agregados)})", (id_clase, *agregados), 1
+        )
+    return agregados, quitados
+
 @app.put("/clases/{id_clase}/")
-async def modificar_clase(id_clase: int, data: dict):
+def modificar_clase(id_clase: int, data: dict):
     """
-    Modificar instructor, turno y alumnos de una clase.
+    Modificar instructor, turno y alumnos de una clase, todo en una transaccion.
+    Los alumnos se cambian con cambiar_alumnos: si la clase cambia de turno se valida
+    tambien a los que se quedan. Si MySQL aborta por deadlock se reintenta.
     """
-    connection = get_connection()
-    try:
-        with connection.cursor() as cursor:
-            # Obtener horario de la clase
-            query_horario_clase = """
-                SELECT t.horario_inicio, t.horario_fin
-                FROM clase c
-                JOIN turnos t ON c.id_turno = t.id
-                WHERE c.id = %s
-            """
-            cursor.execute(query_horario_clase, (id_clase,))
-            horario = cursor.fetchone()
-
-            #validar que la consulta devolvió datos
-            if not horario:
-                raise HTTPException(status_code=404, detail="Clase o turno no encontrado.")
-
-            #acceder a las columnas como un diccionario
-            hora_inicio = horario["hora_inicio"]
-            hora_fin = horario["hora_fin"]
-
-            #validar si la clase está en horario activo
-            now = datetime.now().time()
-            if hora_inicio <= now <= hora_fin:
-                raise HTTPException(
-                    status_code=400,
-                    detail="No se puede modificar la clase durante su horario activo."
-                )
+    agregar = _cis(data, "agregar_alumnos")
+    quitar = _cis(data, "quitar_alumnos")
+    mueve_celdas = "ci_instructor" in data or "id_turno" in data
+    reservas = []
 
-            #modi instru
-            if "ci_instructor" in data:
-                query_modificar_instructor = """
-                    UPDATE clase
-                    SET ci_instructor = %s
-                    WHERE id = %s
-                """
-                cursor.execute(query_modificar_instructor, (data["ci_instructor"], id_clase))
+    def modificar(cursor):
+        # en un reintento lo reservado por el intento anterior ya no vale
+        while reservas:
+            disponibilidad.cancelar(reservas.pop())
+
+        turno_actual, instructor_actual = _clase_modificable(cursor, id_clase)
+        nuevo_turno = data.get("id_turno", turno_actual)
+        nuevo_instructor = data.get("ci_instructor", instructor_actual)
 
-            #modi turno
+        #el instructor (nuevo o el mismo) no puede tener otra clase en un turno que se superpone
+        if mueve_celdas:
+            reserva = disponibilidad.reservar(
+                cursor, nuevo_instructor, nuevo_turno, anterior=(instructor_actual, turno_actual),
+            )
+            if reserva is None:
+                raise HTTPException(status_code=400, detail="El instructor ya tiene una clase en un turno que se superpone.")
+            reservas.append(reserva)
+
+        #primero la lista: al mover la clase se mueven solo los alumnos que quedan
+        agregados, quitados = cambiar_alumnos(
+            connection, cursor, id_clase, nuevo_turno, agregar, quitar, revalidar=nuevo_turno != turno_actual
+        )
+
+        if mueve_celdas:
+            #las inscripciones cambian de celda en el cubo de analitica y, con el turno, de reservas de equipamiento
+            analitica.ajustar(cursor, "c.id = %s", (id_clase,), -1)
             if "id_turno" in data:
-                query_modificar_turno = """
-                    UPDATE clase
-                    SET id_turno = %s
-                    WHERE id = %s
-                """
-                cursor.execute(query_modificar_turno, (data["id_turno"], id_clase))
-
-            #agregar alumnos
-            if "agregar_alumnos" in data:
-                for ci_alumno in data["agregar_alumnos"]:
-                    query_agregar_alumno = """
-                        INSERT INTO alumno_clase (id_clase, ci_alumno)
-                        VALUES (%s, %s)
-                    """
-                    cursor.execute(query_agregar_alumno, (id_clase, ci_alumno))
-
-            #quitar alumnos
-            if "quitar_alumnos" in data:
-                for ci_alumno in data["quitar_alumnos"]:
-                    query_quitar_alumno = """
-                        DELETE FROM alumno_clase
-                        WHERE id_clase = %s AND ci_alumno = %s
-                    """
-                    cursor.execute(query_quitar_alumno, (id_clase, ci_alumno))
+                resumenes.ajustar_clases(cursor, "c.id = %s", (id_clase,), -1)
+                inventario.ajustar(cursor, "c.id = %s", (id_clase,), -1)
+            try:
+                cursor.execute(
+                    "UPDATE clase SET ci_instructor = %s, id_turno = %s WHERE id = %s",
+                    (nuevo_instructor, nuevo_turno, id_clase),
+                )
+            except Error as e:
+                if e.errno != ERROR_CLAVE_DUPLICADA:
+                    raise
+                #la clave unica (instructor, actividad, turno): esa clase ya existe
+                raise HTTPException(status_code=409, detail="Ya existe una clase de ese instructor y actividad en ese turno.")
+            analitica.ajustar(cursor, "c.id = %s", (id_clase,), 1)
+            if "id_turno" in data:
+                resumenes.ajustar_clases(cursor, "c.id = %s", (id_clase,), 1)
+                #el equipamiento alquilado pasa al turno nuevo, que tiene que tener stock
+                try:
+                    inventario.ajustar(cursor, "c.id = %s", (id_clase,), 1)
+                except inventario.SinStock as e:
+                    rechazar_sin_stock(connection, e)
+        return turno_actual, instructor_actual, nuevo_turno, nuevo_instructor, agregados, quitados
 
-            connection.commit()
-            return {"message": "Clase modificada exitosamente."}
+    connection = get_connection()
+    try:
+        turno_actual, instructor_actual, nuevo_turno, nuevo_instructor, agregados, quitados = \
+            reintentar_transaccion(connection, modificar)
+        for reserva in reservas:
+            disponibilidad.confirmar(reserva)
+        if mueve_celdas:
+            tablas_modificadas("clase")
+        bus_eventos.publicar(
+            "clase_modificada",
+            {"id_clase": id_clase, "ci_instructor": nuevo_instructor, "id_turno": nuevo_turno,
+             "ci_instructor_anterior": instructor_actual, "id_turno_anterior": turno_actual,
+             "agregados": agregados, "quitados": quitados},
+            clases=[id_clase], instructores={instructor_actual, nuevo_instructor},
+            turnos={turno_actual, nuevo_turno},
+        )
+        return {"message": "Clase modificada exitosamente.", "agregados": agregados, "quitados": quitados}
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
     finally:
+        for reserva in reservas:
+            disponibilidad.cancelar(reserva)  #no hace nada si ya se confirmo
         connection.close()
 
 
 
 ########MODIFICAR ALUMNOS##########
 @app.put("/clases/{id_clase}/alumnos/")
-async def modificar_alumnos(id_clase: int, data: dict):
+def modificar_alumnos(id_clase: int, data: dict):
     """
-    Agregar o quitar alumnos de una clase grupal.
+    Agregar o quitar alumnos de una clase grupal, en una transaccion (ver cambiar_alumnos).
     """
-    connection = get_connection()
-    try:
-        with connection.cursor() as cursor:
-            #validar si la clase está en horario activo
-            query_horario_clase = """
-                SELECT t.hora_inicio, t.hora_fin
-                FROM clase c
-                JOIN turnos t ON c.id_turno = t.id
-                WHERE c.id = %s
-            """
-            cursor.execute(query_horario_clase, (id_clase,))
-            horario = cursor.fetchone()
-
-            if not horario:
-                raise HTTPException(status_code=404, detail="Clase no encontrada.")
+    agregar = _cis(data, "agregar")
+    quitar = _cis(data, "quitar")
 
-            hora_inicio, hora_fin = horario
-            now = datetime.now().time()
+    def modificar(cursor):
+        id_turno, ci_instructor = _clase_modificable(cursor, id_clase)
+        agregados, quitados = cambiar_alumnos(connection, cursor, id_clase, id_turno, agregar, quitar)
+        return id_turno, ci_instructor, agregados, quitados
 
-            if hora_inicio <= now <= hora_fin:
-                raise HTTPException(
-                    status_code=400,
-                    detail="No se puede modificar la clase durante su horario activo."
-                )
-
-            #agregar alumnos
-            if "agregar" in data:
-                for ci_alumno in data["agregar"]:
-                    query_agregar_alumno = """
-                        INSERT INTO alumno_clase (id_clase, ci_alumno)
-                        VALUES (%s, %s)
-                    """
-                    cursor.execute(query_agregar_alumno, (id_clase, ci_alumno))
-
-            #quitar alumnos
-            if "quitar" in data:
-                for ci_alumno in data["quitar"]:
-                    query_quitar_alumno = """
-                        DELETE FROM alumno_clase
-                        WHERE id_clase = %s AND ci_alumno = %s
-                    """
-                    cursor.execute(query_quitar_alumno, (id_clase, ci_alumno))
-
-            connection.commit()
-            return {"message": "Alumnos modificados exitosamente."}
+    connection = get_connection()
+    try:
+        id_turno, ci_instructor, agregados, quitados = reintentar_transaccion(connection, modificar)
+        if agregados or quitados:
+            bus_eventos.publicar(
+                "alumnos_modificados",
+                {"id_clase": id_clase, "ci_instructor": ci_instructor, "id_turno": id_turno,
+                 "agregados": agregados, "quitados": quitados},
+                clases=[id_clase], instructores=[ci_instructor], turnos=[id_turno],
+            )
+        return {"message": "Alumnos modificados exitosamente.", "agregados": agregados, "quitados": quitados}
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
     finally:
         connection.close()
 
+######################################################################
+#exportaciones
+######################################################################
+
+EXPORTACIONES = {
+    "alumnos": (
+        ["ci", "nombre", "apellido", "fecha_nacimiento", "telefono", "correo"],
+        "SELECT ci, nombre, apellido, fecha_nacimiento, telefono, correo FROM alumnos ORDER BY ci",
+    ),
+    "clases": (
+        ["id", "ci_instructor", "id_actividad", "id_turno", "dictada"],
+        "SELECT id, ci_instructor, id_actividad, id_turno, dictada FROM clase ORDER BY id",
+    ),
+    "inscripciones": (
+        ["id_clase", "ci_alumno", "id_equipamiento"],
+        "SELECT id_clase, ci_alumno, id_equipamiento FROM alumno_clase ORDER BY id_clase, ci_alumno",
+    ),
+}
+
+@app.get("/exportar/{tabla}/")
+async def exportar_tabla(tabla: str, formato: str = "csv", comprimido: bool = Query(False, alias="gzip")):
+    """
+    Descarga completa de alumnos, clases o inscripciones en CSV o NDJSON.
+    Las filas se leen con un cursor sin buffer y se envian a medida que llegan.
+    Hay un maximo de descargas a la vez (ver exportacion.py); pasado ese numero responde 503.
+    """
+    if tabla not in EXPORTACIONES:
+        raise HTTPException(status_code=404, detail="Exportacion no encontrada")
+    if formato not in exportacion.FORMATOS:
+        raise HTTPException(status_code=400, detail="Formato invalido, usar csv o ndjson")
+
+    columnas, query = EXPORTACIONES[tabla]
+    archivo = f"{tabla}.{formato}"
+    media_type = exportacion.FORMATOS[formato]
+    if comprimido:
+        archivo += ".gz"
+        media_type = "application/gzip"
+    try:
+        bloques = exportacion.exportar(columnas, query, formato, comprimido)
+    except exportacion.ExportacionesOcupadas:
+        raise HTTPException(status_code=503, detail="Hay demasiadas exportaciones en curso, reintentar mas tarde",
+                            headers={"Retry-After": "10"})
+    return StreamingResponse(
+        bloques,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{archivo}"'},
+    )
+
 ######################################################################
 #reportes
+#se leen de las tablas de resumen (ver resumenes.py)
 ######################################################################
 
 @app.get("/reportes/actividades_mas_ingresos/")
-async def actividades_mas_ingresos():
-    connection = get_connection()
+def actividades_mas_ingresos():
+    connection = get_connection_lectura()
     try:
         with connection.cursor() as cursor:
             query = """
-                SELECT a.descripcion, SUM(ac.costo + e.costo) AS total_ingresos
+                SELECT a.descripcion, SUM(r.total_ingresos) AS total_ingresos
                 FROM actividades a
-                JOIN clase c ON a.id = c.id_actividad
-                JOIN alumno_clase ac ON c.id = ac.id_clase
-                LEFT JOIN equipamiento e ON ac.id_equipamiento = e.id
+                JOIN resumen_actividad r ON a.id = r.id_actividad
                 GROUP BY a.descripcion
+                HAVING SUM(r.total_alumnos) > 0
                 ORDER BY total_ingresos DESC
             """
             cursor.execute(query)
@@ -611,16 +1214,16 @@ async def actividades_mas_ingresos():
         connection.close()
 
 @app.get("/reportes/actividades_mas_alumnos/")
-async def actividades_mas_alumnos():
-    connection = get_connection()
+def actividades_mas_alumnos():
+    connection = get_connection_lectura()
     try:
         with connection.cursor() as cursor:
             query = """
-                SELECT a.descripcion, COUNT(ac.ci_alumno) AS total_alumnos
+                SELECT a.descripcion, SUM(r.total_alumnos) AS total_alumnos
                 FROM actividades a
-                JOIN clase c ON a.id = c.id_actividad
-                JOIN alumno_clase ac ON c.id = ac.id_clase
+                JOIN resumen_actividad r ON a.id = r.id_actividad
                 GROUP BY a.descripcion
+                HAVING total_alumnos > 0
                 ORDER BY total_alumnos DESC
             """
             cursor.execute(query)
@@ -630,19 +1233,217 @@ async def actividades_mas_alumnos():
         connection.close()
 
 @app.get("/reportes/turnos_mas_clases/")
-async def turnos_mas_clases():
-    connection = get_connection()
+def turnos_mas_clases():
+    connection = get_connection_lectura()
     try:
         with connection.cursor() as cursor:
             query = """
-                SELECT t.hora_inicio, t.hora_fin, COUNT(c.id) AS total_clases
+                SELECT t.hora_inicio, t.hora_fin, SUM(r.total_clases) AS total_clases
                 FROM turnos t
-                JOIN clase c ON t.id = c.id_turno
+                JOIN resumen_turno r ON t.id = r.id_turno
                 GROUP BY t.hora_inicio, t.hora_fin
+                HAVING total_clases > 0
                 ORDER BY total_clases DESC
             """
             cursor.execute(query)
             resultados = cursor.fetchall()
             return [{"hora_inicio": str(r[0]), "hora_fin": str(r[1]), "total_clases": r[2]} for r in resultados]
     finally:
-        connection.close()
\ No newline at end of file
+        connection.close()
+
+
+@app.get("/analitica/")
+def consultar_analitica(
+    desde: date,
+    hasta: date,
+    periodo: str = "dia",
+    dimensiones: Optional[str] = None,
+    id_actividad: Optional[int] = None,
+    ci_instructor: Optional[str] = None,
+    id_turno: Optional[int] = None,
+    id_equipamiento: Optional[int] = None,
+):
+    """
+    Inscripciones e ingresos por periodo (dia, semana, mes, temporada) entre `desde` y `hasta`,
+    abiertos por las `dimensiones` separadas por coma (actividad, instructor, turno, equipamiento).
+    Se responde desde el cubo analitica_diaria (ver analitica.py).
+    """
+    filtros = {d: v for d, v in (("actividad", id_actividad), ("instructor", ci_instructor),
+                                 ("turno", id_turno), ("equipamiento", id_equipamiento)) if v is not None}
+    connection = get_connection_lectura()
+    try:
+        with connection.cursor() as cursor:
+            try:
+                filas = analitica.consultar(
+                    cursor, desde, hasta, periodo,
+                    [d.strip() for d in (dimensiones or "").split(",") if d.strip()], filtros,
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            return RespuestaJSON(a_json(filas))
+    finally:
+        connection.close()
+
+
+######################################################################
+#disponibilidad de instructores y equipamiento
+######################################################################
+
+@app.get("/disponibilidad/turnos/{id_turno}/instructores/")
+def instructores_libres(id_turno: int):
+    """
+    Instructores sin clase en el turno ni en uno que se le superponga. Si el indice de
+    disponibilidad no esta cargado se lee como un resultado compartido (ver EnrutadorLecturas).
+    """
+    connection = get_connection_lectura(compartida=True)
+    try:
+        with connection.cursor() as cursor:
+            libres = disponibilidad.instructores_libres(cursor, id_turno)
+    finally:
+        connection.close()
+    if libres is None:
+        raise HTTPException(status_code=404, detail="Turno no encontrado")
+    return libres
+
+@app.get("/disponibilidad/instructores/{ci}/turnos/")
+def turnos_libres(ci: str):
+    """Turnos en los que el instructor no tiene clase ni una que se superponga."""
+    connection = get_connection_lectura(compartida=True)
+    try:
+        with connection.cursor() as cursor:
+            libres = disponibilidad.turnos_libres(cursor, ci)
+    finally:
+        connection.close()
+    if libres is None:
+        raise HTTPException(status_code=404, detail="Instructor no encontrado")
+    return libres
+
+@app.get("/disponibilidad/turnos/{id_turno}/equipamiento/")
+def equipamiento_libre(id_turno: int, id_actividad: Optional[int] = None):
+    """Unidades libres de cada equipamiento en el turno, leidas de los contadores (ver inventario.py)."""
+    connection = get_connection_lectura()
+    try:
+        with connection.cursor() as cursor:
+            libres = inventario.disponibles(cursor, id_turno, id_actividad)
+    finally:
+        connection.close()
+    if libres is None:
+        raise HTTPException(status_code=404, detail="Turno no encontrado")
+    return libres
+
+
+######################################################################
+#cambios en tiempo real
+######################################################################
+
+@app.get("/eventos/clases/")
+async def eventos_clases(
+    request: Request,
+    id_clase: Optional[int] = None,
+    ci_instructor: Optional[str] = None,
+    id_turno: Optional[int] = None,
+    ultimo_id: Optional[str] = None,
+):
+    """
+    Stream SSE con los cambios de clases e inscripciones (ver eventos.py), filtrado por
+    clase, instructor y/o turno. No consulta la base. Para retomar se usa la cabecera
+    Last-Event-ID que manda EventSource al reconectar, o `ultimo_id`.
+    """
+    return StreamingResponse(
+        bus_eventos.suscribir(
+            {"clase": id_clase, "instructor": ci_instructor, "turno": id_turno},
+            request.headers.get("last-event-id") or ultimo_id,
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+######################################################################
+#bootstrap del frontend
+######################################################################
+
+def _leer_clases(cursor):
+    cursor.execute("SELECT id, ci_instructor, id_actividad, id_turno, dictada FROM clase ORDER BY id")
+    return filas_a_json(MAPEO_CLASE, cursor.fetchall())
+
+#seccion -> (clave del cache, tabla de la que depende, cargador)
+BOOTSTRAP = {
+    "actividades": ("actividades", "actividades", _leer_actividades),
+    "turnos": ("turnos", "turnos", _leer_turnos),
+    "instructores": ("instructores", "instructores", _leer_instructores),
+    "equipamientos": ("equipamiento", "equipamiento", _leer_equipamiento),
+    "clases": ("clases", "clase", _leer_clases),
+}
+
+def acepta_codificacion(cabecera, codificacion):
+    """
+    Si el Accept-Encoding `cabecera` admite `codificacion`: cuenta su q (o el de "*" si no
+    aparece), y q=0 quiere decir que no.
+    """
+    calidades = {}
+    for entrada in (cabecera or "").split(","):
+        nombre, _, parametros = entrada.partition(";")
+        nombre = nombre.strip().lower()
+        if not nombre:
+            continue
+        calidad = 1.0
+        for parametro in parametros.split(";"):
+            clave, _, valor = parametro.partition("=")
+            if clave.strip().lower() == "q":
+                try:
+                    calidad = float(valor)
+                except ValueError:
+                    calidad = 0.0
+        calidades[nombre] = calidad
+    return calidades.get(codificacion, calidades.get("*", 0.0)) > 0
+
+@app.get("/bootstrap/")
+def bootstrap(request: Request, campos: Optional[str] = None):
+    """
+    Todos los datos de referencia del frontend en una respuesta: {"actividades": [...], ...}.
+    `campos` elige las secciones (separadas por coma). Cada seccion sale del cache de
+    catalogos ya codificada y las que faltan se cargan juntas con una sola conexion.
+    El ETag combina las versiones de todas las secciones pedidas; la respuesta va con
+    gzip si el cliente lo acepta.
+    """
+    secciones = [c.strip() for c in campos.split(",") if c.strip()] if campos else list(BOOTSTRAP)
+    invalidas = [c for c in secciones if c not in BOOTSTRAP]
+    if invalidas:
+        raise HTTPException(status_code=400, detail=f"Seccion invalida: {invalidas[0]}, usar {', '.join(BOOTSTRAP)}")
+    secciones = list(dict.fromkeys(secciones))
+    tablas = tuple(BOOTSTRAP[c][1] for c in secciones)
+    gzip_aceptado = acepta_codificacion(request.headers.get("accept-encoding"), "gzip")
+    #el ETag fuerte tiene que cambiar con la codificacion
+    etag = versiones.etag(tablas, *secciones, "gzip" if gzip_aceptado else "identity")
+    cabeceras = {"Vary": "Accept-Encoding"}
+
+    def armar():
+        connection = None
+        partes = []
+        try:
+            for seccion in secciones:
+                clave, _, leer = BOOTSTRAP[seccion]
+
+                def cargar():
+                    nonlocal connection
+                    if connection is None:
+                        connection = get_connection_lectura(compartida=True)
+                    with connection.cursor() as cursor:
+                        return leer(cursor)
+
+                partes.append(a_json(seccion) + b":" + cache_catalogo.obtener(clave, cargar, tablas=(BOOTSTRAP[seccion][1],)))
+        finally:
+            if connection is not None:
+                connection.close()
+        return b"{" + b",".join(partes) + b"}"
+
+    def generar():
+        if not gzip_aceptado:
+            return armar()
+        #la version comprimida tambien queda en el cache, hasta que cambie alguna de sus tablas
+        return cache_catalogo.obtener(f"bootstrap:{etag}", lambda: gzip.compress(armar(), compresslevel=6), tablas=tablas)
+
+    if gzip_aceptado:
+        cabeceras["Content-Encoding"] = "gzip"
+    return respuesta_condicional(request, etag, generar, cabeceras)
@@ -0,0 +1,119 @@
+import unittest
+from unittest import mock
+from fastapi.testclient import TestClient
+import main
+from database import Error
+from inventario import SinStock
+from paginacion import codificar_cursor
+
+
+class CursorFalso:
+    """Cursor que falla con `errores[n]` (un errno) en la sentencia numero n que contiene `falla_en`."""
+
+    lastrowid = 1
+    rowcount = 0
+
+    def __init__(self, conexion):
+        self.conexion = conexion
+
+    def execute(self, query, parametros=None):
+        if self.conexion.falla_en in query and self.conexion.errores:
+            errno = self.conexion.errores.pop(0)
+            if errno is not None:
+                raise Error(msg="falla simulada", errno=errno)
+
+    def fetchall(self):
+        return []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+class ConexionFalsa:
+    def __init__(self, falla_en="", errores=()):
+        self.falla_en = falla_en
+        self.errores = list(errores)
+        self.commits = self.rollbacks = 0
+
+    def cursor(self):
+        return CursorFalso(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        pass
+
+
+class HandlersTest(unittest.TestCase):
+    def setUp(self):
+        for parche in [mock.patch.object(main, "_cargar_indices", lambda: None),
+                       mock.patch.object(main, "tablas_modificadas"),
+                       mock.patch.object(main, "publicar_clases_eliminadas"),
+                       mock.patch.object(main, "clases_afectadas", return_value=[]),
+                       mock.patch.object(main, "disponibilidad"),
+                       mock.patch.object(main.intervalos, "indice_turnos"),
+                       mock.patch.object(main.resumenes, "ajustar_inscripciones"),
+                       mock.patch.object(main.resumenes, "ajustar_clases"),
+                       mock.patch.object(main.analitica, "ajustar"),
+                       mock.patch.object(main.inventario, "ajustar")]:
+            parche.start()
+            self.addCleanup(parche.stop)
+        self.cliente = TestClient(main.app)
+        self.cliente.__enter__()
+        self.addCleanup(self.cliente.__exit__, None, None, None)
+
+    def conexion(self, **kwargs):
+        conexion = ConexionFalsa(**kwargs)
+        parche = mock.patch.object(main, "get_connection", return_value=conexion)
+        parche.start()
+        self.addCleanup(parche.stop)
+        return conexion
+
+    def test_modificar_clase_a_una_que_ya_existe_es_409(self):
+        conexion = self.conexion(falla_en="UPDATE clase", errores=[main.ERROR_CLAVE_DUPLICADA])
+        with mock.patch.object(main, "_clase_modificable", return_value=(1, "10")), \
+                mock.patch.object(main, "cambiar_alumnos", return_value=([], [])):
+            respuesta = self.cliente.put("/clases/5/", json={"ci_instructor": "11"})
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertEqual((conexion.commits, conexion.rollbacks), (0, 1))
+
+    def test_bajas_reintentan_un_deadlock(self):
+        for ruta, tabla in [("/turnos/3", "DELETE FROM turnos"), ("/actividades/3", "DELETE FROM actividades")]:
+            conexion = self.conexion(falla_en=tabla, errores=[1213, None])
+            with mock.patch("database.time.sleep"):
+                self.assertEqual(self.cliente.delete(ruta).status_code, 200)
+            self.assertEqual((conexion.commits, conexion.rollbacks), (1, 1))
+
+    def test_cambiar_costo_sin_stock_es_400(self):
+        conexion = self.conexion()
+        faltantes = [{"id_equipamiento": 1, "id_turno": 2, "stock": 1, "reservados": 2}]
+        main.resumenes.ajustar_inscripciones.side_effect = [None, SinStock(faltantes)]
+        respuesta = self.cliente.put("/actividades/3", json={"descripcion": "Ski", "costo": 10})
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(respuesta.json()["detail"]["faltantes"], faltantes)
+        self.assertEqual(conexion.commits, 0)
+
+    def test_inscribir_con_ci_numericas_informa_los_conflictos(self):
+        self.conexion()
+        with mock.patch.object(main.intervalos, "alumnos_en_conflicto", return_value={"41111111"}):
+            respuesta = self.cliente.post("/inscripciones/", json={
+                "alumnos": [41111111, 42222222, 41111111], "id_actividad": 1, "ci_instructor": 10000001, "id_turno": 2})
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(respuesta.json()["detail"]["alumnos_en_conflicto"], ["41111111"])
+
+    def test_cursor_de_clases_malformado_es_400(self):
+        with mock.patch.object(main, "get_connection_lectura", side_effect=AssertionError("no llega a la base")):
+            for valor in ([3, 120], "3", {"id": 3}):
+                respuesta = self.cliente.get("/clases/", params={"cursor": codificar_cursor(valor)})
+                self.assertEqual(respuesta.status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,260 @@
+"""
+Metricas de la API en formato Prometheus.
+
+Cada peticion lleva en un ContextVar un registro de sus consultas: el cursor medido
+(ver database.ConexionPool.cursor) anota cada sentencia y el middleware de main.py,
+al terminar la peticion, lo vuelca en los histogramas por ruta.
+
+Log de consultas lentas: definir SLOW_QUERY_MS con el umbral en milisegundos.
+
+Ademas se guarda un ejemplo (texto y parametros) de cada sentencia distinta que se
+ejecuto, hasta MUESTRAS_CONSULTAS: `benchmark.py correr --consultas` los vuelca y
+`migraciones.py explicar` les pasa EXPLAIN.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from contextvars import ContextVar
+
+BUCKETS_SEGUNDOS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CANTIDAD = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 1000)
+BUCKETS_FILAS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+MUESTRAS_CONSULTAS = 2000     #sentencias distintas de las que se guarda un ejemplo
+UMBRAL_LENTA = float(os.environ["SLOW_QUERY_MS"]) / 1000 if os.environ.get("SLOW_QUERY_MS") else None
+log_lentas = logging.getLogger("consultas_lentas")
+
+
+class Histograma:
+    def __init__(self, nombre, ayuda, etiquetas, buckets):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.buckets = buckets
+        self._series = {}   #valores de etiquetas -> [conteos por bucket, suma, total]
+        self._lock = threading.Lock()
+
+    def observar(self, valor, *etiquetas):
+        with self._lock:
+            serie = self._series.get(etiquetas)
+            if serie is None:
+                serie = self._series[etiquetas] = [[0] * len(self.buckets), 0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[0][i] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def exponer(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        with self._lock:
+            series = [(k, list(v[0]), v[1], v[2]) for k, v in self._series.items()]
+        for valores, conteos, suma, total in sorted(series):
+            base = ",".join(f'{e}="{_escapar(v)}"' for e, v in zip(self.etiquetas, valores))
+            separador = "," if base else ""
+            for limite, conteo in zip(self.buckets, conteos):
+                lineas.append(f'{self.nombre}_bucket{{{base}{separador}le="{limite}"}} {conteo}')
+            lineas.append(f'{self.nombre}_bucket{{{base}{separador}le="+Inf"}} {total}')
+            lineas.append(f"{self.nombre}_sum{{{base}}} {suma}")
+            lineas.append(f"{self.nombre}_count{{{base}}} {total}")
+        return lineas
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+duracion_peticion = Histograma(
+    "http_peticion_duracion_segundos", "Tiempo total del handler por ruta.",
+    ("metodo", "ruta", "estado"), BUCKETS_SEGUNDOS)
+consultas_por_peticion = Histograma(
+    "db_consultas_por_peticion", "Sentencias SQL ejecutadas por peticion.",
+    ("ruta",), BUCKETS_CANTIDAD)
+tiempo_db_por_peticion = Histograma(
+    "db_tiempo_por_peticion_segundos", "Tiempo en la base (conexion mas sentencias) por peticion.",
+    ("ruta",), BUCKETS_SEGUNDOS)
+filas_por_peticion = Histograma(
+    "db_filas_por_peticion", "Filas leidas de la base por peticion.",
+    ("ruta",), BUCKETS_FILAS)
+duracion_consulta = Histograma(
+    "db_consulta_duracion_segundos", "Tiempo de cada sentencia SQL (texto normalizado).",
+    ("consulta",), BUCKETS_SEGUNDOS)
+duracion_conexion = Histograma(
+    "db_conexion_duracion_segundos", "Tiempo para obtener una conexion del pool.",
+    ("origen",), BUCKETS_SEGUNDOS)
+
+HISTOGRAMAS = [duracion_peticion, consultas_por_peticion, tiempo_db_por_peticion, filas_por_peticion,
+               duracion_consulta, duracion_conexion]
+_colectores = []   #(prefijo, funcion que devuelve {nombre: valor})
+
+
+def registrar_colector(prefijo, funcion):
+    """Agrega a /metrics los valores numericos de `funcion()` como gauges `prefijo_nombre`."""
+    _colectores.append((prefijo, funcion))
+
+
+def exponer():
+    lineas = []
+    for histograma in HISTOGRAMAS:
+        lineas.extend(histograma.exponer())
+    for prefijo, funcion in _colectores:
+        for nombre, valor in funcion().items():
+            if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+                lineas.append(f"# TYPE {prefijo}_{nombre} gauge")
+                lineas.append(f"{prefijo}_{nombre} {valor}")
+    return "\n".join(lineas) + "\n"
+
+
+######################################################################
+#registro por peticion
+######################################################################
+
+class RegistroPeticion:
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.consultas = 0
+        self.filas = 0
+        self.tiempo_db = 0.0
+
+
+_peticion = ContextVar("peticion", default=None)
+
+
+def iniciar_peticion(ruta):
+    registro = RegistroPeticion(ruta)
+    return registro, _peticion.set(registro)
+
+
+def terminar_peticion(token, registro, metodo, ruta, estado, duracion):
+    _peticion.reset(token)
+    duracion_peticion.observar(duracion, metodo, ruta, str(estado))
+    if registro.consultas:
+        consultas_por_peticion.observar(registro.consultas, ruta)
+        tiempo_db_por_peticion.observar(registro.tiempo_db, ruta)
+        filas_por_peticion.observar(registro.filas, ruta)
+
+
+_ESPACIOS = re.compile(r"\s+")
+_ELEMENTO = r"(?:%s|\?|\(\.\.\.\))"
+#listas de dos o mas valores o de tuplas ya colapsadas, y cualquier IN (x)
+_LISTAS = re.compile(rf"\(\s*{_ELEMENTO}(?:\s*,\s*{_ELEMENTO})+\s*\)")
+_IN_UNO = re.compile(rf"\bIN\s*\(\s*{_ELEMENTO}\s*\)", re.IGNORECASE)
+_LITERALES = re.compile(r"'(?:[^'\\]|\\.)*'|\b-?\d+(?:\.\d+)?\b")
+_VALORES_MULTIPLES = re.compile(r"(VALUES\s*\([^)]*\))(?:\s*,\s*\([^)]*\))+", re.IGNORECASE)
+LARGO_ETIQUETA = 300
+
+
+def normalizar(sql):
+    """
+    Texto de la sentencia sin literales ni listas de largo variable, para agrupar. Las
+    listas de tuplas (IN ((%s, %s), ...)) se colapsan de adentro hacia afuera. Si queda
+    mas largo que LARGO_ETIQUETA se corta y se le agrega un hash del texto entero, para
+    que dos sentencias que solo difieren al final no caigan en la misma serie.
+    """
+    sql = _ESPACIOS.sub(" ", sql).strip()
+    sql = _LITERALES.sub("?", sql)
+    sql = _VALORES_MULTIPLES.sub(r"\1, ...", sql)
+    anterior = None
+    while anterior != sql:
+        anterior = sql
+        sql = _IN_UNO.sub("IN (...)", _LISTAS.sub("(...)", sql))
+    if len(sql) > LARGO_ETIQUETA:
+        resumen = hashlib.sha1(sql.encode()).hexdigest()[:10]
+        sql = f"{sql[:LARGO_ETIQUETA - 20]}... #{resumen}"
+    return sql
+
+
+def registrar_conexion(duracion, nueva):
+    duracion_conexion.observar(duracion, "nueva" if nueva else "pool")
+    registro = _peticion.get()
+    if registro is not None:
+        registro.tiempo_db += duracion
+
+
+def registrar_consulta(sql, duracion):
+    normalizada = normalizar(sql)
+    duracion_consulta.observar(duracion, normalizada)
+    registro = _peticion.get()
+    if registro is not None:
+        registro.consultas += 1
+        registro.tiempo_db += duracion
+    if UMBRAL_LENTA is not None and duracion >= UMBRAL_LENTA:
+        ruta = registro.ruta if registro is not None else "-"
+        log_lentas.warning("consulta lenta %.1f ms en %s: %s", duracion * 1000, ruta, normalizada)
+    return normalizada
+
+
+_muestras = {}      #texto normalizado -> (sql, parametros) de la primera ejecucion
+_muestras_lock = threading.Lock()
+
+
+def muestrear(normalizada, sql, parametros):
+    if normalizada in _muestras:
+        return
+    with _muestras_lock:
+        if len(_muestras) < MUESTRAS_CONSULTAS:
+            _muestras.setdefault(normalizada, (sql, parametros))
+
+
+def muestras_consultas():
+    """[(sql, parametros)] con un ejemplo de cada sentencia distinta ejecutada."""
+    with _muestras_lock:
+        return list(_muestras.values())
+
+
+def registrar_filas(cantidad):
+    registro = _peticion.get()
+    if registro is not None:
+        registro.filas += cantidad
+
+
+class CursorMedido:
+    """Cursor que anota tiempo de cada sentencia y filas leidas en las metricas."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, operacion, parametros=None, *args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.execute(operacion, parametros, *args, **kwargs)
+        finally:
+            muestrear(registrar_consulta(operacion, time.perf_counter() - inicio), operacion, parametros)
+
+    def executemany(self, operacion, secuencia, *args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.executemany(operacion, secuencia, *args, **kwargs)
+        finally:
+            registrar_consulta(operacion, time.perf_counter() - inicio)
+
+    def fetchone(self):
+        fila = self._cursor.fetchone()
+        if fila is not None:
+            registrar_filas(1)
+        return fila
+
+    def fetchmany(self, *args, **kwargs):
+        filas = self._cursor.fetchmany(*args, **kwargs)
+        registrar_filas(len(filas))
+        return filas
+
+    def fetchall(self):
+        filas = self._cursor.fetchall()
+        registrar_filas(len(filas))
+        return filas
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
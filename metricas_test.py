@@ -0,0 +1,54 @@
+import unittest
+import resumenes
+from metricas import LARGO_ETIQUETA, normalizar
+
+
+class CursorAnotador:
+    def __init__(self):
+        self.sentencias = []
+
+    def execute(self, query, parametros=None):
+        self.sentencias.append(query)
+
+    def executemany(self, query, parametros):
+        self.sentencias.append(query)
+
+    def fetchall(self):
+        return []
+
+
+class NormalizarTest(unittest.TestCase):
+    def test_listas_de_cualquier_largo(self):
+        for n in (1, 2, 50, 1000):
+            lista = ", ".join(["%s"] * n)
+            self.assertEqual(normalizar(f"SELECT ci FROM alumnos WHERE ci IN ({lista})"),
+                             "SELECT ci FROM alumnos WHERE ci IN (...)")
+
+    def test_listas_de_tuplas(self):
+        esperado = "SELECT x FROM t WHERE (a, b) IN (...)"
+        for n in (1, 2, 1000):
+            lista = ", ".join(["(%s, %s)"] * n)
+            self.assertEqual(normalizar(f"SELECT x FROM t WHERE (a, b) IN ({lista})"), esperado)
+
+    def test_literales(self):
+        self.assertEqual(normalizar("SELECT * FROM t WHERE id = 5 AND n = 'x' AND m IN (1, 2)"),
+                         "SELECT * FROM t WHERE id = ? AND n = ? AND m IN (...)")
+
+    def test_sentencias_largas_no_se_mezclan(self):
+        cursor = CursorAnotador()
+        for condicion in ("ac.id_clase = %s", "c.id_turno = %s", "ac.ci_alumno = %s"):
+            resumenes.ajustar_inscripciones(cursor, condicion, (1,), 1)
+            resumenes.ajustar_clases(cursor, condicion, (1,), 1)
+        etiquetas = {normalizar(s) for s in cursor.sentencias}
+        self.assertEqual(len(etiquetas), len(set(cursor.sentencias)))
+        self.assertTrue(all(len(e) <= LARGO_ETIQUETA for e in etiquetas))
+
+    def test_hash_al_cortar(self):
+        base = "SELECT " + ", ".join(f"columna{i}" for i in range(60)) + " FROM t WHERE "
+        a, b = normalizar(base + "x = %s"), normalizar(base + "y = %s")
+        self.assertNotEqual(a, b)
+        self.assertLessEqual(len(a), LARGO_ETIQUETA)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,375 @@
+"""
+Migraciones versionadas del esquema.
+
+    python migraciones.py estado
+    python migraciones.py subir [version]     aplica las pendientes (hasta `version`)
+    python migraciones.py bajar version       revierte las aplicadas por encima de `version`
+    python migraciones.py explicar consultas.json
+                                              EXPLAIN de las sentencias que ejecutaron los endpoints,
+                                              capturadas con `benchmark.py humo`; termina con 1 si
+                                              alguna recorre una tabla entera
+
+Las versiones aplicadas se guardan en la tabla schema_migraciones.
+"""
+import json
+import re
+import sys
+from database import Error, get_connection
+
+
+class Migracion:
+    def __init__(self, version, nombre, subir, bajar, verificar=None):
+        self.version = version
+        self.nombre = nombre
+        self.subir = subir            #sentencias para aplicar
+        self.bajar = bajar            #sentencias para revertir
+        self.verificar = verificar    #funcion(cursor) -> mensaje de error o None, antes de aplicar
+
+
+def _clases_duplicadas(cursor):
+    cursor.execute("""
+        SELECT ci_instructor, id_actividad, id_turno, COUNT(*)
+        FROM clase
+        GROUP BY ci_instructor, id_actividad, id_turno
+        HAVING COUNT(*) > 1
+    """)
+    duplicadas = cursor.fetchall()
+    if duplicadas:
+        detalle = ", ".join(f"({ci}, {a}, {t}) x{n}" for ci, a, t, n in duplicadas[:20])
+        return f"hay clases repetidas para el mismo instructor, actividad y turno: {detalle}"
+    return None
+
+
+MIGRACIONES = [
+    Migracion(
+        1, "tablas de resumen para los reportes",
+        subir=[
+            """
+            CREATE TABLE IF NOT EXISTS resumen_actividad (
+                id_actividad INT PRIMARY KEY,
+                total_alumnos INT NOT NULL DEFAULT 0,
+                total_ingresos DECIMAL(14,2) NOT NULL DEFAULT 0,
+                total_clases INT NOT NULL DEFAULT 0,
+                FOREIGN KEY (id_actividad) REFERENCES actividades(id) ON DELETE CASCADE
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS resumen_turno (
+                id_turno INT PRIMARY KEY,
+                total_clases INT NOT NULL DEFAULT 0,
+                FOREIGN KEY (id_turno) REFERENCES turnos(id) ON DELETE CASCADE
+            )
+            """,
+            #los totales de lo que ya existe; desde aca los mantienen los endpoints (ver resumenes.py)
+            """
+            INSERT INTO resumen_actividad (id_actividad, total_clases)
+            SELECT id_actividad, COUNT(*) FROM clase GROUP BY id_actividad
+            ON DUPLICATE KEY UPDATE total_clases = VALUES(total_clases)
+            """,
+            """
+            INSERT INTO resumen_actividad (id_actividad, total_alumnos, total_ingresos)
+            SELECT c.id_actividad, COUNT(*), SUM(a.costo + COALESCE(e.costo, 0))
+            FROM alumno_clase ac
+            JOIN clase c ON ac.id_clase = c.id
+            JOIN actividades a ON c.id_actividad = a.id
+            LEFT JOIN equipamiento e ON ac.id_equipamiento = e.id
+            GROUP BY c.id_actividad
+            ON DUPLICATE KEY UPDATE
+                total_alumnos = VALUES(total_alumnos),
+                total_ingresos = VALUES(total_ingresos)
+            """,
+            """
+            INSERT INTO resumen_turno (id_turno, total_clases)
+            SELECT id_turno, COUNT(*) FROM clase GROUP BY id_turno
+            ON DUPLICATE KEY UPDATE total_clases = VALUES(total_clases)
+            """,
+        ],
+        bajar=[
+            "DROP TABLE IF EXISTS resumen_turno",
+            "DROP TABLE IF EXISTS resumen_actividad",
+        ],
+    ),
+    Migracion(
+        2, "indices para las consultas frecuentes",
+        subir=[
+            #busqueda de la clase en /inscripciones/ y una sola clase por instructor, actividad y turno
+            """
+            ALTER TABLE clase
+            ADD UNIQUE KEY uq_clase_instructor_actividad_turno (ci_instructor, id_actividad, id_turno)
+            """,
+            #control de turno de los alumnos: alumno_clase por ci_alumno y de ahi a clase por id
+            "ALTER TABLE alumno_clase ADD INDEX idx_alumno_clase_alumno (ci_alumno, id_clase)",
+            #filtro por prefijo de nombre en GET /alumnos/
+            "ALTER TABLE alumnos ADD INDEX idx_alumnos_nombre (nombre)",
+        ],
+        bajar=[
+            "ALTER TABLE alumnos DROP INDEX idx_alumnos_nombre",
+            #las claves foraneas necesitan un indice que empiece por su columna
+            """
+            ALTER TABLE alumno_clase
+            ADD INDEX idx_alumno_clase_ci (ci_alumno),
+            DROP INDEX idx_alumno_clase_alumno
+            """,
+            """
+            ALTER TABLE clase
+            ADD INDEX idx_clase_instructor (ci_instructor),
+            DROP INDEX uq_clase_instructor_actividad_turno
+            """,
+        ],
+        verificar=_clases_duplicadas,
+    ),
+    Migracion(
+        3, "fecha de inscripcion y cubo de analitica",
+        subir=[
+            #las inscripciones que ya existian quedan con la fecha de la migracion
+            """
+            ALTER TABLE alumno_clase
+            ADD COLUMN fecha_inscripcion DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS analitica_diaria (
+                fecha DATE NOT NULL,
+                id_actividad INT NOT NULL,
+                ci_instructor VARCHAR(10) NOT NULL,
+                id_turno INT NOT NULL,
+                id_equipamiento INT NOT NULL DEFAULT 0,
+                inscripciones INT NOT NULL DEFAULT 0,
+                ingresos DECIMAL(14,2) NOT NULL DEFAULT 0,
+                ingresos_equipamiento DECIMAL(14,2) NOT NULL DEFAULT 0,
+                PRIMARY KEY (fecha, id_actividad, ci_instructor, id_turno, id_equipamiento)
+            )
+            """,
+            """
+            INSERT INTO analitica_diaria
+                (fecha, id_actividad, ci_instructor, id_turno, id_equipamiento,
+                 inscripciones, ingresos, ingresos_equipamiento)
+            SELECT DATE(ac.fecha_inscripcion), c.id_actividad, c.ci_instructor, c.id_turno,
+                   COALESCE(ac.id_equipamiento, 0), COUNT(*),
+                   SUM(a.costo + COALESCE(e.costo, 0)), SUM(COALESCE(e.costo, 0))
+            FROM alumno_clase ac
+            JOIN clase c ON ac.id_clase = c.id
+            JOIN actividades a ON c.id_actividad = a.id
+            LEFT JOIN equipamiento e ON ac.id_equipamiento = e.id
+            GROUP BY 1, 2, 3, 4, 5
+            """,
+        ],
+        bajar=[
+            "DROP TABLE IF EXISTS analitica_diaria",
+            "ALTER TABLE alumno_clase DROP COLUMN fecha_inscripcion",
+        ],
+    ),
+    Migracion(
+        4, "stock de equipamiento y reservas por turno",
+        subir=[
+            #NULL = sin limite, como hasta ahora
+            "ALTER TABLE equipamiento ADD COLUMN stock INT NULL",
+            """
+            CREATE TABLE IF NOT EXISTS reservas_equipamiento (
+                id_equipamiento INT NOT NULL,
+                id_turno INT NOT NULL,
+                reservados INT NOT NULL DEFAULT 0,
+                PRIMARY KEY (id_equipamiento, id_turno),
+                FOREIGN KEY (id_equipamiento) REFERENCES equipamiento(id) ON DELETE CASCADE,
+                FOREIGN KEY (id_turno) REFERENCES turnos(id) ON DELETE CASCADE
+            )
+            """,
+            """
+            INSERT INTO reservas_equipamiento (id_equipamiento, id_turno, reservados)
+            SELECT ac.id_equipamiento, c.id_turno, COUNT(*)
+            FROM alumno_clase ac
+            JOIN clase c ON ac.id_clase = c.id
+            WHERE ac.id_equipamiento IS NOT NULL
+            GROUP BY ac.id_equipamiento, c.id_turno
+            """,
+        ],
+        bajar=[
+            "DROP TABLE IF EXISTS reservas_equipamiento",
+            "ALTER TABLE equipamiento DROP COLUMN stock",
+        ],
+    ),
+    Migracion(
+        5, "indices para buscar por prefijo sin el indice en memoria",
+        subir=[
+            #busqueda.buscar_en_base: LIKE 'prefijo%' sobre cada campo (nombre y ci ya tienen indice)
+            "ALTER TABLE alumnos ADD INDEX idx_alumnos_apellido (apellido), ADD INDEX idx_alumnos_correo (correo)",
+            """
+            ALTER TABLE instructores
+            ADD INDEX idx_instructores_nombre (nombre),
+            ADD INDEX idx_instructores_apellido (apellido)
+            """,
+        ],
+        bajar=[
+            "ALTER TABLE instructores DROP INDEX idx_instructores_apellido, DROP INDEX idx_instructores_nombre",
+            "ALTER TABLE alumnos DROP INDEX idx_alumnos_correo, DROP INDEX idx_alumnos_apellido",
+        ],
+    ),
+]
+
+
+######################################################################
+#aplicar y revertir
+######################################################################
+
+def _crear_tabla_versiones(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migraciones (
+            version INT PRIMARY KEY,
+            nombre VARCHAR(255) NOT NULL,
+            aplicada TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def aplicadas(cursor):
+    _crear_tabla_versiones(cursor)
+    cursor.execute("SELECT version FROM schema_migraciones")
+    return {r[0] for r in cursor.fetchall()}
+
+
+def subir(cursor, hasta=None):
+    """Aplica en orden las migraciones pendientes. Devuelve las versiones aplicadas."""
+    hechas = aplicadas(cursor)
+    nuevas = []
+    for migracion in MIGRACIONES:
+        if migracion.version in hechas or (hasta is not None and migracion.version > hasta):
+            continue
+        if migracion.verificar:
+            error = migracion.verificar(cursor)
+            if error:
+                raise RuntimeError(f"migracion {migracion.version} ({migracion.nombre}): {error}")
+        #las sentencias DDL de MySQL hacen commit implicito: se registra cada migracion al terminarla
+        for sentencia in migracion.subir:
+            cursor.execute(sentencia)
+        cursor.execute("INSERT INTO schema_migraciones (version, nombre) VALUES (%s, %s)",
+                       (migracion.version, migracion.nombre))
+        cursor.execute("COMMIT")
+        nuevas.append(migracion.version)
+    return nuevas
+
+
+def bajar(cursor, hasta):
+    """Revierte, de la mas nueva a la mas vieja, las migraciones por encima de `hasta`."""
+    hechas = aplicadas(cursor)
+    revertidas = []
+    for migracion in reversed(MIGRACIONES):
+        if migracion.version not in hechas or migracion.version <= hasta:
+            continue
+        for sentencia in migracion.bajar:
+            cursor.execute(sentencia)
+        cursor.execute("DELETE FROM schema_migraciones WHERE version = %s", (migracion.version,))
+        cursor.execute("COMMIT")
+        revertidas.append(migracion.version)
+    return revertidas
+
+
+######################################################################
+#EXPLAIN de las consultas de los endpoints
+######################################################################
+
+#tablas chicas por diseño (catalogos y resumenes): recorrerlas enteras esta bien
+TABLAS_CHICAS = {"actividades", "turnos", "instructores", "equipamiento", "resumen_actividad", "resumen_turno",
+                 "reservas_equipamiento"}
+ALIAS = {"ac": "alumno_clase", "c": "clase", "t": "turnos", "a": "actividades", "e": "equipamiento",
+         "r": "resumen_actividad", "re": "reservas_equipamiento"}
+
+
+#recorridos que EXPLAIN marca: ALL lee la tabla y index lee un indice entero
+RECORRIDOS = {"ALL", "index"}
+_EXPLICABLE = re.compile(r"^\s*(SELECT|UPDATE|DELETE|INSERT\b.*\bSELECT)\b", re.IGNORECASE | re.DOTALL)
+_WHERE = re.compile(r"\bWHERE\b", re.IGNORECASE)
+
+
+def filtrar_consultas(muestras):
+    """
+    (nombre, sql, parametros) de las muestras [(sql, parametros)] que vale la pena explicar.
+    Las que no filtran (sin WHERE: cargas de los indices en memoria, listados de catalogos)
+    leen todo a proposito y no se miran.
+    """
+    return [
+        (" ".join(sql.split())[:80], sql, tuple(parametros or ()))
+        for sql, parametros in muestras
+        if _EXPLICABLE.match(sql) and _WHERE.search(sql)
+    ]
+
+
+def consultas_capturadas(ruta):
+    """Las sentencias que guardo `benchmark.py humo` (o `correr --consultas`), ver filtrar_consultas."""
+    with open(ruta) as archivo:
+        return filtrar_consultas(json.load(archivo))
+
+
+def recorridos(nombre, planes):
+    """[(nombre, tabla, plan)] de las filas de EXPLAIN (dicts) que recorren una tabla grande entera."""
+    problemas = []
+    for plan in planes:
+        tabla = ALIAS.get(plan.get("table"), plan.get("table"))
+        if plan.get("type") in RECORRIDOS and tabla not in TABLAS_CHICAS:
+            problemas.append((nombre, tabla, plan))
+    return problemas
+
+
+def explicar(cursor, consultas):
+    """
+    Devuelve [(nombre, tabla, plan)] de las consultas que recorren entera una tabla grande
+    (o un indice entero), y [(nombre, error)] de las que no se pudieron explicar.
+    """
+    problemas, errores = [], []
+    for nombre, sql, parametros in consultas:
+        try:
+            cursor.execute("EXPLAIN " + sql, parametros)
+        except Error as e:
+            errores.append((nombre, str(e)))
+            continue
+        columnas = [d[0] for d in cursor.description]
+        problemas += recorridos(nombre, [dict(zip(columnas, fila)) for fila in cursor.fetchall()])
+    return problemas, errores
+
+
+def main(argumentos):
+    if not argumentos or argumentos[0] not in ("estado", "subir", "bajar", "explicar"):
+        print(__doc__)
+        return 2
+    comando = argumentos[0]
+
+    connection = get_connection()
+    try:
+        with connection.cursor() as cursor:
+            if comando == "estado":
+                hechas = aplicadas(cursor)
+                for migracion in MIGRACIONES:
+                    marca = "x" if migracion.version in hechas else " "
+                    print(f"[{marca}] {migracion.version:04d} {migracion.nombre}")
+                return 0
+
+            if comando == "subir":
+                hasta = int(argumentos[1]) if len(argumentos) > 1 else None
+                nuevas = subir(cursor, hasta)
+                print(f"aplicadas: {nuevas or 'ninguna'}")
+                return 0
+
+            if comando == "bajar":
+                if len(argumentos) < 2:
+                    print("indicar la version a la que se quiere volver")
+                    return 2
+                revertidas = bajar(cursor, int(argumentos[1]))
+                print(f"revertidas: {revertidas or 'ninguna'}")
+                return 0
+
+            if len(argumentos) < 2:
+                print("indicar el archivo de consultas de `benchmark.py humo`")
+                return 2
+            consultas = consultas_capturadas(argumentos[1])
+            problemas, errores = explicar(cursor, consultas)
+            for nombre, error in errores:
+                print(f"no se pudo explicar '{nombre}': {error}")
+            for nombre, tabla, plan in problemas:
+                print(f"RECORRIDO COMPLETO ({plan.get('type')}) en '{nombre}': tabla {tabla}, "
+                      f"filas estimadas {plan.get('rows')}")
+            print(f"{len(consultas)} consultas, {len(problemas)} recorren una tabla o un indice entero")
+            return 1 if problemas else 0
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,84 @@
+import os
+import unittest
+from unittest import mock
+import database
+import metricas
+import migraciones
+
+#base descartable para las pruebas que necesitan MySQL: se borra y se vuelve a sembrar
+BASE_PRUEBAS = os.environ.get("DB_PRUEBAS")
+
+
+class FiltrarConsultasTest(unittest.TestCase):
+    def test_solo_las_que_filtran(self):
+        muestras = [
+            ("SELECT ci FROM alumnos", None),
+            ("SELECT ci FROM alumnos WHERE ci = %s", ["1"]),
+            ("INSERT INTO alumnos (ci) VALUES (%s)", ["1"]),
+            ("INSERT INTO resumen_turno (id_turno, total_clases) SELECT id_turno, COUNT(*) FROM clase\n"
+             "WHERE id_turno = %s GROUP BY id_turno", [3]),
+            ("  update clase set dictada = 1 where id = %s", [7]),
+            ("DELETE FROM alumno_clase WHERE id_clase = %s", [7]),
+        ]
+        consultas = migraciones.filtrar_consultas(muestras)
+        self.assertEqual([sql for _, sql, _ in consultas], [s for s, _ in muestras[1:2] + muestras[3:]])
+        self.assertEqual(consultas[0][2], ("1",))
+
+    def test_nombre_en_una_linea(self):
+        [(nombre, _, parametros)] = migraciones.filtrar_consultas([("SELECT id\n    FROM clase\n  WHERE id = %s", None)])
+        self.assertEqual(nombre, "SELECT id FROM clase WHERE id = %s")
+        self.assertEqual(parametros, ())
+
+
+class RecorridosTest(unittest.TestCase):
+    def test_tabla_grande_entera(self):
+        planes = [{"table": "ac", "type": "ALL"}, {"table": "c", "type": "eq_ref"}]
+        [(nombre, tabla, plan)] = migraciones.recorridos("q", planes)
+        self.assertEqual((nombre, tabla, plan), ("q", "alumno_clase", planes[0]))
+
+    def test_indice_entero(self):
+        self.assertEqual(len(migraciones.recorridos("q", [{"table": "alumnos", "type": "index"}])), 1)
+
+    def test_tablas_chicas_y_accesos_por_indice(self):
+        planes = [{"table": "t", "type": "ALL"}, {"table": "resumen_actividad", "type": "index"},
+                  {"table": "alumnos", "type": "ref"}, {"table": "clase", "type": "range"},
+                  {"table": None, "type": None}]
+        self.assertEqual(migraciones.recorridos("q", planes), [])
+
+
+@unittest.skipUnless(BASE_PRUEBAS, "definir DB_PRUEBAS con una base descartable para usar MySQL")
+class ExplicarEndpointsTest(unittest.TestCase):
+    """EXPLAIN de las sentencias que ejecutan los endpoints en un recorrido de humo."""
+
+    def setUp(self):
+        self.base_anterior = database.DB_CONFIG["database"]
+        self.addCleanup(database.DB_CONFIG.__setitem__, "database", self.base_anterior)
+
+    def test_ninguna_recorre_una_tabla_grande(self):
+        import benchmark
+        from fastapi.testclient import TestClient
+        from main import app
+
+        with mock.patch("builtins.print"):
+            sembrado = benchmark.main(["sembrar", "--base", BASE_PRUEBAS, "--alumnos", "2000", "--instructores", "20",
+                                       "--clases", "100", "--inscripciones", "3000"])
+        self.assertEqual(sembrado, 0)
+        database.DB_CONFIG["database"] = BASE_PRUEBAS
+        with TestClient(app) as cliente:
+            fallas = benchmark.recorrido_humo(cliente, benchmark._datos_semilla())
+        self.assertEqual(fallas, [])
+
+        consultas = migraciones.filtrar_consultas(metricas.muestras_consultas())
+        self.assertGreater(len(consultas), 20)
+        connection = database.get_connection()
+        try:
+            with connection.cursor() as cursor:
+                problemas, errores = migraciones.explicar(cursor, consultas)
+        finally:
+            connection.close()
+        self.assertEqual(errores, [])
+        self.assertEqual([(nombre, tabla) for nombre, tabla, _ in problemas], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
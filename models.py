@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String, Float, Time, Date, ForeignKey
+from sqlalchemy import Boolean, Column, Integer, String, Float, Numeric, Time, Date, DateTime, ForeignKey, func
 from database import Base
 
 #tabla de login
@@ -25,6 +25,7 @@ class Equipamiento(Base):
     id_actividad = Column(Integer, ForeignKey('actividades.id',ondelete="CASCADE"), nullable=False)
     descripcion = Column(String(255), nullable=False)
     costo = Column(Float(10,2), nullable=False)
+    stock = Column(Integer, nullable=True)  #unidades para alquilar por turno; NULL = sin limite
 
 #tabla de instructores
 class Instructor(Base):
@@ -70,3 +71,40 @@ class AlumnoClase(Base):
     i_clase = Column(Integer, ForeignKey('clase.id',ondelete="CASCADE"), primary_key=True)
     ci_alumno = Column(String(10), ForeignKey("alumnos.ci", ondelete="CASCADE"), primary_key=True)
     id_equipamiento = Column(Integer, ForeignKey("equipamiento.id"), nullable=True)
+    fecha_inscripcion = Column(DateTime, nullable=False, server_default=func.now())
+
+#tablas de resumen para los reportes (ver resumenes.py)
+class ResumenActividad(Base):
+    __tablename__ = "resumen_actividad"
+    
+    id_actividad = Column(Integer, ForeignKey("actividades.id", ondelete="CASCADE"), primary_key=True)
+    total_alumnos = Column(Integer, nullable=False, default=0)
+    total_ingresos = Column(Numeric(14,2), nullable=False, default=0)
+    total_clases = Column(Integer, nullable=False, default=0)
+
+class ResumenTurno(Base):
+    __tablename__ = "resumen_turno"
+    
+    id_turno = Column(Integer, ForeignKey("turnos.id", ondelete="CASCADE"), primary_key=True)
+    total_clases = Column(Integer, nullable=False, default=0)
+
+#cubo de analitica por dia (ver analitica.py); id_equipamiento 0 = sin alquiler
+class AnaliticaDiaria(Base):
+    __tablename__ = "analitica_diaria"
+    
+    fecha = Column(Date, primary_key=True)
+    id_actividad = Column(Integer, primary_key=True)
+    ci_instructor = Column(String(10), primary_key=True)
+    id_turno = Column(Integer, primary_key=True)
+    id_equipamiento = Column(Integer, primary_key=True, default=0)
+    inscripciones = Column(Integer, nullable=False, default=0)
+    ingresos = Column(Numeric(14,2), nullable=False, default=0)
+    ingresos_equipamiento = Column(Numeric(14,2), nullable=False, default=0)
+
+#unidades de equipamiento alquiladas por turno (ver inventario.py)
+class ReservaEquipamiento(Base):
+    __tablename__ = "reservas_equipamiento"
+    
+    id_equipamiento = Column(Integer, ForeignKey("equipamiento.id", ondelete="CASCADE"), primary_key=True)
+    id_turno = Column(Integer, ForeignKey("turnos.id", ondelete="CASCADE"), primary_key=True)
+    reservados = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,53 @@
+import base64
+import json
+from fastapi import HTTPException
+
+#tamaños de pagina
+LIMITE_POR_DEFECTO = 100
+LIMITE_MAXIMO = 500
+
+
+def codificar_cursor(ultimo):
+    """Token opaco con la clave de la ultima fila devuelta."""
+    crudo = json.dumps({"k": ultimo}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip("=")
+
+
+def decodificar_cursor(token, tipo):
+    """
+    Clave de la ultima fila de la pagina anterior, o None sin token. Responde 400 si el
+    token no se puede leer o la clave no es de `tipo` (el de la columna por la que se pagina):
+    un token armado a mano no llega a la consulta.
+    """
+    if not token:
+        return None
+    try:
+        relleno = "=" * (-len(token) % 4)
+        clave = json.loads(base64.urlsafe_b64decode(token + relleno))["k"]
+    except (ValueError, KeyError, TypeError):
+        clave = None
+    #bool es subclase de int
+    if not isinstance(clave, tipo) or isinstance(clave, bool):
+        raise HTTPException(status_code=400, detail="Cursor de paginacion invalido")
+    return clave
+
+
+def acotar_limite(limite):
+    return max(1, min(limite, LIMITE_MAXIMO))
+
+
+def armar_pagina(items, limite, clave):
+    """
+    `items` se consulto con LIMIT limite + 1: si sobra una fila hay otra pagina
+    y el cursor apunta a la ultima fila que se devuelve.
+    """
+    siguiente = None
+    if len(items) > limite:
+        items = items[:limite]
+        siguiente = codificar_cursor(items[-1][clave])
+    return {"items": items, "cursor_siguiente": siguiente}
+
+
+def escapar_like(prefijo):
+    """Escapa los comodines de LIKE para buscar por prefijo literal."""
+    return prefijo.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
@@ -0,0 +1,38 @@
+import unittest
+from fastapi import HTTPException
+from paginacion import LIMITE_MAXIMO, acotar_limite, armar_pagina, codificar_cursor, decodificar_cursor, escapar_like
+
+
+class PaginacionTest(unittest.TestCase):
+    def test_cursor_ida_y_vuelta(self):
+        for clave, tipo in [("40000001", str), (17, int)]:
+            token = codificar_cursor(clave)
+            self.assertNotIn("=", token)
+            self.assertEqual(decodificar_cursor(token, tipo), clave)
+        self.assertIsNone(decodificar_cursor(None, int))
+        self.assertIsNone(decodificar_cursor("", int))
+
+    def test_cursor_invalido_es_400(self):
+        tokens = ["no es base64!", codificar_cursor(1)[:-2], "e30",     #e30 = {}
+                  codificar_cursor([3, 120]), codificar_cursor("17"), codificar_cursor(True), codificar_cursor(None)]
+        for token in tokens:
+            with self.assertRaises(HTTPException) as contexto:
+                decodificar_cursor(token, int)
+            self.assertEqual(contexto.exception.status_code, 400)
+        with self.assertRaises(HTTPException):
+            decodificar_cursor(codificar_cursor(40000001), str)
+
+    def test_armar_pagina(self):
+        items = [{"ci": str(i)} for i in range(4)]
+        pagina = armar_pagina(items, 3, "ci")
+        self.assertEqual(pagina["items"], items[:3])
+        self.assertEqual(decodificar_cursor(pagina["cursor_siguiente"], str), "2")
+        self.assertIsNone(armar_pagina(items[:3], 3, "ci")["cursor_siguiente"])
+
+    def test_limites_y_like(self):
+        self.assertEqual((acotar_limite(0), acotar_limite(50), acotar_limite(10 ** 6)), (1, 50, LIMITE_MAXIMO))
+        self.assertEqual(escapar_like("a_b%c\\"), "a\\_b\\%c\\\\%")
+
+
+if __name__ == "__main__":
+    unittest.main()
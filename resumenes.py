@@ -0,0 +1,175 @@
+"""
+Tablas de resumen para los reportes.
+
+resumen_actividad y resumen_turno guardan los totales ya agregados y se actualizan
+dentro de las mismas transacciones que escriben `clase` y `alumno_clase`:
+antes de borrar o modificar filas se resta su aporte (signo -1) y despues de
+insertarlas se suma (signo +1).
+
+Las tablas las crea y las llena con lo que ya existe la migracion 1 (python migraciones.py subir).
+
+Uso: python resumenes.py verificar | reconstruir
+"""
+import sys
+from decimal import Decimal
+import analitica
+import inventario
+from database import get_connection
+
+#aporte de cada inscripcion: costo de la actividad mas el equipamiento alquilado
+INGRESO_INSCRIPCION = "a.costo + COALESCE(e.costo, 0)"
+
+
+def _signo(signo):
+    if signo not in (1, -1):
+        raise ValueError("signo debe ser 1 o -1")
+    return signo
+
+
+def ajustar_inscripciones(cursor, condicion, parametros, signo):
+    """
+    Suma (o resta) a resumen_actividad, al cubo de analitica y a las reservas de
+    equipamiento las inscripciones que cumplen `condicion`. La condicion puede usar los
+    alias ac (alumno_clase) y c (clase). Al sumar puede lanzar inventario.SinStock.
+    """
+    signo = _signo(signo)
+    cursor.execute(f"""
+        INSERT INTO resumen_actividad (id_actividad, total_alumnos, total_ingresos)
+        SELECT c.id_actividad, {signo} * COUNT(*), {signo} * SUM({INGRESO_INSCRIPCION})
+        FROM alumno_clase ac
+        JOIN clase c ON ac.id_clase = c.id
+        JOIN actividades a ON c.id_actividad = a.id
+        LEFT JOIN equipamiento e ON ac.id_equipamiento = e.id
+        WHERE {condicion}
+        GROUP BY c.id_actividad
+        ON DUPLICATE KEY UPDATE
+            total_alumnos = total_alumnos + VALUES(total_alumnos),
+            total_ingresos = total_ingresos + VALUES(total_ingresos)
+    """, parametros)
+    analitica.ajustar(cursor, condicion, parametros, signo)
+    inventario.ajustar(cursor, condicion, parametros, signo)
+
+
+def ajustar_clases(cursor, condicion, parametros, signo):
+    """
+    Suma (o resta) las clases que cumplen `condicion` (alias c) en los totales
+    por actividad y por turno.
+    """
+    signo = _signo(signo)
+    cursor.execute(f"""
+        INSERT INTO resumen_actividad (id_actividad, total_clases)
+        SELECT c.id_actividad, {signo} * COUNT(*)
+        FROM clase c
+        WHERE {condicion}
+        GROUP BY c.id_actividad
+        ON DUPLICATE KEY UPDATE total_clases = total_clases + VALUES(total_clases)
+    """, parametros)
+    cursor.execute(f"""
+        INSERT INTO resumen_turno (id_turno, total_clases)
+        SELECT c.id_turno, {signo} * COUNT(*)
+        FROM clase c
+        WHERE {condicion}
+        GROUP BY c.id_turno
+        ON DUPLICATE KEY UPDATE total_clases = total_clases + VALUES(total_clases)
+    """, parametros)
+
+
+######################################################################
+#reconstruccion y verificacion
+######################################################################
+
+def _calcular(cursor):
+    """Totales calculados desde cero a partir de clase y alumno_clase."""
+    actividades = {}
+    cursor.execute("SELECT id FROM actividades")
+    for (id_actividad,) in cursor.fetchall():
+        actividades[id_actividad] = [0, Decimal("0.00"), 0]
+
+    cursor.execute(f"""
+        SELECT c.id_actividad, COUNT(*), SUM({INGRESO_INSCRIPCION})
+        FROM alumno_clase ac
+        JOIN clase c ON ac.id_clase = c.id
+        JOIN actividades a ON c.id_actividad = a.id
+        LEFT JOIN equipamiento e ON ac.id_equipamiento = e.id
+        GROUP BY c.id_actividad
+    """)
+    for id_actividad, alumnos, ingresos in cursor.fetchall():
+        actividades[id_actividad][0] = alumnos
+        actividades[id_actividad][1] = Decimal(ingresos).quantize(Decimal("0.01"))
+
+    cursor.execute("SELECT id_actividad, COUNT(*) FROM clase GROUP BY id_actividad")
+    for id_actividad, clases in cursor.fetchall():
+        actividades[id_actividad][2] = clases
+
+    turnos = {}
+    cursor.execute("SELECT t.id, COUNT(c.id) FROM turnos t LEFT JOIN clase c ON c.id_turno = t.id GROUP BY t.id")
+    for id_turno, clases in cursor.fetchall():
+        turnos[id_turno] = clases
+    return actividades, turnos
+
+
+def verificar(cursor):
+    """Devuelve la lista de diferencias entre las tablas de resumen y el calculo desde cero."""
+    actividades, turnos = _calcular(cursor)
+    diferencias = []
+
+    cursor.execute("SELECT id_actividad, total_alumnos, total_ingresos, total_clases FROM resumen_actividad")
+    guardadas = {r[0]: [r[1], Decimal(r[2]), r[3]] for r in cursor.fetchall()}
+    for id_actividad in sorted(set(actividades) | set(guardadas)):
+        esperado = actividades.get(id_actividad, [0, Decimal("0.00"), 0])
+        actual = guardadas.get(id_actividad, [0, Decimal("0.00"), 0])
+        if esperado != actual:
+            diferencias.append({"tabla": "resumen_actividad", "id": id_actividad,
+                                "esperado": esperado, "actual": actual})
+
+    cursor.execute("SELECT id_turno, total_clases FROM resumen_turno")
+    guardados = dict(cursor.fetchall())
+    for id_turno in sorted(set(turnos) | set(guardados)):
+        if turnos.get(id_turno, 0) != guardados.get(id_turno, 0):
+            diferencias.append({"tabla": "resumen_turno", "id": id_turno,
+                                "esperado": turnos.get(id_turno, 0), "actual": guardados.get(id_turno, 0)})
+    return diferencias
+
+
+def reconstruir(cursor):
+    """Recalcula las tablas de resumen desde cero (no hace commit)."""
+    actividades, turnos = _calcular(cursor)
+    cursor.execute("DELETE FROM resumen_actividad")
+    cursor.execute("DELETE FROM resumen_turno")
+    if actividades:
+        cursor.executemany(
+            "INSERT INTO resumen_actividad (id_actividad, total_alumnos, total_ingresos, total_clases) VALUES (%s, %s, %s, %s)",
+            [(id_actividad, *totales) for id_actividad, totales in actividades.items()],
+        )
+    if turnos:
+        cursor.executemany(
+            "INSERT INTO resumen_turno (id_turno, total_clases) VALUES (%s, %s)",
+            list(turnos.items()),
+        )
+
+
+def main(argumentos):
+    if len(argumentos) != 1 or argumentos[0] not in ("verificar", "reconstruir"):
+        print(__doc__.strip().splitlines()[-1])
+        return 2
+
+    connection = get_connection()
+    try:
+        with connection.cursor() as cursor:
+            diferencias = verificar(cursor)
+            for d in diferencias:
+                print(f"{d['tabla']} id={d['id']}: esperado {d['esperado']}, actual {d['actual']}")
+            print(f"{len(diferencias)} diferencias encontradas")
+
+            if argumentos[0] == "reconstruir":
+                reconstruir(cursor)
+                connection.commit()
+                print("tablas de resumen reconstruidas")
+                return 0
+            return 1 if diferencias else 0
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import time, date
-from typing import Optional
+from typing import List, Optional
 
 ####login####
 class Login(BaseModel):
@@ -22,6 +22,10 @@ class EquipamientoCreate(BaseModel):
     id_actividad: int
     descripcion: str
     costo: float
+    stock: Optional[int] = None     #unidades por turno, None = sin limite
+
+class EquipamientoStock(BaseModel):
+    stock: Optional[int] = None
     
 class EquipamientoUpdate(BaseModel):
     description: Optional[str] = None
@@ -84,4 +88,16 @@ class ClaseUpdate(BaseModel):
 class AlumnoClase(BaseModel):
     id_clase: int
     ci_alumno: str
-    id_equipamiento: Optional[int] = None
\ No newline at end of file
+    id_equipamiento: Optional[int] = None
+
+
+####Asignacion####
+
+class PreferenciaAlumno(BaseModel):
+    ci: str
+    preferencias: List[int]     #id de actividades, la primera es la preferida
+
+class PedidoAsignacion(BaseModel):
+    alumnos: List[PreferenciaAlumno]
+    capacidad: int              #alumnos por clase
+    dry_run: bool = True
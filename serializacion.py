@@ -0,0 +1,54 @@
+"""
+Serializacion rapida de los listados.
+
+Las filas de la base se pasan a dict con funciones armadas una sola vez por listado
+y se codifican con orjson, que resuelve fechas de forma nativa. Los decimales y los
+TIME de MySQL (timedelta) se convierten en `_por_defecto` igual que lo hacia FastAPI
+(float y segundos), para que las respuestas no cambien.
+"""
+from datetime import timedelta
+from decimal import Decimal
+import orjson
+from fastapi.responses import Response
+
+
+def _por_defecto(valor):
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, timedelta):
+        return valor.total_seconds()
+    if isinstance(valor, (bytes, bytearray)):
+        return valor.decode()
+    raise TypeError(f"tipo no serializable: {type(valor).__name__}")
+
+
+def a_json(valor):
+    return orjson.dumps(valor, default=_por_defecto)
+
+
+def mapeador(*claves):
+    """
+    Funcion fila -> dict para las columnas `claves`, en el mismo orden que el SELECT.
+    Un literal de dict armado con eval era algo mas rapido (~0,5 us por fila), pero esto no
+    genera codigo y la diferencia se pierde frente a codificar con orjson.
+    """
+    claves = tuple(claves)
+
+    def mapear(fila):
+        return dict(zip(claves, fila))
+    return mapear
+
+
+def filas_a_json(mapeo, filas):
+    return a_json([mapeo(f) for f in filas])
+
+
+class RespuestaJSON(Response):
+    """Respuesta JSON que acepta bytes ya codificados o cualquier valor para orjson."""
+
+    media_type = "application/json"
+
+    def render(self, content):
+        if isinstance(content, (bytes, bytearray)):
+            return bytes(content)
+        return a_json(content)
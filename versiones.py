@@ -0,0 +1,70 @@
+"""
+Versiones por tabla para los GET condicionales.
+
+Cada escritura incrementa la version de las tablas que modifica y los listados
+arman su ETag con esas versiones, asi un `If-None-Match` se responde con 304 sin
+consultar la base. La epoca de arranque va en el ETag para que un reinicio (que
+vuelve los contadores a cero) no repita etiquetas viejas.
+Igual que el cache de catalogos, supone un solo proceso: con varios workers cada
+uno tendria sus propios contadores.
+"""
+import hashlib
+import threading
+import time
+
+
+class VersionesTablas:
+    def __init__(self):
+        self._epoca = format(time.time_ns(), "x")
+        self._versiones = {}    #tabla -> cantidad de escrituras
+        self._lock = threading.Lock()
+        #estadisticas
+        self._no_modificadas = 0
+        self._completas = 0
+
+    def incrementar(self, *tablas):
+        with self._lock:
+            for tabla in tablas:
+                self._versiones[tabla] = self._versiones.get(tabla, 0) + 1
+
+    def etag(self, tablas, *variantes):
+        """
+        ETag fuerte para un listado que depende de `tablas`. `variantes` distingue
+        respuestas distintas de la misma version (filtros, paginas).
+        Hay que calcularlo antes de consultar: si una escritura entra en el medio,
+        el cliente queda con la etiqueta vieja y vuelve a pedir, nunca al reves.
+        """
+        with self._lock:
+            versiones = ".".join(str(self._versiones.get(t, 0)) for t in tablas)
+        etag = f"{self._epoca}-{versiones}"
+        if variantes:
+            etag += "-" + hashlib.blake2b(repr(variantes).encode(), digest_size=8).hexdigest()
+        return f'"{etag}"'
+
+    def coincide(self, if_none_match, etag):
+        """Compara contra la cabecera If-None-Match (lista de etiquetas o `*`)."""
+        if not if_none_match:
+            coincide = False
+        elif if_none_match.strip() == "*":
+            coincide = True
+        else:
+            #en If-None-Match la comparacion es debil: W/"x" vale lo mismo que "x"
+            etiquetas = (e.strip().removeprefix("W/") for e in if_none_match.split(","))
+            coincide = etag in etiquetas
+        with self._lock:
+            if coincide:
+                self._no_modificadas += 1
+            else:
+                self._completas += 1
+        return coincide
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "respuestas_304": self._no_modificadas,
+                "respuestas_completas": self._completas,
+                **{f"version_{t}": v for t, v in sorted(self._versiones.items())},
+            }
+
+
+versiones = VersionesTablas()
@@ -0,0 +1,33 @@
+import unittest
+from versiones import VersionesTablas
+
+
+class VersionesTablasTest(unittest.TestCase):
+    def test_cambia_solo_con_las_tablas_del_listado(self):
+        versiones = VersionesTablas()
+        etag = versiones.etag(("turnos",))
+        versiones.incrementar("actividades")
+        self.assertEqual(versiones.etag(("turnos",)), etag)
+        versiones.incrementar("turnos")
+        self.assertNotEqual(versiones.etag(("turnos",)), etag)
+
+    def test_variantes_y_reinicio(self):
+        versiones = VersionesTablas()
+        self.assertNotEqual(versiones.etag(("alumnos",), "pagina 1"), versiones.etag(("alumnos",), "pagina 2"))
+        self.assertEqual(versiones.etag(("alumnos",), "pagina 1"), versiones.etag(("alumnos",), "pagina 1"))
+        self.assertNotEqual(VersionesTablas().etag(("alumnos",)), versiones.etag(("alumnos",)))
+
+    def test_coincide(self):
+        versiones = VersionesTablas()
+        etag = versiones.etag(("turnos",))
+        self.assertTrue(versiones.coincide(etag, etag))
+        self.assertTrue(versiones.coincide(f'"otro", W/{etag}', etag))
+        self.assertTrue(versiones.coincide("*", etag))
+        self.assertFalse(versiones.coincide(None, etag))
+        self.assertFalse(versiones.coincide('"otro"', etag))
+        estadisticas = versiones.estadisticas()
+        self.assertEqual((estadisticas["respuestas_304"], estadisticas["respuestas_completas"]), (3, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()